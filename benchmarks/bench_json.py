@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Compares the JSON decoding pipeline against the original object hook-based
+one, on a synthetic page of issues with journals.
+
+Usage: ``python benchmarks/bench_json.py [--issues N] [--repeat N]``
+'''
+
+from __future__ import print_function
+
+import argparse
+from decimal import Decimal
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from snakemine import conf  # noqa
+from snakemine.request import json as json_request  # noqa
+from snakemine.response.json import Response  # noqa
+
+# The parser looks up the person cache for its settings
+SETTINGS = conf.Settings(conf.DEFAULT_SETTINGS)
+SETTINGS.configure(FORMAT='json')
+
+
+def make_page(count, journals=3):
+    def person(pid):
+        return {'id': pid, 'name': 'User %d' % pid}
+
+    issues = []
+    for i in range(1, count + 1):
+        issues.append({
+            'id': i,
+            'project': {'id': 1, 'name': 'eCookbook'},
+            'tracker': {'id': 1, 'name': 'Bug'},
+            'status': {'id': 1, 'name': 'New'},
+            'priority': {'id': 4, 'name': 'Low'},
+            'author': person(2),
+            'assigned_to': person(3),
+            'subject': 'Issue %d' % i,
+            'description': 'Lorem ipsum dolor sit amet ' * 10,
+            'start_date': '2014/01/%02d' % (i % 28 + 1),
+            'due_date': '2014/02/%02d' % (i % 28 + 1),
+            'done_ratio': 30,
+            'estimated_hours': 2.5,
+            'created_on': '2014-01-%02dT10:00:00Z' % (i % 28 + 1),
+            'updated_on': '2014-02-%02dT11:30:00Z' % (i % 28 + 1),
+            'journals': [{
+                'id': i * 10 + j,
+                'user': person(j + 1),
+                'notes': 'Comment %d' % j,
+                'created_on': '2014-01-%02dT12:00:00Z' % (j + 1),
+            } for j in range(journals)],
+        })
+    return json.dumps({'issues': issues, 'total_count': count, 'offset': 0,
+                       'limit': count}).encode('utf-8')
+
+
+def original(content):
+    document = json.loads(content.decode('utf-8'),
+                          object_hook=json_request.deserialize_json,
+                          parse_float=Decimal)
+    return [Response(issue) for issue in document['issues']]
+
+
+def current(content):
+    return json_request.Request(SETTINGS)._parse('get', 200, content)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(argv[0])
+    parser.add_argument('--issues', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args(argv[1:])
+
+    content = make_page(args.issues)
+    assert len(original(content)) == len(current(content))
+    if json_request.orjson is not None:
+        library = 'orjson'
+    elif json_request.ujson is not None:
+        library = 'ujson'
+    else:
+        library = json_request.json.__name__
+    print('{0} issues/page, {1} bytes, decoder: {2}'.format(
+        args.issues, len(content), library))
+    results = {}
+    for name, func in (('original', original), ('current', current)):
+        best = min(timeit.repeat(lambda: func(content), number=1,
+                                 repeat=args.repeat))
+        results[name] = best
+        print('{0:>10}: {1:8.2f} ms/page'.format(name, best * 1000))
+    print('{0:>10}: {1:8.1f}x'.format('speedup',
+                                      results['original'] /
+                                      results['current']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+A fake Redmine server, for benchmarks.
+
+It serves a synthetic set of projects, issues and journals via the parts of
+the REST API that snakemine uses, in both XML and JSON:
+
+* ``GET /issues`` and ``GET /projects``, with ``offset``, ``limit``,
+  ``project_id``, ``issue_id``, ``status_id`` and ``include=journals``
+* ``GET``, ``PUT`` and ``DELETE`` on ``/issues/<id>`` and ``/projects/<id>``
+* ``POST /issues`` and ``POST /projects``
+
+.. code-block:: python
+
+   with FakeRedmine(issues=1000, journals=5) as server:
+       conf.settings.configure(BASE_URI=server.uri)
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from __future__ import print_function
+
+import json
+import re
+import threading
+from wsgiref.simple_server import make_server, WSGIRequestHandler, WSGIServer
+from xml.sax.saxutils import escape, quoteattr
+try:
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+except ImportError:  # Python 2
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+
+PATH_RE = re.compile(r'^/(issues|projects)(?:/(\d+))?\.(xml|json)$')
+USERS = ['John Smith', 'Dave Lopper', 'Jane Doe', 'Redmine Admin']
+STATUSES = [(1, 'New'), (2, 'Assigned'), (5, 'Closed')]
+LOREM = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua. ')
+
+
+def _timestamp(n):
+    return '2014-%02d-%02dT%02d:%02d:00Z' % (n % 12 + 1, n % 28 + 1,
+                                             n % 24, n % 60)
+
+
+def _user(n):
+    return {'id': n % len(USERS) + 1, 'name': USERS[n % len(USERS)]}
+
+
+class Dataset(object):
+    '''
+    The synthetic data served by :class:`FakeRedmine`.
+
+    :param int projects: The number of projects
+    :param int issues: The number of issues, spread over the projects
+    :param int journals: The number of journals per issue
+    :param int description_size: The approximate size of each issue
+                                 description, in bytes
+    '''
+
+    def __init__(self, projects=10, issues=1000, journals=3,
+                 description_size=500):
+        self.lock = threading.Lock()
+        self.projects = {}
+        for i in range(1, projects + 1):
+            self.projects[i] = {
+                'id': i,
+                'name': 'Project %d' % i,
+                'identifier': 'project-%d' % i,
+                'description': LOREM,
+                'created_on': _timestamp(i),
+                'updated_on': _timestamp(i + 1),
+            }
+        description = (LOREM * (description_size // len(LOREM) + 1))[
+            :description_size]
+        self.issues = {}
+        for i in range(1, issues + 1):
+            status_id, status = STATUSES[i % len(STATUSES)]
+            issue = {
+                'id': i,
+                'project': {'id': i % projects + 1,
+                            'name': 'Project %d' % (i % projects + 1)},
+                'tracker': {'id': 1, 'name': 'Bug'},
+                'status': {'id': status_id, 'name': status},
+                'priority': {'id': 4, 'name': 'Normal'},
+                'author': _user(i),
+                'assigned_to': _user(i + 1),
+                'subject': 'Issue %d' % i,
+                'description': description,
+                'start_date': '2014-01-%02d' % (i % 28 + 1),
+                'done_ratio': i % 10 * 10,
+                'estimated_hours': 1.5,
+                'created_on': _timestamp(i),
+                'updated_on': _timestamp(i + 7),
+                'journals': [{
+                    'id': i * 1000 + j,
+                    'user': _user(j),
+                    'notes': 'Comment %d on issue %d' % (j, i),
+                    'created_on': _timestamp(i + j),
+                } for j in range(journals)],
+            }
+            if i > 10 and i % 10 == 0:
+                issue['parent'] = {'id': i - 10}
+            self.issues[i] = issue
+
+    def collection(self, kind):
+        return self.issues if kind == 'issues' else self.projects
+
+    def create(self, kind, data):
+        with self.lock:
+            objects = self.collection(kind)
+            obj_id = max(objects or [0]) + 1
+            obj = dict(data, id=obj_id)
+            if kind == 'issues':
+                obj.setdefault('journals', [])
+                obj['project'] = {'id': int(obj.pop('project_id', 1))}
+            objects[obj_id] = obj
+            return obj
+
+    def filter(self, kind, query):
+        objects = self.collection(kind)
+        ids = sorted(objects)
+        if 'issue_id' in query:
+            wanted = set(int(i) for i in query['issue_id'].split(','))
+            ids = [i for i in ids if i in wanted]
+        if 'project_id' in query:
+            project_id = int(query['project_id'])
+            ids = [i for i in ids
+                   if objects[i].get('project', {}).get('id') == project_id]
+        if kind == 'issues' and query.get('status_id') != '*':
+            ids = [i for i in ids if objects[i]['status']['id'] != 5]
+        return [objects[i] for i in ids]
+
+
+def _strip_journals(obj, query):
+    if 'journals' in obj and 'journals' not in query.get('include', ''):
+        obj = dict(obj)
+        del obj['journals']
+    return obj
+
+
+def _xml_value(key, value):
+    if isinstance(value, dict):
+        return '<%s%s/>' % (key, ''.join(' %s=%s' % (k, quoteattr(str(v)))
+                                         for k, v in sorted(value.items())))
+    elif isinstance(value, list):
+        return '<%s type="array">%s</%s>' % (
+            key, ''.join(_xml_journal(j) for j in value), key)
+    return '<%s>%s</%s>' % (key, escape(str(value)), key)
+
+
+def _xml_journal(journal):
+    return '<journal id="%d">%s%s%s</journal>' % (
+        journal['id'], _xml_value('user', journal['user']),
+        _xml_value('notes', journal['notes']),
+        _xml_value('created_on', journal['created_on']))
+
+
+def to_xml(tag, obj):
+    return '<%s>%s</%s>' % (tag, ''.join(_xml_value(k, v)
+                                         for k, v in sorted(obj.items())),
+                            tag)
+
+
+def render(fmt, kind, objects, total_count=None, offset=0, limit=None):
+    '''
+    Renders one object (if ``total_count`` is :data:`None`) or a page of a
+    collection in the given format.
+
+    :rtype: bytes
+    '''
+    tag = kind[:-1]
+    if fmt == 'json':
+        if total_count is None:
+            document = {tag: objects[0]}
+        else:
+            document = {kind: objects, 'total_count': total_count,
+                        'offset': offset, 'limit': limit}
+        body = json.dumps(document)
+    elif total_count is None:
+        body = '<?xml version="1.0" encoding="UTF-8"?>' + \
+            to_xml(tag, objects[0])
+    else:
+        body = '<?xml version="1.0" encoding="UTF-8"?><%s type="array" ' \
+               'total_count="%d" offset="%d" limit="%d">%s</%s>' % (
+                   kind, total_count, offset, limit,
+                   ''.join(to_xml(tag, obj) for obj in objects), kind)
+    return body.encode('utf-8')
+
+
+def _parse_body(fmt, body):
+    if fmt == 'json':
+        return list(json.loads(body.decode('utf-8')).values())[0]
+    from lxml import etree
+    return dict((child.tag, child.text)
+                for child in etree.fromstring(body).iterchildren())
+
+
+class Application(object):
+    '''
+    The WSGI application that serves a :class:`Dataset`.
+
+    :param dataset: The data to serve
+    :param int max_limit: The maximum page size, like Redmine's
+    '''
+
+    def __init__(self, dataset, max_limit=100):
+        self.dataset = dataset
+        self.max_limit = max_limit
+        #: The number of requests served, by method
+        self.requests = {}
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        self.requests[method] = self.requests.get(method, 0) + 1
+        match = PATH_RE.match(environ['PATH_INFO'])
+        if match is None:
+            return self._reply(start_response, '404 Not Found')
+        kind, obj_id, fmt = match.groups()
+        query = dict((k, v[0]) for k, v in
+                     parse_qs(environ.get('QUERY_STRING', '')).items())
+        objects = self.dataset.collection(kind)
+        content_type = 'application/%s' % fmt
+        if obj_id is None:
+            if method == 'POST':
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+                data = _parse_body(fmt, environ['wsgi.input'].read(length))
+                obj = self.dataset.create(kind, data)
+                return self._reply(start_response, '201 Created',
+                                   render(fmt, kind, [obj]), content_type)
+            results = self.dataset.filter(kind, query)
+            offset = int(query.get('offset', 0))
+            limit = min(int(query.get('limit', 25)), self.max_limit)
+            page = [_strip_journals(obj, query)
+                    for obj in results[offset:offset + limit]]
+            return self._reply(start_response, '200 OK',
+                               render(fmt, kind, page, len(results), offset,
+                                      limit), content_type)
+        obj = objects.get(int(obj_id))
+        if obj is None:
+            return self._reply(start_response, '404 Not Found')
+        if method == 'PUT':
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            obj.update(_parse_body(fmt, environ['wsgi.input'].read(length)))
+            return self._reply(start_response, '200 OK')
+        elif method == 'DELETE':
+            with self.dataset.lock:
+                objects.pop(obj.get('id'), None)
+            return self._reply(start_response, '200 OK')
+        return self._reply(start_response, '200 OK',
+                           render(fmt, kind, [_strip_journals(obj, query)]),
+                           content_type)
+
+    def _reply(self, start_response, status, body=b'',
+               content_type='text/plain'):
+        start_response(status, [('Content-Type', content_type),
+                                ('Content-Length', str(len(body)))])
+        return [body]
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeRedmine(object):
+    '''
+    A fake Redmine server, running in a background thread. The keyword
+    arguments are passed to :class:`Dataset`.
+
+    :param str host: The address to listen on
+    :param int port: The port to listen on (by default, any free port)
+    '''
+
+    def __init__(self, host='127.0.0.1', port=0, **kwargs):
+        self.app = Application(Dataset(**kwargs))
+        self._server = make_server(host, port, self.app,
+                                   server_class=_ThreadingWSGIServer,
+                                   handler_class=_QuietHandler)
+        self._thread = None
+
+    @property
+    def uri(self):
+        '''The base URI of the server, for the ``BASE_URI`` setting.'''
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main(argv=None):
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--projects', type=int, default=10)
+    parser.add_argument('--issues', type=int, default=1000)
+    parser.add_argument('--journals', type=int, default=3)
+    args = parser.parse_args(argv)
+    server = FakeRedmine(port=args.port, projects=args.projects,
+                         issues=args.issues, journals=args.journals)
+    with server:
+        print('Serving on {0}'.format(server.uri))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Runs the snakemine benchmarks against a fake Redmine server (see
+:mod:`fakeredmine`).
+
+Each scenario is run ``--repeat`` times per format, and its throughput,
+latency percentiles and peak memory usage (measured in a separate run, via
+:mod:`tracemalloc`, when it is available) are written as JSON:
+
+.. code-block:: sh
+
+   python benchmarks/run.py --issues 2000 --output results.json
+   python benchmarks/run.py --compare results.json
+
+With ``--compare``, the exit status is non-zero if the median latency of any
+scenario regressed by more than ``--threshold`` compared to a previous run.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from __future__ import division, print_function
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4
+    tracemalloc = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from fakeredmine import FakeRedmine, render  # noqa
+import snakemine  # noqa
+from snakemine import conf  # noqa
+from snakemine.issue import Issue  # noqa
+from snakemine.request import request_class  # noqa
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class Scenario(object):
+    '''
+    A benchmarked operation. ``setup`` runs before every repetition, and is
+    not timed; ``run`` returns the number of items that it processed.
+    '''
+
+    def __init__(self, name, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+
+def scenarios(args, fmt):
+    issues = args.server.app.dataset.issues
+    # A full page of a collection, as Redmine sends it
+    page = render(fmt, 'issues', [
+        dict((k, v) for k, v in issues[i].items() if k != 'journals')
+        for i in sorted(issues)[:100]], len(issues), 0, 100)
+    request = request_class(fmt)()
+    state = {}
+
+    def all_issues():
+        return len(list(Issue.objects.filter(status_id='*')))
+
+    def filter_issues():
+        return len(list(Issue.objects.filter(project_id=1)))
+
+    def get_issue():
+        Issue.objects.get(args.issues // 2)
+        return 1
+
+    def load_issue():
+        state['issue'] = Issue.objects.get(1)
+
+    def save_issue():
+        state['issue'].subject = 'Benchmarked'
+        state['issue'].save()
+        return 1
+
+    def paginate():
+        # Ten pages of 25, spread over the whole collection
+        step = max(args.issues // 10, 25)
+        count = 0
+        for offset in range(0, args.issues, step):
+            count += len(list(Issue.objects.all()[offset:offset + 25]))
+        return count
+
+    def parse():
+        return len(request._parse('get', 200, page))
+
+    return [
+        Scenario('all', all_issues),
+        Scenario('filter', filter_issues),
+        Scenario('get', get_issue),
+        Scenario('save', save_issue, load_issue),
+        Scenario('paginate', paginate),
+        Scenario('parse', parse),
+    ]
+
+
+def percentile(values, pct):
+    '''The nearest-rank percentile of a list of values.'''
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def measure(scenario, repeat):
+    latencies = []
+    items = 0
+    for _ in range(repeat):
+        scenario.setup()
+        start = timer()
+        items += scenario.run()
+        latencies.append(timer() - start)
+    total = sum(latencies)
+    result = {
+        'scenario': scenario.name,
+        'repeat': repeat,
+        'items': items,
+        'ops_per_sec': repeat / total if total else None,
+        'items_per_sec': items / total if total else None,
+        'latency_ms': dict(('p%d' % pct, percentile(latencies, pct) * 1000)
+                           for pct in (50, 90, 99)),
+        'peak_memory_bytes': None,
+    }
+    result['latency_ms']['max'] = max(latencies) * 1000
+    if tracemalloc is not None:
+        scenario.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            scenario.run()
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def configure(uri, fmt):
+    conf.settings = conf.Settings(conf.DEFAULT_SETTINGS)
+    conf.settings.configure(BASE_URI=uri, FORMAT=fmt)
+
+
+def run(args):
+    results = []
+    for fmt in args.formats:
+        configure(args.server.uri, fmt)
+        for scenario in scenarios(args, fmt):
+            if args.scenarios and scenario.name not in args.scenarios:
+                continue
+            result = measure(scenario, args.repeat)
+            result['format'] = fmt
+            results.append(result)
+            print('{format:>4} {scenario:<9} {ops_per_sec:9.1f} ops/s '
+                  '{items_per_sec:10.1f} items/s  p50 {p50:8.2f} ms  '
+                  'p99 {p99:8.2f} ms  peak {peak}'.format(
+                      peak=_format_bytes(result['peak_memory_bytes']),
+                      **dict(result, **result['latency_ms'])))
+    return results
+
+
+def _format_bytes(value):
+    if value is None:
+        return 'n/a'
+    return '{0:.1f} KiB'.format(value / 1024)
+
+
+def compare(results, baseline, threshold):
+    '''
+    Prints the scenarios whose median latency regressed by more than
+    ``threshold`` (a fraction) compared to the baseline results.
+
+    :rtype: bool
+    :returns: whether there were no regressions
+    '''
+    previous = dict(((r['format'], r['scenario']), r['latency_ms']['p50'])
+                    for r in baseline['results'])
+    ok = True
+    for result in results:
+        before = previous.get((result['format'], result['scenario']))
+        if not before:
+            continue
+        change = result['latency_ms']['p50'] / before - 1
+        if change > threshold:
+            ok = False
+            print('REGRESSION: {0} {1} p50 {2:+.1%}'.format(
+                result['format'], result['scenario'], change))
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(argv[0])
+    parser.add_argument('--projects', type=int, default=10)
+    parser.add_argument('--issues', type=int, default=1000)
+    parser.add_argument('--journals', type=int, default=3)
+    parser.add_argument('--description-size', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--format', dest='formats', action='append',
+                        choices=['xml', 'json'],
+                        help='may be repeated (default: both)')
+    parser.add_argument('--scenario', dest='scenarios', action='append',
+                        help='may be repeated (default: all)')
+    parser.add_argument('--output', help='where to write the JSON results')
+    parser.add_argument('--compare', help='previous results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='the allowed slowdown, as a fraction')
+    args = parser.parse_args(argv[1:])
+    args.formats = args.formats or ['xml', 'json']
+
+    args.server = FakeRedmine(projects=args.projects, issues=args.issues,
+                              journals=args.journals,
+                              description_size=args.description_size)
+    with args.server:
+        results = run(args)
+    document = {
+        'snakemine': snakemine.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'parameters': {
+            'projects': args.projects,
+            'issues': args.issues,
+            'journals': args.journals,
+            'description_size': args.description_size,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(results, json.load(f), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -16,9 +16,26 @@
 
 import sys
 
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: no cover
+    # Python 2.6
+    from ordereddict import OrderedDict  # noqa
+
+try:
+    from urllib.parse import urlencode
+except ImportError:  # pragma: no cover
+    # Python 2
+    from urllib import urlencode  # noqa
+
 
 def items(iterable):
     if sys.version_info < (3,):  # pragma: no cover
         return iterable.iteritems()
     else:  # pragma: no cover
         return iterable.items()
+
+
+def total_seconds(delta):
+    # timedelta.total_seconds() is not available in Python 2.6
+    return (delta.days * 86400 + delta.seconds) + delta.microseconds / 1e6
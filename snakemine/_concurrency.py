@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+
+def ordered_map(func, iterable, workers):
+    '''
+    Calls ``func`` on every item of ``iterable`` using a pool of at most
+    ``workers`` threads, and yields the results in the same order as the
+    input. No more than ``workers`` calls are pending at any given time, so
+    the results are never buffered beyond that.
+    '''
+    if workers <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+    pool = ThreadPool(workers)
+    try:
+        pending = deque()
+        for item in iterable:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+An :mod:`asyncio` interface to the Redmine API (Python 3.6+ only).
+
+The async managers mirror the regular ones, except that every method that
+talks to Redmine is a coroutine, and querysets are iterated with
+``async for``:
+
+.. code-block:: python
+
+   from snakemine.aio import AsyncIssueManager
+
+   async def route(issue_ids):
+       issues = AsyncIssueManager()
+       try:
+           async for issue in issues.filter(project_id=1):
+               print(issue.subject)
+           issue = await issues.get(issue_ids[0])
+           issue.subject = 'Routed'
+           await issues.save(issue)
+       finally:
+           await issues.close()
+
+Requests are sent via a pluggable transport. By default, aiohttp_ is used if
+it is installed, otherwise HTTPX_ is used. The requests are prepared and the
+responses are parsed by the same code as the synchronous API, so both XML and
+JSON are supported, according to the ``FORMAT`` setting (or the
+``request_cls`` given to the manager), and the ``METRICS_HOOKS`` are called
+(without TTFB measurements). Unsuccessful responses are raised as
+:class:`snakemine.exceptions.RedmineError` subclasses, after being retried
+according to the ``RETRY_*`` settings (network errors and ``Retry-After``
+headers are not handled, since they depend on the transport). The response
+cache and the rate limits are not used by the async API.
+
+.. _aiohttp: https://docs.aiohttp.org/
+.. _HTTPX: https://www.python-httpx.org/
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from . import conf
+from ._compat import items
+from .exceptions import NotFound, error_for_status
+from .issue import Issue
+from .project import Project
+from .request import request_class
+from .request.retry import RetryPolicy
+from .response.base import ResponseList
+import asyncio
+
+
+class AiohttpTransport(object):
+    '''
+    Sends requests via an :class:`aiohttp.ClientSession`.
+
+    :param session: The session to use. By default, a session is created on
+                    first use, with at most ``POOL_MAXSIZE`` connections.
+    '''
+
+    def __init__(self, session=None):
+        self._session = session
+
+    async def request(self, method, uri, params, data, headers, auth):
+        import aiohttp
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=conf.settings.POOL_MAXSIZE)
+            self._session = aiohttp.ClientSession(connector=connector)
+        if auth is not None:
+            auth = aiohttp.BasicAuth(*auth)
+        async with self._session.request(method.upper(), uri, params=params,
+                                         data=data, headers=headers,
+                                         auth=auth) as response:
+            return response.status, await response.read()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class HttpxTransport(object):
+    '''
+    Sends requests via an :class:`httpx.AsyncClient`.
+
+    :param client: The client to use. By default, a client is created on first
+                   use, with at most ``POOL_MAXSIZE`` connections.
+    '''
+
+    def __init__(self, client=None):
+        self._client = client
+
+    async def request(self, method, uri, params, data, headers, auth):
+        import httpx
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=conf.settings.POOL_MAXSIZE,
+                max_keepalive_connections=conf.settings.POOL_MAXSIZE)
+            self._client = httpx.AsyncClient(limits=limits)
+        kwargs = {}
+        if isinstance(data, dict):
+            kwargs['data'] = data
+        elif data is not None:
+            kwargs['content'] = data
+        response = await self._client.request(method.upper(), uri,
+                                              params=params, headers=headers,
+                                              auth=auth, **kwargs)
+        return response.status_code, response.content
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def default_transport():
+    '''
+    Creates a transport for whichever supported HTTP client is installed.
+
+    :raises ImportError: if neither aiohttp nor HTTPX is installed
+    '''
+    try:
+        import aiohttp  # noqa
+        return AiohttpTransport()
+    except ImportError:
+        pass
+    try:
+        import httpx  # noqa
+        return HttpxTransport()
+    except ImportError:
+        raise ImportError('snakemine.aio requires aiohttp or httpx')
+
+
+class AsyncRequest(object):
+    '''
+    Handles asynchronous requests to the Redmine API. Request preparation,
+    encoding and response parsing are delegated to a synchronous
+    :class:`snakemine.request.base.Request`.
+
+    :param request: The synchronous request, which determines the format
+    :param transport: The transport that sends the requests
+    '''
+
+    def __init__(self, request, transport):
+        self._request = request
+        self._transport = transport
+
+    async def _send(self, method, path, params=None, data=None):
+        request = self._request
+        event = request._start_event(method, path)
+        if method in ('post', 'put') and isinstance(data, dict):
+            data = request._encode(data)
+        uri, params, headers = request._prepare(method, path,
+                                                dict(params or {}))
+        policy = RetryPolicy.from_settings()
+        attempt = 0
+        while True:
+            attempt += 1
+            status, content = await self._transport.request(
+                method, uri, params, data, headers, request._auth)
+            if not policy.should_retry(method, attempt, status):
+                break
+            await asyncio.sleep(policy.delay(attempt))
+        if event is not None:
+            event.status = status
+            event.bytes_received = len(content)
+            event.attempts = attempt
+        try:
+            if status >= 400:
+                raise error_for_status(status, method, path, content)
+            return status, request._parse_timed(event, method, status,
+                                                content)
+        finally:
+            if event is not None:
+                event.finish()
+
+    async def get(self, path, params=None):
+        return await self._send('get', path, params)
+
+    async def post(self, path, params=None, data=None):
+        return await self._send('post', path, params, data)
+
+    async def put(self, path, params=None, data=None):
+        return await self._send('put', path, params, data)
+
+    async def delete(self, path):
+        return await self._send('delete', path)
+
+    async def close(self):
+        await self._transport.close()
+
+
+class AsyncQuerySet(object):
+    '''
+    The asynchronous counterpart of :class:`snakemine.query.QuerySet`. Pages
+    are retrieved lazily via ``async for``; awaiting the ``AsyncQuerySet``
+    retrieves every result as a :func:`list`.
+    '''
+
+    def __init__(self, manager, params=None):
+        self._manager = manager
+        self._params = dict(params or {})
+        self._low = 0
+        self._high = None
+
+    def _clone(self):
+        qs = self.__class__(self._manager, self._params)
+        qs._low = self._low
+        qs._high = self._high
+        return qs
+
+    def __getitem__(self, k):
+        if not isinstance(k, slice) or k.step is not None:
+            raise TypeError('AsyncQuerySet only supports slices without a '
+                            'step')
+        if (k.start or 0) < 0 or (k.stop is not None and k.stop < 0):
+            raise ValueError('Negative indexing is not supported.')
+        qs = self._clone()
+        qs._low = self._low + (k.start or 0)
+        if k.stop is not None:
+            qs._high = self._low + k.stop
+            if self._high is not None:
+                qs._high = min(qs._high, self._high)
+        return qs
+
+    def all(self):
+        return self._clone()
+
+    def filter(self, **kwargs):
+        if self._low or self._high is not None:
+            raise TypeError('Cannot filter a query once a slice has been '
+                            'taken.')
+        qs = self._clone()
+        qs._params.update(kwargs)
+        return qs
+
+    async def __aiter__(self):
+        page_size = conf.settings.PAGE_SIZE
+        offset = self._low
+        while self._high is None or offset < self._high:
+            limit = page_size
+            if self._high is not None:
+                limit = min(limit, self._high - offset)
+            params = dict(self._params)
+            params['offset'] = offset
+            params['limit'] = limit
+            page, total_count = await self._manager._get_page(params=params)
+            for resource in page:
+                yield resource
+            offset += len(page)
+            if total_count is None:
+                if len(page) < limit:
+                    break
+            elif not page or offset >= total_count:
+                break
+
+    async def _fetch_all(self):
+        return [resource async for resource in self]
+
+    def __await__(self):
+        return self._fetch_all().__await__()
+
+    async def count(self):
+        params = dict(self._params)
+        params['offset'] = self._low
+        params['limit'] = 1
+        total_count = (await self._manager._get_page(params=params))[1]
+        if total_count is None:
+            return len(await self)
+        if self._high is not None:
+            total_count = min(total_count, self._high)
+        return max(0, total_count - self._low)
+
+
+class AsyncManager(object):
+    '''
+    The asynchronous counterpart of :class:`snakemine.base.Manager`. Concrete
+    managers supply the resource class (``_cls``) and its path (``_path``).
+
+    Resources retrieved via an async manager are bound to it, so their
+    blocking methods and properties, e.g. :meth:`snakemine.base.Resource.save`
+    or :attr:`snakemine.issue.Issue.project`, raise :class:`RuntimeError`
+    instead of blocking the event loop. Use the coroutines of the manager
+    instead, e.g. :meth:`save` or :meth:`AsyncIssueManager.project`.
+
+    :param transport: The transport that sends the requests. Defaults to
+                      :func:`default_transport`.
+    :param request_cls: The synchronous request class that encodes and parses
+                        the requests. Defaults to the one for the ``FORMAT``
+                        setting, when the first request is sent.
+    '''
+
+    def __init__(self, transport=None, request_cls=None):
+        if transport is None:
+            transport = default_transport()
+        self._transport = transport
+        self._request_cls = request_cls
+        self._async_request = None
+
+    @property
+    def _request(self):
+        if self._async_request is None:
+            request_cls = self._request_cls or \
+                request_class(conf.settings.FORMAT)
+            self._async_request = AsyncRequest(request_cls(), self._transport)
+        return self._async_request
+
+    @property
+    def _sync(self):
+        raise RuntimeError('Resources retrieved via %s cannot block; use '
+                           'the coroutines of the manager instead' %
+                           self.__class__.__name__)
+
+    @property
+    def _params(self):
+        return {}
+
+    @property
+    def _resource_params(self):
+        return {}
+
+    def _resource_path(self, resource_id):
+        return '%s/%s' % (self._path, resource_id)
+
+    def _data_to_send(self, data):
+        return {
+            'object': self._cls.__name__.lower(),
+            'data': data,
+        }
+
+    def _wrap(self, data):
+        return self._cls(data, self)
+
+    async def _get_page(self, path=None, params=None):
+        if not path:
+            path = self._path
+        params = dict(params or {})
+        params.update(self._params)
+        result = (await self._request.get(path, params=params))[1] or \
+            ResponseList()
+        resources = [self._wrap(data) for data in result if data]
+        return resources, getattr(result, 'total_count', None)
+
+    def all(self):
+        '''
+        Retrieves all of the available items for a given resource.
+
+        :rtype: :class:`AsyncQuerySet`
+        '''
+        return AsyncQuerySet(self)
+
+    def filter(self, **kwargs):
+        '''
+        Retrieves the items for a given resource that match the given filters.
+
+        :rtype: :class:`AsyncQuerySet`
+        '''
+        return AsyncQuerySet(self, kwargs)
+
+    async def get(self, resource_id):
+        '''
+        Retrieves a single item for a given resource and ID.
+
+        :rtype: :class:`snakemine.base.Resource`
+        '''
+        page = await self._get_page(self._resource_path(resource_id),
+                                    self._resource_params)
+        return page[0][0]
+
+    async def create(self, data):
+        '''
+        Creates a new :class:`snakemine.base.Resource`-derived object.
+
+        :rtype: :class:`snakemine.base.Resource`
+        '''
+        resp = await self._request.post(self._path,
+                                        data=self._data_to_send(data))
+        return self._wrap(resp[1][0])
+
+    async def update(self, resource_id, data):
+        await self._request.put(self._resource_path(resource_id),
+                                data=self._data_to_send(data))
+
+    async def delete(self, resource_id):
+        await self._request.delete(self._resource_path(resource_id))
+
+    async def save(self, resource):
+        '''
+        The asynchronous counterpart of :meth:`snakemine.base.Resource.save`.
+        '''
+        if resource._deleted:
+            raise RuntimeError('Resource is deleted')
+        elif resource._response is None:
+            created = await self.create(resource._changed)
+            resource._response = created._response
+        else:
+            await self.update(resource.id, resource._changed)
+            for k, v in items(resource._changed):
+                setattr(resource._response, k, v)
+        resource._changed = {}
+
+    async def delete_resource(self, resource):
+        '''
+        The asynchronous counterpart of :meth:`snakemine.base.Resource.delete`.
+        '''
+        if resource._response:
+            await self.delete(resource.id)
+            resource._response = None
+            resource._deleted = True
+
+    async def close(self):
+        '''Closes the underlying transport.'''
+        await self._transport.close()
+
+
+class AsyncProjectManager(AsyncManager):
+    '''An asyncio model manager for Redmine projects.'''
+
+    _cls = Project
+    _path = '/projects'
+
+
+class AsyncIssueManager(AsyncManager):
+    '''An asyncio model manager for Redmine issues.'''
+
+    _cls = Issue
+    _path = '/issues'
+
+    def __init__(self, transport=None, request_cls=None):
+        super(AsyncIssueManager, self).__init__(transport, request_cls)
+        self._projects = AsyncProjectManager(self._transport, request_cls)
+
+    @property
+    def _resource_params(self):
+        return {'include': 'journals'}
+
+    async def comments(self, issue):
+        '''
+        The asynchronous counterpart of :attr:`snakemine.issue.Issue.comments`.
+        Issues retrieved via :meth:`get` already have them.
+
+        :rtype: :func:`list` of :class:`snakemine.response.base.Comment`
+        '''
+        response = issue._response
+        if response is None:
+            return []
+        if not response._has_journals():
+            try:
+                page = await self._get_page(self._resource_path(issue.id),
+                                            self._resource_params)
+                comments = page[0][0]._response.comments
+            except NotFound:
+                comments = []
+            response._set_comments(comments)
+        return response.comments
+
+    async def parent(self, issue):
+        '''
+        The asynchronous counterpart of :attr:`snakemine.issue.Issue.parent`.
+
+        :rtype: :class:`snakemine.issue.Issue` or :data:`None`
+        '''
+        if not issue.parent_id:
+            return None
+        return await self.get(issue.parent_id)
+
+    async def project(self, issue):
+        '''
+        The asynchronous counterpart of :attr:`snakemine.issue.Issue.project`.
+
+        :rtype: :class:`snakemine.project.Project`
+        '''
+        return await self._projects.get(issue.project_id)
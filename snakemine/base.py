@@ -19,29 +19,157 @@ Base for Redmine models.
 .. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
 '''
 
+from . import conf
 from ._compat import items
-# This is XML because the JSON response doesn't send back enough info
-# For example, issue author metadata
-from .request.xml import Request
+from ._concurrency import ordered_map
+from .exceptions import NotFound
+from .identity import IdentityMap
+from .query import QuerySet
+from .request import request_class
+
+
+class BulkResult(object):
+    '''
+    The outcome of one item of a bulk operation.
+
+    :param item: The input item
+    :param resource: The created resource, if any
+    :param Exception error: The error raised while processing the item, if
+                            any
+    '''
+
+    __slots__ = ('item', 'resource', 'error')
+
+    def __init__(self, item, resource=None, error=None):
+        self.item = item
+        self.resource = resource
+        self.error = error
+
+    @property
+    def ok(self):
+        '''
+        Whether the item was processed successfully.
+
+        :rtype: bool
+        '''
+        return self.error is None
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__,
+                             'ok' if self.ok else repr(self.error))
 
 
 class Manager(object):
-    '''A Django-like model manager for Redmine resources.'''
+    '''
+    A Django-like model manager for Redmine resources.
+
+    :param client: The client whose Redmine instance, settings and
+                   connections are used. Defaults to the global settings.
+    :type client: :class:`snakemine.client.Client`
+    '''
+
+    _client = None
+
+    def __init__(self, client=None):
+        self._client = client
+        self._requests = {}
 
-    def __init__(self):
-        self._request = Request()
+    @property
+    def _settings(self):
+        if self._client is None:
+            return conf.settings
+        return self._client.settings
+
+    @property
+    def _request(self):
+        '''
+        The request handler for the ``FORMAT`` setting. Managers are created
+        at import time, before the settings are available, so handlers are
+        created on first use.
+        '''
+        if self._client is not None:
+            return self._client.request()
+        fmt = conf.settings.FORMAT
+        request = self._requests.get(fmt)
+        if request is None:
+            request = self._requests.setdefault(fmt, request_class(fmt)())
+        return request
+
+    @property
+    def _sync(self):
+        '''
+        The manager that resources use to save themselves and to retrieve
+        their related data. The :mod:`snakemine.aio` managers refuse, since
+        that would block.
+        '''
+        return self
+
+    def _manager_for(self, cls):
+        '''
+        The manager of another resource class, bound to the same client.
+        '''
+        if self._client is None:
+            return cls.objects
+        return self._client.manager(cls)
+
+    def _wrap(self, data, fields=None):
+        resource = self._cls(data, self)
+        if fields is not None:
+            resource._fields = fields
+        return resource
+
+    #: The related data that :meth:`snakemine.query.QuerySet.prefetch`
+    #: accepts
+    _prefetchable = frozenset()
+
+    def _prefetch(self, resources, lookups, cache):
+        '''
+        Prepares the related data of a batch of resources. ``cache`` is
+        shared by the batches of a result set.
+        '''
+        pass
 
     @property
     def _params(self):
         return {}
 
-    def _get(self, path=None, params={}):
+    @property
+    def _resource_params(self):
+        '''The parameters sent when retrieving a single item.'''
+        return {}
+
+    def _get(self, path=None, params=None):
+        return self._get_page(path, params)[0]
+
+    def _default_params(self, fields=None):
+        params = self._params
+        if fields is not None and 'include' in params:
+            # Don't ask for associated data that won't be parsed
+            params = dict(params)
+            include = [name for name in params.pop('include').split(',')
+                       if name in fields]
+            if include:
+                params['include'] = ','.join(include)
+        return params
+
+    def _get_page(self, path=None, params=None, fields=None):
         if not path:
             path = self._path
-        params.update(self._params)
-        return [self._cls(data)
-                for data in self._request.get(path, params=params)[1]
-                if data]
+        # Copied, because the caller's parameters may be shared with other
+        # threads
+        params = dict(params or {})
+        params.update(self._default_params(fields))
+        result = self._request.get(path, params=params, fields=fields)[1] or []
+        resources = [self._wrap(data, fields) for data in result if data]
+        return resources, getattr(result, 'total_count', None)
+
+    def _stream_page(self, params=None, fields=None):
+        params = dict(params or {})
+        params.update(self._default_params(fields))
+        responses = self._request.stream(self._path, params=params,
+                                         fields=fields)
+        return ((self._wrap(data, fields) for data in responses if data),
+                responses)
 
     def _resource_path(self, resource_id):
         return '%s/%s' % (self._path, resource_id)
@@ -50,21 +178,107 @@ class Manager(object):
         '''
         Retrieves all of the available items for a given resource.
 
-        :rtype: :func:`list` of :class:`Resource`
+        :rtype: :class:`snakemine.query.QuerySet` of :class:`Resource`
         '''
-        return self._get()
+        return QuerySet(self)
 
     def filter(self, **kwargs):
-        return self._get(params=kwargs)
+        '''
+        Retrieves the items for a given resource that match the given filters.
+        The keyword arguments are sent to Redmine as query parameters.
+
+        :rtype: :class:`snakemine.query.QuerySet` of :class:`Resource`
+        '''
+        return QuerySet(self, kwargs)
+
+    def using(self, snapshot):
+        '''
+        Answers queries from a local snapshot instead of Redmine.
+
+        :param snapshot: The snapshot to query
+        :type snapshot: :class:`snakemine.snapshot.Snapshot`
+        :rtype: :class:`snakemine.snapshot.SnapshotManager`
+        '''
+        return snapshot.manager(self._cls)
 
     def get(self, resource_id):
         '''
         Retrieves a single item for a given resource and ID.
 
         :param int resource_id: The resource's ID
+        :raises snakemine.exceptions.NotFound: if the item does not exist
         :rtype: :class:`Resource`
         '''
-        return self._get(self._resource_path(resource_id))[0]
+        identity_map = IdentityMap.current()
+        if identity_map is not None:
+            resource = identity_map.get(self._cls, resource_id,
+                                        self._client)
+            if resource is not None:
+                return resource
+        resource = self._get(self._resource_path(resource_id),
+                             self._resource_params)[0]
+        if identity_map is not None:
+            resource = identity_map.add(resource)
+        return resource
+
+    def _get_or_none(self, resource_id):
+        try:
+            return self.get(resource_id)
+        except NotFound:
+            return None
+
+    def _in_bulk_params(self, ids):
+        '''
+        The filters that restrict a collection to the given IDs, or
+        :data:`None` if Redmine cannot filter the resource by ID.
+        '''
+        return None
+
+    def in_bulk(self, ids):
+        '''
+        Retrieves the items for a given resource and list of IDs, using as few
+        requests as possible. IDs are requested in batches of ``PAGE_SIZE``
+        if Redmine supports filtering the resource by ID; otherwise (or if an
+        item is missing from its batch), items are retrieved individually, up
+        to ``MAX_WORKERS`` at a time. IDs that do not exist are omitted from
+        the result.
+
+        :param ids: The resource IDs
+        :type ids: iterable of int
+        :rtype: :func:`dict` mapping the IDs to :class:`Resource` objects
+        '''
+        ids = sorted(set(int(resource_id) for resource_id in ids))
+        found = {}
+        identity_map = IdentityMap.current()
+        if identity_map is not None:
+            for resource_id in ids:
+                resource = identity_map.get(self._cls, resource_id,
+                                            self._client)
+                if resource is not None:
+                    found[resource_id] = resource
+            ids = [resource_id for resource_id in ids
+                   if resource_id not in found]
+        chunk_size = self._settings.PAGE_SIZE
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            params = self._in_bulk_params(chunk)
+            if params is None:
+                break
+            # The slice guards against Redmine versions that ignore the filter
+            for resource in QuerySet(self, params)[:len(chunk)]:
+                resource_id = int(resource.id)
+                if resource_id in chunk:
+                    found[resource_id] = resource
+        missing = [resource_id for resource_id in ids
+                   if resource_id not in found]
+        resources = ordered_map(self._get_or_none, missing,
+                                self._settings.MAX_WORKERS)
+        for resource_id, resource in zip(missing, resources):
+            if resource is not None:
+                if identity_map is not None:
+                    resource = identity_map.add(resource)
+                found[resource_id] = resource
+        return found
 
     def _data_to_send(self, data):
         return {
@@ -80,7 +294,7 @@ class Manager(object):
         :rtype: :class:`Resource`
         '''
         resp = self._request.post(self._path, data=self._data_to_send(data))
-        return self._cls(resp[1][0])
+        return self._wrap(resp[1][0])
 
     def update(self, resource_id, data):
         self._request.put(self._resource_path(resource_id),
@@ -89,6 +303,68 @@ class Manager(object):
     def delete(self, resource_id):
         self._request.delete(self._resource_path(resource_id))
 
+    def _bulk(self, func, items, workers, max_failures):
+        if workers is None:
+            workers = self._settings.MAX_WORKERS
+        failures = [0]
+
+        def attempt(item):
+            try:
+                return BulkResult(item, resource=func(item))
+            except Exception as e:
+                return BulkResult(item, error=e)
+
+        def remaining():
+            for item in items:
+                if max_failures is not None and failures[0] >= max_failures:
+                    return
+                yield item
+
+        results = []
+        # The items are submitted lazily, so once the failure limit has been
+        # reached, only the requests that are already in flight are sent.
+        for result in ordered_map(attempt, remaining(), workers):
+            if not result.ok:
+                failures[0] += 1
+            results.append(result)
+        return results
+
+    def bulk_create(self, items, workers=None, max_failures=None):
+        '''
+        Creates many :class:`Resource`-derived objects, up to ``workers``
+        (by default, ``MAX_WORKERS``) at a time.
+
+        :param items: The metadata of each new resource
+        :type items: iterable of :func:`dict`
+        :param int workers: The maximum number of concurrent requests
+        :param int max_failures: If given, no more items are sent once this
+                                 many have failed. The requests that are
+                                 already in flight are still completed.
+        :returns: one result per item that was sent, in the same order as
+                  ``items``. The ``resource`` of each successful result is the
+                  created resource.
+        :rtype: :func:`list` of :class:`BulkResult`
+        '''
+        return self._bulk(self.create, items, workers, max_failures)
+
+    def bulk_update(self, updates, workers=None, max_failures=None):
+        '''
+        Updates many resource items, up to ``workers`` (by default,
+        ``MAX_WORKERS``) at a time.
+
+        :param updates: The ID and changed metadata of each resource
+        :type updates: iterable of ``(int, dict)`` tuples
+        :param int workers: The maximum number of concurrent requests
+        :param int max_failures: If given, no more updates are sent once this
+                                 many have failed. The requests that are
+                                 already in flight are still completed.
+        :returns: one result per update that was sent, in the same order as
+                  ``updates``
+        :rtype: :func:`list` of :class:`BulkResult`
+        '''
+        return self._bulk(lambda update: self.update(*update), updates,
+                          workers, max_failures)
+
 
 class Resource(object):
     '''
@@ -100,9 +376,19 @@ class Resource(object):
 
     :param response: the object the represents the metadata of the
                      resource item
+    :param manager: The manager that saves and deletes the item, and
+                    retrieves its related resources. Defaults to
+                    ``objects``.
+    :type manager: :class:`Manager`
     '''
 
-    def __init__(self, response):
+    #: The fields that were parsed, if not all of them
+    _fields = None
+
+    def __init__(self, response, manager=None):
+        if manager is None:
+            manager = getattr(type(self), 'objects', None)
+        self._manager = manager
         self._response = response
         self._changed = {}
         self._deleted = False
@@ -134,11 +420,11 @@ class Resource(object):
             raise RuntimeError('Resource is deleted')
         elif self._response is None:
             # new object
-            resource = self.objects.create(self._changed)
+            resource = self._manager._sync.create(self._changed)
             self._response = resource._response
         else:
             # existing object
-            self.objects.update(self.id, self._changed)
+            self._manager._sync.update(self.id, self._changed)
             for k, v in items(self._changed):
                 setattr(self._response, k, v)
         self._changed = {}
@@ -146,6 +432,9 @@ class Resource(object):
     def delete(self):
         '''Deletes the resource item from Redmine.'''
         if self._response:
-            self.objects.delete(self.id)
+            self._manager._sync.delete(self.id)
+            identity_map = IdentityMap.current()
+            if identity_map is not None:
+                identity_map.discard(self)
             self._response = None
             self._deleted = True
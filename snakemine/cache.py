@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Response caches for ``GET`` requests.
+
+Caching is enabled by setting ``CACHE`` to an instance of one of the
+:class:`BaseCache` subclasses:
+
+.. code-block:: python
+
+   from snakemine.cache import MemoryCache
+
+   CACHE = MemoryCache(max_entries=500)
+   CACHE_TTL = 60
+   CACHE_TTLS = {
+       '/projects': 600,
+   }
+
+Responses are keyed by the ``BASE_URI`` of the Redmine instance, and their
+path, sorted query parameters and format, so one cache can be shared by
+several :class:`snakemine.client.Client` objects. Each entry is considered
+fresh for ``CACHE_TTL`` seconds, unless the resource path (for example,
+``/projects``) has its own TTL in ``CACHE_TTLS``. Once an entry is stale, it
+is revalidated with Redmine via its ``ETag`` and/or ``Last-Modified``
+headers, if Redmine sent them; a ``304 Not Modified`` reply reuses the cached
+response instead of downloading it again. Sending a
+``POST``, ``PUT`` or ``DELETE`` request invalidates every cached response for
+that resource (on the same Redmine instance).
+
+A shared cache (memcached, Redis, etc.) can be used by implementing the
+:class:`BaseCache` interface.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from ._compat import OrderedDict
+import sqlite3
+import threading
+import time
+
+
+class CacheEntry(object):
+    '''
+    A cached response.
+
+    :param int status: The HTTP status code
+    :param bytes content: The response body
+    :param float expires: When the entry becomes stale, as a UNIX timestamp
+    :param str etag: The ``ETag`` header sent by Redmine, if any
+    :param str last_modified: The ``Last-Modified`` header sent by Redmine,
+                              if any
+    '''
+
+    def __init__(self, status, content, expires, etag=None,
+                 last_modified=None):
+        self.status = status
+        self.content = content
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+        #: The parsed response. Only kept by in-process caches.
+        self.parsed = None
+
+    @property
+    def fresh(self):
+        '''
+        Whether the entry can be used without asking Redmine.
+
+        :rtype: bool
+        '''
+        return time.time() < self.expires
+
+    @property
+    def validators(self):
+        '''
+        The headers used to revalidate a stale entry with Redmine.
+
+        :rtype: dict
+        '''
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class BaseCache(object):
+    '''The interface that every cache backend implements.'''
+
+    def get(self, key):
+        '''
+        Retrieves an entry, whether or not it is fresh.
+
+        :rtype: :class:`CacheEntry` or :data:`None`
+        '''
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        '''Stores an entry, replacing any existing entry for the key.'''
+        raise NotImplementedError
+
+    def delete(self, key):
+        '''Removes an entry, if it exists.'''
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix):
+        '''Removes every entry whose key starts with ``prefix``.'''
+        raise NotImplementedError
+
+    def clear(self):
+        '''Removes every entry.'''
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    '''
+    An in-process, thread-safe LRU cache. Parsed responses are kept along with
+    the raw ones, so a cache hit does not need to be parsed again.
+
+    :param int max_entries: The maximum number of entries kept before the
+                            least recently used ones are evicted
+    '''
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                # re-insert to mark as most recently used
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(BaseCache):
+    '''
+    An on-disk LRU cache, stored in a SQLite database. Only the raw responses
+    are stored, so they are parsed on every cache hit.
+
+    :param str filename: The path to the database file
+    :param int max_entries: The maximum number of entries kept before the
+                            least recently used ones are evicted
+    '''
+
+    def __init__(self, filename, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        with self._db:
+            self._db.execute('''CREATE TABLE IF NOT EXISTS response (
+                key TEXT PRIMARY KEY,
+                status INTEGER,
+                content BLOB,
+                expires REAL,
+                etag TEXT,
+                last_modified TEXT,
+                accessed REAL
+            )''')
+            self._db.execute('''CREATE INDEX IF NOT EXISTS response_accessed
+                                ON response (accessed)''')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM response')\
+                .fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            with self._db:
+                row = self._db.execute('''SELECT status, content, expires,
+                                                 etag, last_modified
+                                          FROM response WHERE key = ?''',
+                                       (key,)).fetchone()
+                if row is None:
+                    return None
+                self._db.execute('''UPDATE response SET accessed = ?
+                                    WHERE key = ?''', (time.time(), key))
+        status, content, expires, etag, last_modified = row
+        return CacheEntry(status, bytes(content), expires, etag,
+                          last_modified)
+
+    def set(self, key, entry):
+        with self._lock:
+            with self._db:
+                self._db.execute('''INSERT OR REPLACE INTO response
+                                    (key, status, content, expires, etag,
+                                     last_modified, accessed)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                                 (key, entry.status,
+                                  sqlite3.Binary(entry.content),
+                                  entry.expires, entry.etag,
+                                  entry.last_modified, time.time()))
+                self._db.execute('''DELETE FROM response WHERE key IN (
+                                        SELECT key FROM response
+                                        ORDER BY accessed DESC
+                                        LIMIT -1 OFFSET ?)''',
+                                 (self.max_entries,))
+
+    def delete(self, key):
+        with self._lock:
+            with self._db:
+                self._db.execute('DELETE FROM response WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace('!', '!!').replace('%', '!%')\
+            .replace('_', '!_')
+        with self._lock:
+            with self._db:
+                self._db.execute("""DELETE FROM response
+                                    WHERE key LIKE ? ESCAPE '!'""",
+                                 (escaped + '%',))
+
+    def clear(self):
+        with self._lock:
+            with self._db:
+                self._db.execute('DELETE FROM response')
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Connections to several Redmine instances from one process.
+
+By default, every manager (e.g. ``Issue.objects``) talks to the Redmine
+instance described by the global settings, :data:`snakemine.conf.settings`.
+A :class:`Client` carries its own settings instead, along with its own
+connection pool, and managers that are bound to it:
+
+.. code-block:: python
+
+   from snakemine.client import Client
+
+   main = Client(BASE_URI='https://redmine.example.com', API_KEY='...')
+   legacy = Client(BASE_URI='https://old.example.com', API_KEY='...',
+                   FORMAT='json')
+
+   for issue in main.issues.filter(assigned_to_id='me'):
+       print(issue.subject, issue.project.name)  # via main, too
+
+Resources retrieved via a client are saved, deleted and related to other
+resources via the same client. The rate limits, retry policy, metrics hooks
+and response cache of a client are taken from its settings; the person cache
+and rate limiters are shared by every client with the same ``BASE_URI``.
+Clients are thread-safe, so several instances can be queried in parallel.
+
+Clients can share a ``CACHE`` object, since responses are cached per
+``BASE_URI``. The :mod:`snakemine.aio` managers only use the global settings.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from .conf import Settings
+from .conf.global_settings import DEFAULT_SETTINGS
+from .issue import Issue
+from .people import get_cache as get_person_cache
+from .project import Project
+from .request import request_class
+import threading
+
+
+class Client(object):
+    '''
+    A connection to a Redmine instance.
+
+    :param settings: The settings to use. If not given, the keyword
+                     arguments are used as settings, on top of the defaults.
+    :type settings: :class:`snakemine.conf.Settings`
+    '''
+
+    def __init__(self, settings=None, **kwargs):
+        if settings is None:
+            settings = Settings(DEFAULT_SETTINGS)
+            settings.configure(**kwargs)
+        elif kwargs:
+            raise TypeError('Settings cannot be given both as an object and '
+                            'as keyword arguments')
+        #: The settings of the client
+        self.settings = settings
+        self._requests = {}
+        self._managers = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.settings.BASE_URI)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def request(self, fmt=None):
+        '''
+        The request handler for an API format.
+
+        :param str fmt: Defaults to the ``FORMAT`` setting
+        :rtype: :class:`snakemine.request.base.Request`
+        '''
+        if fmt is None:
+            fmt = self.settings.FORMAT
+        request = self._requests.get(fmt)
+        if request is None:
+            with self._lock:
+                request = self._requests.get(fmt)
+                if request is None:
+                    request = request_class(fmt)(self.settings)
+                    self._requests[fmt] = request
+        return request
+
+    def manager(self, cls):
+        '''
+        The manager of a resource class, bound to this client.
+
+        :param type cls: The :class:`snakemine.base.Resource` subclass
+        :rtype: :class:`snakemine.base.Manager`
+        '''
+        manager = self._managers.get(cls)
+        if manager is None:
+            with self._lock:
+                manager = self._managers.get(cls)
+                if manager is None:
+                    manager = type(cls.objects)(self)
+                    self._managers[cls] = manager
+        return manager
+
+    @property
+    def issues(self):
+        '''
+        The issue manager bound to this client.
+
+        :rtype: :class:`snakemine.issue.IssueManager`
+        '''
+        return self.manager(Issue)
+
+    @property
+    def projects(self):
+        '''
+        The project manager bound to this client.
+
+        :rtype: :class:`snakemine.project.ProjectManager`
+        '''
+        return self.manager(Project)
+
+    @property
+    def people(self):
+        '''
+        The cache of the people that this client's resources refer to.
+
+        :rtype: :class:`snakemine.people.PersonCache`
+        '''
+        return get_person_cache(self.settings)
+
+    def close(self):
+        '''Closes all of the pooled connections.'''
+        with self._lock:
+            requests = list(self._requests.values())
+        for request in requests:
+            request.close()
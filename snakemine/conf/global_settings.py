@@ -24,4 +24,54 @@ DEFAULT_SETTINGS = {
     'USERNAME': None,
     'PASSWORD': None,
     'API_KEY': None,
+    # The format used to talk to the Redmine API, either 'xml' or 'json'.
+    'FORMAT': 'xml',
+    # The maximum number of items requested per page. Redmine does not return
+    # more than 100 items per request.
+    'PAGE_SIZE': 100,
+    # The number of per-host connection pools to cache, and the maximum number
+    # of connections kept alive in each pool.
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 10,
+    # The maximum number of concurrent requests made by a parallel operation,
+    # such as QuerySet.concurrent().
+    'MAX_WORKERS': 4,
+    # Whether QuerySets parse each page incrementally as it is downloaded,
+    # instead of downloading and parsing it all at once (XML only). Streamed
+    # responses are not cached.
+    'STREAM_RESPONSES': False,
+    # Whether XML items are converted into compact, typed records (see
+    # snakemine.response.record) instead of being kept as lxml elements.
+    'COMPACT_RESPONSES': False,
+    # The response cache (see snakemine.cache), and how long its entries stay
+    # fresh, in seconds. CACHE_TTLS overrides CACHE_TTL per resource path.
+    'CACHE': None,
+    'CACHE_TTL': 60,
+    'CACHE_TTLS': {},
+    # The maximum number of users kept in the shared person cache (see
+    # snakemine.people), and how long each of them is kept, in seconds.
+    'PERSON_CACHE_SIZE': 1000,
+    'PERSON_CACHE_TTL': 3600,
+    # Callables that are called with a snakemine.metrics.RequestEvent after
+    # every API call.
+    'METRICS_HOOKS': [],
+    # Client-side rate limits (see snakemine.request.throttle): the maximum
+    # number of requests started per second (and the burst size), the
+    # maximum number of requests in flight, and whether that limit adapts to
+    # Redmine's error rate and response times.
+    'RATE_LIMIT': None,
+    'RATE_LIMIT_BURST': None,
+    'MAX_IN_FLIGHT': None,
+    'ADAPTIVE_CONCURRENCY': False,
+    'ADAPTIVE_LATENCY_TARGET': 2.0,
+    # How failed requests are retried (see snakemine.request.retry): the
+    # maximum number of attempts per request, the statuses and methods that
+    # are retried, whether network errors are retried, and the base and
+    # maximum delay between attempts, in seconds.
+    'RETRY_ATTEMPTS': 3,
+    'RETRY_STATUSES': (429, 502, 503, 504),
+    'RETRY_METHODS': ('get', 'put', 'delete'),
+    'RETRY_CONNECTION_ERRORS': True,
+    'RETRY_BACKOFF': 0.5,
+    'RETRY_BACKOFF_MAX': 30.0,
 }
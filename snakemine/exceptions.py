@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Exceptions raised when Redmine responds with an error.
+
+Every unsuccessful HTTP status is raised as a subclass of
+:class:`RedmineError`, once any retries (see :mod:`snakemine.request.retry`)
+have been exhausted::
+
+    RedmineError
+    +-- ClientError (4xx)
+    |   +-- Unauthorized (401)
+    |   +-- Forbidden (403)
+    |   +-- NotFound (404)
+    |   +-- ValidationError (422)
+    |   +-- TooManyRequests (429)
+    +-- ServerError (5xx)
+
+Network errors (connection failures, timeouts, etc.) are raised by
+:mod:`requests`.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+import json
+from lxml import etree
+
+
+class SnakemineError(Exception):
+    '''The base class of every snakemine exception.'''
+
+
+class RedmineError(SnakemineError):
+    '''
+    Redmine responded with an unsuccessful HTTP status.
+
+    :param int status: The HTTP status code
+    :param str method: The HTTP method, in lowercase
+    :param str path: The API path
+    :param bytes content: The response body
+    '''
+
+    def __init__(self, status, method, path, content=b''):
+        super(RedmineError, self).__init__(status, method, path)
+        self.status = status
+        self.method = method
+        self.path = path
+        self.content = content
+
+    def __str__(self):
+        return '%s %s: HTTP %d' % (self.method.upper(), self.path,
+                                   self.status)
+
+
+class ClientError(RedmineError):
+    '''The request was rejected by Redmine (a 4xx status).'''
+
+
+class Unauthorized(ClientError):
+    '''The credentials are missing or invalid (401).'''
+
+
+class Forbidden(ClientError):
+    '''The user is not allowed to access the resource (403).'''
+
+
+class NotFound(ClientError):
+    '''The resource does not exist (404).'''
+
+
+class ValidationError(ClientError):
+    '''The data sent to Redmine is invalid (422).'''
+
+    @property
+    def errors(self):
+        '''
+        The error messages sent by Redmine, in either format.
+
+        :rtype: :func:`list` of :func:`str`
+        '''
+        content = self.content
+        if not content:
+            return []
+        try:
+            return [error.text for error in
+                    etree.fromstring(content).findall('error')]
+        except etree.XMLSyntaxError:
+            pass
+        try:
+            return list(json.loads(content.decode('utf-8'))['errors'])
+        except (ValueError, KeyError, TypeError):
+            return []
+
+
+class TooManyRequests(ClientError):
+    '''Redmine (or a proxy in front of it) is rate limiting requests (429).'''
+
+
+class ServerError(RedmineError):
+    '''Redmine failed to handle the request (a 5xx status).'''
+
+
+STATUS_ERRORS = {
+    401: Unauthorized,
+    403: Forbidden,
+    404: NotFound,
+    422: ValidationError,
+    429: TooManyRequests,
+}
+
+
+def error_for_status(status, method, path, content=b''):
+    '''
+    Creates the exception for an unsuccessful HTTP status.
+
+    :rtype: :class:`RedmineError`
+    '''
+    cls = STATUS_ERRORS.get(status)
+    if cls is None:
+        cls = ServerError if status >= 500 else ClientError
+    return cls(status, method, path, content)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+An opt-in identity map for Redmine resources.
+
+Inside of an :class:`IdentityMap` context, every resource that is loaded is
+remembered by its class and ID. Subsequent calls to
+:meth:`snakemine.base.Manager.get` (and therefore relations like
+:attr:`snakemine.issue.Issue.project`) return the instance that was already
+loaded instead of requesting it from Redmine again:
+
+.. code-block:: python
+
+   from snakemine.identity import IdentityMap
+   from snakemine.issue import Issue
+
+   with IdentityMap():
+       for issue in Issue.objects.all():
+           print(issue.project.name)  # one request per distinct project
+
+The map is emptied when the context exits. Identity maps are per-thread, and
+can be nested; only the innermost map is used.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+import threading
+
+_local = threading.local()
+
+
+class IdentityMap(object):
+    '''Keeps track of loaded resources, keyed by their class and ID.'''
+
+    def __init__(self):
+        self._resources = {}
+
+    @classmethod
+    def current(cls):
+        '''
+        The innermost active identity map for the current thread.
+
+        :rtype: :class:`IdentityMap` or :data:`None`
+        '''
+        stack = getattr(_local, 'stack', None)
+        if stack:
+            return stack[-1]
+        return None
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.stack.remove(self)
+        self.clear()
+
+    def __contains__(self, resource):
+        return self._resource_key(resource) in self._resources
+
+    def __len__(self):
+        return len(self._resources)
+
+    def _key(self, cls, resource_id, client=None):
+        return (cls, client, int(resource_id))
+
+    def _resource_key(self, resource):
+        # Resources with the same ID from different Redmine instances are
+        # different resources
+        client = getattr(resource._manager, '_client', None)
+        return self._key(type(resource), resource.id, client)
+
+    def get(self, cls, resource_id, client=None):
+        '''
+        Retrieves a loaded resource.
+
+        :param type cls: The :class:`snakemine.base.Resource` subclass
+        :param int resource_id: The resource's ID. Other identifiers are
+                                never found.
+        :param client: The client that the resource was loaded with, if any
+        :type client: :class:`snakemine.client.Client`
+        :rtype: :class:`snakemine.base.Resource` or :data:`None`
+        '''
+        try:
+            key = self._key(cls, resource_id, client)
+        except ValueError:
+            # e.g. a project identifier. The resource is remembered by its
+            # ID once it has been loaded.
+            return None
+        return self._resources.get(key)
+
+    def add(self, resource):
+        '''
+        Remembers a resource. If a resource with the same class and ID has
+        already been loaded, that instance is kept and returned instead.
+
+        :rtype: :class:`snakemine.base.Resource`
+        '''
+        return self._resources.setdefault(self._resource_key(resource),
+                                          resource)
+
+    def discard(self, resource):
+        '''Forgets a resource, if it was loaded.'''
+        self._resources.pop(self._resource_key(resource), None)
+
+    def clear(self):
+        '''Forgets every loaded resource.'''
+        self._resources.clear()
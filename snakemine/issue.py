@@ -20,8 +20,29 @@ Handling of `Redmine issues`_.
 .. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
 '''
 
+from ._concurrency import ordered_map
 from .base import Manager, Resource
+from .exceptions import NotFound
 from .project import Project
+from .query import ChangedSinceQuerySet
+import threading
+
+
+class _JournalBatch(object):
+    '''
+    The issues of a result set whose journals are retrieved together, when
+    the comments of any of them are first accessed.
+    '''
+
+    def __init__(self, manager, issues):
+        self._manager = manager
+        self._issues = issues
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            issues, self._issues = self._issues, []
+            self._manager._load_journals(issues)
 
 
 class IssueManager(Manager):
@@ -36,9 +57,104 @@ class IssueManager(Manager):
         return '/issues'
 
     @property
-    def _params(self):
+    def _resource_params(self):
+        # Only collections are retrieved without their journals, since
+        # Redmine sends them cheaply along with a single issue.
+        return {'include': 'journals'}
+
+    _prefetchable = frozenset(['journals', 'parent', 'project'])
+
+    def _prefetch(self, resources, lookups, cache):
+        if 'journals' in lookups:
+            batch = _JournalBatch(self, resources)
+            for issue in resources:
+                issue._journal_batch = batch
+        if 'project' in lookups:
+            self._prefetch_projects(resources, cache)
+        if 'parent' in lookups:
+            self._prefetch_parents(resources, cache)
+
+    def _prefetch_projects(self, issues, cache):
+        manager = self._manager_for(Project)
+        projects = cache.get('project')
+        if projects is None:
+            # Redmine cannot filter projects by ID, but there are usually
+            # few enough of them to retrieve them all, once per result set.
+            projects = cache['project'] = dict(
+                (int(project.id), project) for project in manager.all())
+        missing = set(issue.project_id for issue in issues) - set(projects)
+        if missing:
+            # e.g. archived projects, which are not listed
+            found = manager.in_bulk(missing)
+            for project_id in missing:
+                projects[project_id] = found.get(project_id)
+        for issue in issues:
+            issue._set_related('project', projects[issue.project_id])
+
+    def _prefetch_parents(self, issues, cache):
+        # Parents in the same batch are not retrieved again
+        parents = dict((int(issue.id), issue) for issue in issues)
+        retrieved = cache.setdefault('parent', {})
+        parents.update(retrieved)
+        missing = set(issue.parent_id for issue in issues
+                      if issue.parent_id) - set(parents)
+        if missing:
+            found = self.in_bulk(missing)
+            for parent_id in missing:
+                parents[parent_id] = retrieved[parent_id] = \
+                    found.get(parent_id)
+        for issue in issues:
+            if issue.parent_id:
+                issue._set_related('parent', parents[issue.parent_id])
+
+    def _fetch_journals(self, issue):
+        try:
+            return self._get(self._resource_path(issue.id),
+                             self._resource_params)[0]._response
+        except NotFound:
+            return None
+
+    def _load_journals(self, issues):
+        '''
+        Retrieves the journals of the given issues that do not have them yet,
+        up to ``MAX_WORKERS`` at a time. Redmine only sends journals for
+        individual issues, so this costs one request per issue.
+        '''
+        issues = [issue for issue in issues if issue._response is not None and
+                  not issue._response._has_journals()]
+        responses = ordered_map(self._fetch_journals, issues,
+                                self._settings.MAX_WORKERS)
+        for issue, response in zip(issues, responses):
+            comments = response.comments if response is not None else []
+            issue._response._set_comments(comments)
+
+    def changed_since(self, timestamp=None):
+        '''
+        Retrieves the issues (open or closed) that have been updated at or
+        after the given time, oldest first. The results are paged through
+        lazily.
+
+        .. code-block:: python
+
+           changes = Issue.objects.changed_since(last_cursor)
+           for issue in changes:
+               mirror(issue)
+           last_cursor = changes.cursor
+
+        :param timestamp: The time to retrieve changes from, usually the
+                          :attr:`~snakemine.query.ChangedSinceQuerySet.cursor`
+                          from a previous call. If :data:`None`, every issue
+                          is retrieved.
+        :type timestamp: :class:`datetime.datetime` or :func:`str`
+        :rtype: :class:`snakemine.query.ChangedSinceQuerySet`
+        '''
+        return ChangedSinceQuerySet(self, {'status_id': '*'}, timestamp)
+
+    def _in_bulk_params(self, ids):
         return {
-            'include': 'journals',
+            'issue_id': ','.join(str(issue_id) for issue_id in ids),
+            # include closed issues
+            'status_id': '*',
         }
 
 
@@ -47,6 +163,43 @@ class Issue(Resource):
 
     objects = IssueManager()
 
+    _journal_batch = None
+    #: The related resources that were prefetched, by name
+    _related = None
+
+    def _set_related(self, name, resource):
+        # Resources that could not be found are not set, so that accessing
+        # them raises NotFound like it would without prefetching
+        if resource is not None:
+            if self._related is None:
+                self._related = {}
+            self._related[name] = resource
+
+    @property
+    def comments(self):
+        '''
+        The comments (journals) on the issue. Issues retrieved via
+        :meth:`~snakemine.base.Manager.get` include them. Otherwise, they are
+        retrieved when first accessed, along with those of the rest of the
+        page if the results were retrieved via
+        :meth:`~snakemine.query.QuerySet.prefetch`. If the journals were
+        excluded via :meth:`~snakemine.query.QuerySet.only` or
+        :meth:`~snakemine.query.QuerySet.defer`, this is empty.
+
+        :rtype: :func:`list` of :class:`snakemine.response.base.Comment`
+        '''
+        response = self._response
+        if response is None:
+            return []
+        if not response._has_journals():
+            if self._fields is not None and 'journals' not in self._fields:
+                return []
+            if self._journal_batch is not None:
+                self._journal_batch.load()
+            if not response._has_journals():
+                self._manager._sync._load_journals([self])
+        return response.comments
+
     @property
     def parent(self):
         '''
@@ -55,7 +208,9 @@ class Issue(Resource):
         :rtype: :class:`Issue` or :data:`None`
         '''
         if self.parent_id:
-            return self.objects.get(self.parent_id)
+            if self._related is not None and 'parent' in self._related:
+                return self._related['parent']
+            return self._manager._sync.get(self.parent_id)
         else:
             return None
 
@@ -66,7 +221,10 @@ class Issue(Resource):
         '''
         # A project relation is required on an Issue, so there is no check to
         # see if ``project_id`` exists.
-        return Project.objects.get(self.project_id)
+        if self._related is not None and 'project' in self._related:
+            return self._related['project']
+        return self._manager._sync._manager_for(Project).get(
+            self.project_id)
 
     def __repr__(self):
         return '<%s: %s>' % (self.__class__.__name__, self.id)
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Request-level instrumentation.
+
+Every callable in the ``METRICS_HOOKS`` setting is called with a
+:class:`RequestEvent` once each API call has been sent and its response
+parsed. Two hooks are included:
+
+* :class:`Aggregator`, which keeps counters and histograms in memory, and can
+  render them in the Prometheus_ text format (e.g. for the node exporter's
+  textfile collector, via :meth:`Aggregator.write_prometheus`)
+* :class:`StatsD`, which sends one set of StatsD_ lines per event to a UDP
+  socket or writes them to a file
+
+.. code-block:: python
+
+   from snakemine.metrics import Aggregator, StatsD
+
+   AGGREGATOR = Aggregator()
+   METRICS_HOOKS = [AGGREGATOR, StatsD(('localhost', 8125))]
+
+A hook that raises an exception is logged, and does not affect the API call.
+
+.. _Prometheus: https://prometheus.io/
+.. _StatsD: https://github.com/etsy/statsd
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from __future__ import division
+
+from . import conf
+from ._compat import items, total_seconds
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+timer = getattr(time, 'perf_counter', time.time)
+
+#: The default histogram buckets for durations, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                    10.0)
+
+
+class RequestEvent(object):
+    '''
+    The measurements of a single API call. Durations are in seconds, and are
+    :data:`None` if they were not measured.
+
+    :param str fmt: The API format
+    :param str method: The HTTP method, in lowercase
+    :param str path: The API path, e.g. ``/issues/1``
+    :param str resource: The resource path, e.g. ``/issues``
+    :param hooks: The hooks that are called when the call is finished.
+                  Defaults to the ``METRICS_HOOKS`` setting.
+    '''
+
+    __slots__ = ('format', 'method', 'path', 'resource', 'status',
+                 'bytes_received', 'dns_time', 'connect_time', 'ttfb',
+                 'total_time', 'parse_time', 'objects', 'cached', 'attempts',
+                 '_start', '_hooks')
+
+    def __init__(self, fmt, method, path, resource, hooks=None):
+        self.format = fmt
+        self.method = method
+        self.path = path
+        self.resource = resource
+        #: The HTTP status code
+        self.status = None
+        #: The size of the response body, as received
+        self.bytes_received = 0
+        #: Not available from :mod:`requests`, so always :data:`None`
+        self.dns_time = None
+        #: Not available from :mod:`requests`, so always :data:`None`
+        self.connect_time = None
+        #: The time until the response headers were received
+        self.ttfb = None
+        #: The time spent in the API call, including parsing
+        self.total_time = None
+        #: The time spent parsing the response. For streamed responses, this
+        #: includes downloading the response body.
+        self.parse_time = 0.0
+        #: The number of objects parsed from the response
+        self.objects = 0
+        #: Whether the response came from the cache without asking Redmine
+        self.cached = False
+        #: The number of times the request was sent, including retries
+        self.attempts = 1
+        self._start = timer()
+        self._hooks = hooks
+
+    def record_response(self, response, stream=False):
+        '''Records the measurements of a :class:`requests.Response`.'''
+        self.status = response.status_code
+        self.ttfb = total_seconds(response.elapsed)
+        if not stream:
+            self.bytes_received = len(response.content)
+
+    def record_parse(self, start, result):
+        '''Records the parsing of a response that started at ``start``.'''
+        self.parse_time += timer() - start
+        if result is not None:
+            self.objects = len(result)
+
+    def finish(self):
+        '''Records the total time, and calls the ``METRICS_HOOKS``.'''
+        self.total_time = timer() - self._start
+        emit(self, self._hooks)
+
+    def __repr__(self):
+        return '<%s: %s %s %s>' % (self.__class__.__name__,
+                                   self.method.upper(), self.path,
+                                   self.status)
+
+
+def start_event(fmt, method, path, resource, settings=None):
+    '''
+    Creates a :class:`RequestEvent` if any hooks are configured.
+
+    :param settings: The settings to read ``METRICS_HOOKS`` from. Defaults
+                     to the global settings.
+    :rtype: :class:`RequestEvent` or :data:`None`
+    '''
+    if settings is None:
+        settings = conf.settings
+    hooks = settings.METRICS_HOOKS
+    if hooks:
+        return RequestEvent(fmt, method, path, resource, hooks)
+    return None
+
+
+def emit(event, hooks=None):
+    '''
+    Calls each hook with an event.
+
+    :param hooks: Defaults to the ``METRICS_HOOKS`` setting
+    '''
+    if hooks is None:
+        hooks = conf.settings.METRICS_HOOKS
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception:
+            logger.exception('Metrics hook %r failed', hook)
+
+
+class Histogram(object):
+    '''
+    A cumulative histogram, like Prometheus'.
+
+    :param buckets: The upper bounds of the buckets, in increasing order
+    '''
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q):
+        '''
+        Estimates a quantile (between 0 and 1) as the upper bound of the
+        bucket that contains it.
+
+        :rtype: float or :data:`None`
+        '''
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return float('inf')
+
+
+def _labels(**kwargs):
+    return '{%s}' % ','.join('%s="%s"' % (k, v)
+                             for k, v in sorted(items(kwargs)))
+
+
+class Aggregator(object):
+    '''
+    A thread-safe hook that aggregates events in memory, by method, resource
+    path and status.
+
+    :param buckets: The histogram buckets for durations, in seconds
+    '''
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''Discards every measurement.'''
+        with self._lock:
+            #: The number of requests, by method, resource and status
+            self.requests = {}
+            #: The number of bytes received, by method and resource
+            self.bytes_received = {}
+            #: The number of objects parsed, by method and resource
+            self.objects = {}
+            #: The number of cache hits, by resource
+            self.cache_hits = {}
+            #: The number of retried attempts, by method and resource
+            self.retries = {}
+            #: Histograms of the total, TTFB and parse times, by method and
+            #: resource
+            self.histograms = {'total': {}, 'ttfb': {}, 'parse': {}}
+
+    def _observe(self, name, key, value):
+        if value is not None:
+            histogram = self.histograms[name].get(key)
+            if histogram is None:
+                histogram = self.histograms[name][key] = \
+                    Histogram(self.buckets)
+            histogram.observe(value)
+
+    def __call__(self, event):
+        key = (event.method, event.resource)
+        status_key = key + (event.status,)
+        with self._lock:
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self.bytes_received[key] = self.bytes_received.get(key, 0) + \
+                event.bytes_received
+            self.objects[key] = self.objects.get(key, 0) + event.objects
+            if event.cached:
+                self.cache_hits[event.resource] = \
+                    self.cache_hits.get(event.resource, 0) + 1
+            if event.attempts > 1:
+                self.retries[key] = self.retries.get(key, 0) + \
+                    event.attempts - 1
+            self._observe('total', key, event.total_time)
+            self._observe('ttfb', key, event.ttfb)
+            self._observe('parse', key, event.parse_time)
+
+    def prometheus(self, prefix='snakemine'):
+        '''
+        Renders the measurements in the Prometheus text exposition format.
+
+        :rtype: str
+        '''
+        lines = []
+
+        def counter(name, help_text, values, label_names):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s counter' % (prefix, name))
+            for key, value in sorted(items(values), key=str):
+                labels = _labels(**dict(zip(label_names, key)))
+                lines.append('%s_%s%s %s' % (prefix, name, labels, value))
+
+        with self._lock:
+            counter('requests_total', 'API calls.', self.requests,
+                    ('method', 'resource', 'status'))
+            counter('response_bytes_total', 'Bytes received.',
+                    self.bytes_received, ('method', 'resource'))
+            counter('objects_total', 'Objects parsed.', self.objects,
+                    ('method', 'resource'))
+            counter('cache_hits_total', 'Responses served from the cache.',
+                    dict(((k,), v) for k, v in items(self.cache_hits)),
+                    ('resource',))
+            counter('retries_total', 'Retried attempts.', self.retries,
+                    ('method', 'resource'))
+            for name, help_text in (('total', 'Time spent in API calls.'),
+                                    ('ttfb', 'Time to the response headers.'),
+                                    ('parse', 'Time spent parsing.')):
+                metric = '%s_%s_seconds' % (prefix, name)
+                lines.append('# HELP %s %s' % (metric, help_text))
+                lines.append('# TYPE %s histogram' % metric)
+                for (method, resource), histogram in \
+                        sorted(items(self.histograms[name])):
+                    for bound, count in zip(histogram.buckets,
+                                            histogram.counts):
+                        lines.append('%s_bucket%s %d' % (
+                            metric, _labels(method=method, resource=resource,
+                                            le=repr(float(bound))), count))
+                    lines.append('%s_bucket%s %d' % (
+                        metric, _labels(method=method, resource=resource,
+                                        le='+Inf'), histogram.count))
+                    labels = _labels(method=method, resource=resource)
+                    lines.append('%s_sum%s %r' % (metric, labels,
+                                                  histogram.sum))
+                    lines.append('%s_count%s %d' % (metric, labels,
+                                                    histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, filename, prefix='snakemine'):
+        '''
+        Writes the measurements to a file in the Prometheus text format. The
+        file is replaced atomically, so that it is never read half-written.
+        '''
+        temp = '%s.%d.tmp' % (filename, os.getpid())
+        with open(temp, 'w') as f:
+            f.write(self.prometheus(prefix))
+        os.rename(temp, filename)
+
+
+class StatsD(object):
+    '''
+    A hook that reports each event as StatsD lines.
+
+    :param address: The ``(host, port)`` of the StatsD server, which the
+                    lines are sent to via UDP
+    :param fileobj: A file to write the lines to instead
+    :param str prefix: The prefix of the metric names
+    '''
+
+    def __init__(self, address=None, fileobj=None, prefix='snakemine'):
+        if (address is None) == (fileobj is None):
+            raise ValueError('Exactly one of address or fileobj is required')
+        self.address = address
+        self.fileobj = fileobj
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._socket = None
+        if address is not None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def lines(self, event):
+        '''
+        The StatsD lines for an event.
+
+        :rtype: list of str
+        '''
+        name = '%s.%s.%s' % (self.prefix, event.method,
+                             event.resource.strip('/').replace('/', '_'))
+        lines = ['%s.requests.%s:1|c' % (name, event.status),
+                 '%s.bytes:%d|c' % (name, event.bytes_received),
+                 '%s.objects:%d|c' % (name, event.objects)]
+        for metric in ('total_time', 'ttfb', 'parse_time'):
+            value = getattr(event, metric)
+            if value is not None:
+                lines.append('%s.%s:%.3f|ms' % (name, metric, value * 1000))
+        if event.cached:
+            lines.append('%s.cache_hits:1|c' % name)
+        if event.attempts > 1:
+            lines.append('%s.retries:%d|c' % (name, event.attempts - 1))
+        return lines
+
+    def __call__(self, event):
+        payload = '\n'.join(self.lines(event)) + '\n'
+        if self._socket is not None:
+            self._socket.sendto(payload.encode('utf-8'), self.address)
+        else:
+            with self._lock:
+                self.fileobj.write(payload)
+                self.fileobj.flush()
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
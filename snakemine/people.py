@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+The users referred to by Redmine resources (authors, assignees, etc.).
+
+Every :class:`Person` returned by e.g. :attr:`snakemine.issue.Issue.author`
+comes from a cache that is shared by every request to the same Redmine
+instance. It is bounded by the ``PERSON_CACHE_SIZE`` setting (the least
+recently used people are evicted first), and each entry expires
+``PERSON_CACHE_TTL`` seconds after it was stored. Only plain values are
+cached, so a cached person does not keep the response it came from alive.
+
+By default, a person only has the ``id`` and ``name`` that Redmine sends
+along with the resource that refers to them. Administrators can fill the
+cache with every user's details (``login``, ``mail``, etc.) in one pass:
+
+.. code-block:: python
+
+   from snakemine.people import get_cache
+
+   get_cache().warm()
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from . import conf
+from ._compat import OrderedDict
+from lxml import etree
+import threading
+import time
+
+
+class Person(object):
+    '''
+    A Redmine user, as referred to by another resource.
+
+    :param int id: The Redmine ID of the user
+    :param str name: The display name of the user
+    '''
+
+    __slots__ = ('id', 'name', 'login', 'firstname', 'lastname', 'mail')
+
+    def __init__(self, id, name=None, login=None, firstname=None,
+                 lastname=None, mail=None):
+        if name is None and (firstname or lastname):
+            name = ' '.join(part for part in (firstname, lastname) if part)
+        self.id = id
+        self.name = name
+        self.login = login
+        self.firstname = firstname
+        self.lastname = lastname
+        self.mail = mail
+
+    @classmethod
+    def from_element(cls, element):
+        '''Creates a person from a ``<user>`` element.'''
+        return cls(int(element.findtext('id')),
+                   login=element.findtext('login'),
+                   firstname=element.findtext('firstname'),
+                   lastname=element.findtext('lastname'),
+                   mail=element.findtext('mail'))
+
+    def _renamed(self, name):
+        return Person(self.id, name, self.login, self.firstname,
+                      self.lastname, self.mail)
+
+    def __eq__(self, other):
+        return isinstance(other, Person) and self.id == other.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return '<%s: %s, "%s">' % (self.__class__.__name__, self.id, self.name)
+
+
+class PersonCache(object):
+    '''
+    A thread-safe LRU cache of :class:`Person` objects, keyed by their ID.
+
+    :param int max_entries: The maximum number of people kept before the
+                            least recently used ones are evicted
+    :param float ttl: How long each person is kept, in seconds, or
+                      :data:`None` to keep them until they are evicted
+    :param settings: The settings of the Redmine instance that the people
+                     belong to, which :meth:`warm` uses by default
+    :type settings: :class:`snakemine.conf.Settings`
+    '''
+
+    def __init__(self, max_entries=1000, ttl=3600, settings=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._settings = settings
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, person_id):
+        entry = self._entries.pop(person_id, None)
+        if entry is None:
+            return None
+        person, expires = entry
+        if expires is not None and time.time() >= expires:
+            return None
+        # re-insert to mark as most recently used
+        self._entries[person_id] = entry
+        return person
+
+    def _set(self, person):
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        self._entries.pop(person.id, None)
+        self._entries[person.id] = (person, expires)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, person_id):
+        '''
+        Retrieves a person, if they are cached and have not expired.
+
+        :rtype: :class:`Person` or :data:`None`
+        '''
+        with self._lock:
+            return self._get(person_id)
+
+    def set(self, person):
+        '''Stores a person, replacing any existing entry for their ID.'''
+        with self._lock:
+            self._set(person)
+
+    def person(self, person_id, name=None):
+        '''
+        Retrieves a person, caching them if they are not cached yet. If the
+        cached name is out of date, it is replaced.
+
+        :param int person_id: The Redmine ID of the user
+        :param str name: The display name sent by Redmine, if any
+        :rtype: :class:`Person`
+        '''
+        with self._lock:
+            person = self._get(person_id)
+            if person is None:
+                person = Person(person_id, name)
+                self._set(person)
+            elif name is not None and person.name != name:
+                person = person._renamed(name)
+                self._set(person)
+            return person
+
+    def clear(self):
+        '''Removes every person.'''
+        with self._lock:
+            self._entries.clear()
+
+    def warm(self, settings=None):
+        '''
+        Caches every user (active, registered or locked), via
+        ``/users.xml``. Requires an administrator account.
+
+        :param settings: The settings of the Redmine instance to retrieve
+                         the users from. Defaults to the ones the cache was
+                         created with, if any, otherwise to the global
+                         settings.
+        :type settings: :class:`snakemine.conf.Settings`
+        :return: The number of users cached
+        :rtype: int
+        :raises snakemine.exceptions.Forbidden: if the account is not an
+                                                administrator
+        '''
+        from .request.xml import Request
+        if settings is None:
+            settings = self._settings
+        request = Request(settings)
+        limit = request.settings.PAGE_SIZE
+        offset = count = 0
+        try:
+            while True:
+                # An empty status includes every user, not just active ones
+                params = {'status': '', 'offset': offset, 'limit': limit}
+                response = request._send_request('get', '/users', params)
+                request._raise_for_status('get', '/users', response)
+                root = etree.fromstring(response.content)
+                users = root.findall('user')
+                for user in users:
+                    self.set(Person.from_element(user))
+                count += len(users)
+                # Redmine may send fewer users than were asked for
+                offset += len(users)
+                total_count = root.get('total_count')
+                if not users or total_count is None or \
+                        offset >= int(total_count):
+                    break
+        finally:
+            request.close()
+        return count
+
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def get_cache(settings=None):
+    '''
+    The person cache for a Redmine instance, shared by every request to it.
+
+    :param settings: The settings of the Redmine instance. Defaults to the
+                     global settings.
+    :type settings: :class:`snakemine.conf.Settings`
+    :rtype: :class:`PersonCache`
+    '''
+    if settings is None or settings is conf.settings:
+        # The global settings may be replaced, so they are not kept
+        owner = None
+        settings = conf.settings
+    else:
+        owner = settings
+    key = (settings.BASE_URI, settings.PERSON_CACHE_SIZE,
+           settings.PERSON_CACHE_TTL)
+    cache = _caches.get(key)
+    if cache is None:
+        with _lock:
+            cache = _caches.get(key)
+            if cache is None:
+                cache = _caches[key] = PersonCache(*key[1:], settings=owner)
+    return cache
+
+
+def get_person(person_id, name=None, cache=None):
+    '''
+    Retrieves a person from a cache (see :meth:`PersonCache.person`).
+
+    :param cache: The cache to use. Defaults to the one for the global
+                  settings.
+    :type cache: :class:`PersonCache`
+    :rtype: :class:`Person`
+    '''
+    if cache is None:
+        cache = get_cache()
+    return cache.person(person_id, name)
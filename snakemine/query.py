@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Lazy, paginated collections of Redmine resources.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from ._concurrency import ordered_map
+from .identity import IdentityMap
+from .response.base import FieldSelection
+from datetime import datetime
+from dateutil.parser import parse
+from dateutil.tz import tzutc
+from numbers import Integral
+
+
+class QuerySet(object):
+    '''
+    A Django-like lazy collection of Redmine resources.
+
+    Nothing is requested from Redmine until the ``QuerySet`` is iterated,
+    indexed, measured or counted. Iteration walks through the results one page
+    (of at most ``PAGE_SIZE`` items) at a time, and slicing sends the slice
+    bounds to Redmine as the ``offset``/``limit`` parameters.
+
+    Plain iteration does not keep the results around, so walking a large
+    result set only holds one page in memory at a time. Calling :func:`len`
+    (or :func:`list`) on the ``QuerySet`` retrieves and caches every result.
+
+    If the ``STREAM_RESPONSES`` setting is enabled, each page is parsed
+    incrementally as it is downloaded, so that only one item of the page is
+    held in memory at a time. Pages can also be retrieved concurrently via
+    :meth:`concurrent`.
+
+    :param manager: The :class:`snakemine.base.Manager` that retrieves
+                    the resources
+    :param dict params: The filters to send to Redmine
+    '''
+
+    def __init__(self, manager, params=None):
+        self._manager = manager
+        self._params = dict(params or {})
+        self._low = 0
+        self._high = None
+        self._result_cache = None
+        self._total_count = None
+        self._workers = 1
+        self._only = None
+        self._defer = frozenset()
+        self._prefetch = frozenset()
+
+    def __repr__(self):
+        return '<%s: %s %r>' % (self.__class__.__name__, self._manager._path,
+                                self._params)
+
+    def _clone(self):
+        qs = self.__class__(self._manager, self._params)
+        qs._low = self._low
+        qs._high = self._high
+        qs._workers = self._workers
+        qs._only = self._only
+        qs._defer = self._defer
+        qs._prefetch = self._prefetch
+        return qs
+
+    def _page_params(self, offset, limit):
+        params = dict(self._params)
+        params['offset'] = offset
+        params['limit'] = limit
+        return params
+
+    @property
+    def _fields(self):
+        if self._only is None and not self._defer:
+            return None
+        return FieldSelection(self._only, self._defer)
+
+    def _fetch_page(self, offset, limit):
+        params = self._page_params(offset, limit)
+        resources, total_count = self._manager._get_page(params=params,
+                                                         fields=self._fields)
+        if total_count is not None:
+            self._total_count = total_count
+        return resources
+
+    def _stream_page(self, offset, limit):
+        params = self._page_params(offset, limit)
+        resources, responses = self._manager._stream_page(
+            params=params, fields=self._fields)
+        for resource in resources:
+            yield resource
+        total_count = getattr(responses, 'total_count', None)
+        if total_count is not None:
+            self._total_count = total_count
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._result_cache = list(self.iterator())
+        return self._result_cache
+
+    def _fetch_remaining(self, offset, page_size):
+        end = self._total_count
+        if self._high is not None:
+            end = min(end, self._high)
+        bounds = [(start, min(page_size, end - start))
+                  for start in range(offset, end, page_size)]
+        pages = ordered_map(lambda b: self._fetch_page(*b), bounds,
+                            self._workers)
+        for (start, limit), page in zip(bounds, pages):
+            for resource in page:
+                yield resource
+            # A short page leaves a gap before the next one, which is
+            # retrieved sequentially
+            start += len(page)
+            limit -= len(page)
+            while page and limit > 0:
+                page = self._fetch_page(start, limit)
+                for resource in page:
+                    yield resource
+                start += len(page)
+                limit -= len(page)
+
+    def iterator(self):
+        '''
+        Iterates through the results page by page, without caching them.
+        '''
+        identity_map = IdentityMap.current()
+        batch = []
+        cache = {}
+        page_size = self._manager._settings.PAGE_SIZE
+        for resource in self._iterate_pages():
+            if identity_map is not None:
+                resource = identity_map.add(resource)
+            if not self._prefetch:
+                yield resource
+                continue
+            batch.append(resource)
+            if len(batch) >= page_size:
+                self._manager._prefetch(batch, self._prefetch, cache)
+                for resource in batch:
+                    yield resource
+                batch = []
+        if batch:
+            self._manager._prefetch(batch, self._prefetch, cache)
+            for resource in batch:
+                yield resource
+
+    def _iterate_pages(self):
+        settings = self._manager._settings
+        page_size = settings.PAGE_SIZE
+        stream = settings.STREAM_RESPONSES
+        offset = self._low
+        while self._high is None or offset < self._high:
+            limit = page_size
+            if self._high is not None:
+                limit = min(limit, self._high - offset)
+            if stream:
+                page = self._stream_page(offset, limit)
+            else:
+                page = self._fetch_page(offset, limit)
+            count = 0
+            for resource in page:
+                count += 1
+                yield resource
+            offset += count
+            if self._total_count is None:
+                # Redmine did not send pagination metadata, so a short page
+                # is the only sign that there are no more results.
+                if count < limit:
+                    break
+            elif not count or offset >= self._total_count:
+                break
+            elif self._workers > 1:
+                # Now that the total is known, the remaining pages are
+                # independent of each other. Redmine caps the page size, so
+                # they are as large as the first one, not PAGE_SIZE.
+                for resource in self._fetch_remaining(offset, count):
+                    yield resource
+                break
+
+    def __iter__(self):
+        if self._result_cache is not None:
+            return iter(self._result_cache)
+        return self._iter_lazy()
+
+    def _iter_lazy(self):
+        # list() calls __len__ (which caches every result) after __iter__,
+        # but before the first item is requested
+        if self._result_cache is not None:
+            results = self._result_cache
+        else:
+            results = self.iterator()
+        for resource in results:
+            yield resource
+
+    def __len__(self):
+        return len(self._fetch_all())
+
+    def __bool__(self):
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        return bool(list(self[:1]))
+
+    __nonzero__ = __bool__
+
+    def __getitem__(self, k):
+        if not isinstance(k, (slice, Integral)):
+            raise TypeError('QuerySet indices must be integers or slices')
+        if isinstance(k, slice):
+            start, stop = k.start, k.stop
+        else:
+            start, stop = k, None
+        if (start is not None and start < 0) or \
+           (stop is not None and stop < 0):
+            raise ValueError('Negative indexing is not supported.')
+
+        if self._result_cache is not None:
+            return self._result_cache[k]
+
+        if isinstance(k, slice):
+            qs = self._clone()
+            qs._low = self._low + (start or 0)
+            if stop is not None:
+                qs._high = self._low + stop
+                if self._high is not None:
+                    qs._high = min(qs._high, self._high)
+            if k.step is not None:
+                return list(qs)[::k.step]
+            return qs
+        else:
+            qs = self[k:k + 1]
+            results = list(qs.iterator())
+            if not results:
+                raise IndexError('QuerySet index out of range')
+            return results[0]
+
+    def all(self):
+        '''
+        Creates a copy of the ``QuerySet``.
+
+        :rtype: :class:`QuerySet`
+        '''
+        return self._clone()
+
+    def concurrent(self, workers=None):
+        '''
+        Creates a ``QuerySet`` that, once the first page has been retrieved,
+        retrieves the remaining pages in parallel. The results are still
+        returned in order.
+
+        :param int workers: The maximum number of concurrent requests.
+                            Defaults to the ``MAX_WORKERS`` setting.
+        :rtype: :class:`QuerySet`
+        '''
+        qs = self._clone()
+        qs._workers = workers or self._manager._settings.MAX_WORKERS
+        return qs
+
+    def only(self, *fields):
+        '''
+        Creates a ``QuerySet`` that only parses the given fields (and ``id``)
+        of each result. Associated data that is not needed, like issue
+        journals, is not requested from Redmine. Accessing a field that was
+        not parsed raises :class:`AttributeError`.
+
+        :rtype: :class:`QuerySet`
+        '''
+        qs = self._clone()
+        qs._only = frozenset(fields)
+        return qs
+
+    def defer(self, *fields):
+        '''
+        Creates a ``QuerySet`` that does not parse the given fields of each
+        result. Associated data that is deferred, like issue journals, is not
+        requested from Redmine.
+
+        :rtype: :class:`QuerySet`
+        '''
+        qs = self._clone()
+        qs._defer = self._defer | frozenset(fields)
+        return qs
+
+    def prefetch(self, *lookups):
+        '''
+        Creates a ``QuerySet`` whose results share the retrieval of their
+        related data, one page of results at a time. For issues:
+
+        * ``journals``: accessing the comments of one issue retrieves the
+          journals of every issue in the page, up to ``MAX_WORKERS`` at a
+          time (Redmine only sends journals for individual issues)
+        * ``project``: every project is retrieved (via pagination) before the
+          first page is returned
+        * ``parent``: the parents of the issues in each page are retrieved
+          via :meth:`snakemine.base.Manager.in_bulk`, unless they are in the
+          same page
+
+        .. code-block:: python
+
+           issues = Issue.objects.all().prefetch_related('project', 'parent')
+           for issue in issues:
+               print(issue.project.name, issue.parent)
+
+        Related resources that cannot be found are retrieved again (and
+        raise :class:`snakemine.exceptions.NotFound`) when they are accessed.
+        If the ``STREAM_RESPONSES`` setting is enabled, each page is held in
+        memory before its first result is returned.
+
+        :raises ValueError: if the resource has no such related data
+        :rtype: :class:`QuerySet`
+        '''
+        invalid = set(lookups) - self._manager._prefetchable
+        if invalid:
+            raise ValueError('Cannot prefetch %s' %
+                             ', '.join(sorted(invalid)))
+        qs = self._clone()
+        qs._prefetch = self._prefetch | frozenset(lookups)
+        return qs
+
+    #: An alias of :meth:`prefetch`, named after Django's
+    prefetch_related = prefetch
+
+    def filter(self, **kwargs):
+        '''
+        Creates a ``QuerySet`` with the given filters added to the existing
+        ones. The keyword arguments are sent to Redmine as query parameters.
+
+        :rtype: :class:`QuerySet`
+        '''
+        if self._low or self._high is not None:
+            raise TypeError('Cannot filter a query once a slice has been '
+                            'taken.')
+        qs = self._clone()
+        qs._params.update(kwargs)
+        return qs
+
+    def count(self):
+        '''
+        The number of results. If Redmine sends pagination metadata, this only
+        retrieves a single item instead of the entire result set.
+
+        :rtype: int
+        '''
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        self._fetch_page(self._low, 1)
+        if self._total_count is None:
+            return len(self)
+        total_count = self._total_count
+        if self._high is not None:
+            total_count = min(total_count, self._high)
+        return max(0, total_count - self._low)
+
+
+def _to_datetime(value):
+    if not isinstance(value, datetime):
+        value = parse(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tzutc())
+    return value
+
+
+class ChangedSinceQuerySet(QuerySet):
+    '''
+    A :class:`QuerySet` of resources updated at or after a given time, sorted
+    by their update time, that keeps track of the newest update time seen
+    while iterating.
+
+    Save :attr:`cursor` after iterating, and pass it to the next
+    ``changed_since()`` call to only retrieve what has changed in between.
+
+    Unless the ``QuerySet`` is sliced, the results are paged through by update
+    time instead of by offset: each page after the first one starts at the
+    newest update time of the previous page, skipping the resources that were
+    already returned. A resource that is updated while the results are being
+    paged through therefore does not shift the others out of the next page,
+    but it may be returned twice (once per update time).
+
+    :param manager: The :class:`snakemine.base.Manager` that retrieves
+                    the resources
+    :param params: The filters to send to Redmine
+    :param cursor: The time to retrieve changes from. A naive
+                   :class:`datetime.datetime` is assumed to be in UTC.
+    :type cursor: :class:`datetime.datetime` or :func:`str`
+    '''
+
+    def __init__(self, manager, params=None, cursor=None):
+        super(ChangedSinceQuerySet, self).__init__(manager, params)
+        if cursor is not None:
+            cursor = _to_datetime(cursor)
+            self._params['updated_on'] = _updated_since(cursor)
+        self._params['sort'] = 'updated_on'
+        #: The newest update time seen so far (timezone-aware), or the
+        #: starting time if nothing has been seen yet.
+        self.cursor = cursor
+
+    def _clone(self):
+        qs = super(ChangedSinceQuerySet, self)._clone()
+        qs.cursor = self.cursor
+        return qs
+
+    #: The fields that the pagination and the cursor are based on
+    _required = frozenset(['id', 'updated_on'])
+
+    def only(self, *fields):
+        '''
+        Like :meth:`QuerySet.only`, except that ``updated_on`` is always
+        parsed too.
+        '''
+        return super(ChangedSinceQuerySet, self).only(
+            *(frozenset(fields) | self._required))
+
+    def defer(self, *fields):
+        '''
+        Like :meth:`QuerySet.defer`.
+
+        :raises ValueError: if ``id`` or ``updated_on`` is deferred
+        '''
+        required = self._required.intersection(fields)
+        if required:
+            raise ValueError('Cannot defer %s, which changed_since() needs' %
+                             ', '.join(sorted(required)))
+        return super(ChangedSinceQuerySet, self).defer(*fields)
+
+    def _iterate_pages(self):
+        if self._low or self._high is not None:
+            for resource in super(ChangedSinceQuerySet, self)._iterate_pages():
+                yield resource
+            return
+        settings = self._manager._settings
+        limit = settings.PAGE_SIZE
+        stream = settings.STREAM_RESPONSES
+        page_qs = self._clone()
+        since = None
+        # The IDs of the resources updated at ``since`` that were already
+        # returned, which the next page starts with again
+        seen = set()
+        offset = 0
+        while True:
+            if stream:
+                page = page_qs._stream_page(offset, limit)
+            else:
+                page = page_qs._fetch_page(offset, limit)
+            count = 0
+            newest = since
+            at_newest = set()
+            for resource in page:
+                count += 1
+                resource_id = int(resource.id)
+                updated_on = _to_datetime(resource.updated_on)
+                if updated_on == since and resource_id in seen:
+                    continue
+                if newest is None or updated_on > newest:
+                    newest = updated_on
+                    at_newest = set()
+                if updated_on == newest:
+                    at_newest.add(resource_id)
+                yield resource
+            total_count = page_qs._total_count
+            if total_count is None:
+                if count < limit:
+                    break
+            elif not count or offset + count >= total_count:
+                break
+            if newest == since:
+                # A whole page of resources were updated at the same time,
+                # so the only way forward is by offset.
+                seen |= at_newest
+                offset += count
+            else:
+                since, seen, offset = newest, at_newest, 0
+                page_qs = self._clone()
+                page_qs._params['updated_on'] = _updated_since(since)
+
+    def iterator(self):
+        for resource in super(ChangedSinceQuerySet, self).iterator():
+            updated_on = _to_datetime(resource.updated_on)
+            if self.cursor is None or updated_on > self.cursor:
+                self.cursor = updated_on
+            yield resource
+
+
+def _updated_since(timestamp):
+    return timestamp.astimezone(tzutc()).strftime('>=%Y-%m-%dT%H:%M:%SZ')
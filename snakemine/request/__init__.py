@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+HTTP request handlers, one module per API format.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from importlib import import_module
+
+#: The supported values of the ``FORMAT`` setting
+FORMATS = ('xml', 'json')
+
+
+def request_class(fmt):
+    '''
+    Retrieves the request class for an API format.
+
+    :param str fmt: One of :data:`FORMATS`
+    :raises ValueError: if the format is not supported
+    :rtype: subclass of :class:`snakemine.request.base.Request`
+    '''
+    if fmt not in FORMATS:
+        raise ValueError('Unsupported format: {0!r}'.format(fmt))
+    return import_module('{0}.{1}'.format(__name__, fmt)).Request
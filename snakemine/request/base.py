@@ -19,18 +19,91 @@ Base HTTP Request handler.
 .. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
 '''
 
+from . import retry, throttle
+from .. import conf, exceptions, metrics
+from .._compat import items, urlencode
+from ..cache import CacheEntry
+from ..people import get_cache as get_person_cache
+from ..response.base import ResponseList
 import requests
-from .. import conf
+from requests.adapters import HTTPAdapter
+import threading
+import time
 
 
 class Request(object):
-    '''Handles requests to the Redmine API.'''
+    '''
+    Handles requests to the Redmine API.
+
+    Each ``Request`` owns a :class:`requests.Session`, so connections to
+    Redmine are kept alive and pooled between API calls. The size of the
+    connection pool is determined by the ``POOL_CONNECTIONS`` and
+    ``POOL_MAXSIZE`` settings.
+
+    ``GET`` responses are cached if the ``CACHE`` setting is set (see
+    :mod:`snakemine.cache`). Each API call is reported to the
+    ``METRICS_HOOKS`` (see :mod:`snakemine.metrics`). Requests are rate
+    limited according to the settings described in
+    :mod:`snakemine.request.throttle`, and retried according to the ones
+    described in :mod:`snakemine.request.retry`. Unsuccessful responses are
+    raised as :class:`snakemine.exceptions.RedmineError` subclasses.
+
+    A ``Request`` can be used by several threads at once: the parameters
+    passed to it are never modified, and its session is shared.
+
+    :param settings: The settings of the Redmine instance to talk to.
+                     Defaults to the global settings.
+    :type settings: :class:`snakemine.conf.Settings`
+    '''
+
+    def __init__(self, settings=None):
+        self._settings = settings
+        self._requests_session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def settings(self):
+        '''The settings that the request is sent with.'''
+        if self._settings is None:
+            return conf.settings
+        return self._settings
+
+    @property
+    def _people(self):
+        return get_person_cache(self.settings)
+
+    @property
+    def _session(self):
+        # Created lazily, because the settings are usually not configured
+        # when the managers (and therefore their requests) are created.
+        session = self._requests_session
+        if session is None:
+            with self._session_lock:
+                session = self._requests_session
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.settings.POOL_CONNECTIONS,
+                        pool_maxsize=self.settings.POOL_MAXSIZE)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._requests_session = session
+        return session
+
+    def close(self):
+        '''Closes all of the pooled connections.'''
+        with self._session_lock:
+            session = self._requests_session
+            self._requests_session = None
+        if session is not None:
+            session.close()
 
     @property
     def _auth(self):
-        username = conf.settings.USERNAME
-        password = conf.settings.PASSWORD
-        api_key = conf.settings.API_KEY
+        settings = self.settings
+        username = settings.USERNAME
+        password = settings.PASSWORD
+        api_key = settings.API_KEY
         if username:
             if api_key:
                 password = 'unused'
@@ -38,27 +111,189 @@ class Request(object):
         else:
             return None
 
-    def _send_request(self, method, path, params={}, data=None):
-        headers = {}
+    def _prepare(self, method, path, params, headers=None):
+        '''
+        Determines the URI, query parameters and headers of a request.
+        Shared with :mod:`snakemine.aio`.
+        '''
+        params = dict(params or {})
+        headers = dict(headers or {})
         if method in ('post', 'put'):
             headers['Content-Type'] = self._content_type
-        uri = '%s%s.%s' % (conf.settings.BASE_URI, path, self._format)
-        api_key = conf.settings.API_KEY
+        settings = self.settings
+        uri = '%s%s.%s' % (settings.BASE_URI, path, self._format)
+        api_key = settings.API_KEY
         if api_key:
             params['key'] = api_key
-        return getattr(requests, method)(uri, params=params, data=data,
-                                         auth=self._auth, headers=headers)
+        return uri, params, headers
+
+    def _send_request(self, method, path, params=None, data=None,
+                      headers=None, stream=False, event=None):
+        uri, params, headers = self._prepare(method, path, params, headers)
+        policy = retry.RetryPolicy.from_settings(self.settings)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._send_once(method, uri, params, data,
+                                           headers, stream)
+            except retry.CONNECTION_ERRORS as e:
+                if not policy.should_retry(method, attempt, error=e):
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                if not policy.should_retry(method, attempt,
+                                           response.status_code):
+                    break
+                delay = policy.delay(attempt,
+                                     response.headers.get('Retry-After'))
+                response.close()
+            time.sleep(delay)
+        if event is not None:
+            event.attempts = attempt
+            event.record_response(response, stream)
+        return response
 
-    def _send(self, method, path, params={}, data=None):
+    def _send_once(self, method, uri, params, data, headers, stream):
+        limiter = throttle.get_throttle(self.settings)
+        if limiter is None:
+            return self._session.request(method, uri, params=params,
+                                         data=data, auth=self._auth,
+                                         headers=headers, stream=stream)
+        limiter.acquire()
+        status = None
+        start = throttle.timer()
+        try:
+            response = self._session.request(method, uri, params=params,
+                                             data=data, auth=self._auth,
+                                             headers=headers, stream=stream)
+            status = response.status_code
+            return response
+        finally:
+            limiter.release(status, throttle.timer() - start)
+
+    def _raise_for_status(self, method, path, response):
+        if response.status_code >= 400:
+            raise exceptions.error_for_status(response.status_code, method,
+                                              path, response.content)
+
+    def _start_event(self, method, path):
+        return metrics.start_event(self._format, method, path,
+                                   self._resource_prefix(path),
+                                   self.settings)
+
+    def _parse_timed(self, event, method, status, content, fields=None):
+        if event is None:
+            return self._parse(method, status, content, fields)
+        start = metrics.timer()
+        result = self._parse(method, status, content, fields)
+        event.record_parse(start, result)
+        return result
+
+    def _encode(self, data):
         raise NotImplementedError()
 
-    def get(self, path, params={}):
-        return self._send('get', path, params)
+    def _parse(self, method, status, content, fields=None):
+        raise NotImplementedError()
+
+    def _resource_prefix(self, path):
+        return '/%s' % path.lstrip('/').split('/')[0]
+
+    def _cache_key(self, path, params, fields=None):
+        query = urlencode(sorted((k, v) for k, v in items(params or {})
+                                 if k != 'key'))
+        # Clients of several Redmine instances may share a cache
+        key = '%s%s.%s?%s' % (self.settings.BASE_URI, path, self._format,
+                              query)
+        if fields is not None:
+            key = '%s#%s' % (key, fields)
+        return key
+
+    def _cache_ttl(self, path):
+        settings = self.settings
+        return settings.CACHE_TTLS.get(self._resource_prefix(path),
+                                       settings.CACHE_TTL)
+
+    def _send_cached(self, cache, path, params, fields=None, event=None):
+        key = self._cache_key(path, params, fields)
+        entry = cache.get(key)
+        if entry is None or not entry.fresh:
+            headers = entry.validators if entry is not None else None
+            response = self._send_request('get', path, params=params,
+                                          headers=headers, event=event)
+            status = response.status_code
+            expires = time.time() + self._cache_ttl(path)
+            if status == 304 and entry is not None:
+                # Not modified, so the cached response is still valid
+                entry.expires = expires
+                entry.etag = response.headers.get('ETag', entry.etag)
+            elif status == 200:
+                entry = CacheEntry(status, response.content, expires,
+                                   response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'))
+            else:
+                cache.delete(key)
+                self._raise_for_status('get', path, response)
+                return status, self._parse_timed(event, 'get', status,
+                                                 response.content, fields)
+            if entry.parsed is None:
+                entry.parsed = self._parse_timed(event, 'get', entry.status,
+                                                 entry.content, fields)
+            cache.set(key, entry)
+        else:
+            if event is not None:
+                event.status = entry.status
+                event.cached = True
+            if entry.parsed is None:
+                entry.parsed = self._parse_timed(event, 'get', entry.status,
+                                                 entry.content, fields)
+        parsed = entry.parsed
+        if parsed is not None:
+            if event is not None:
+                event.objects = len(parsed)
+            # The cached responses are shared by every caller, and resources
+            # set the attributes of their response when they are saved.
+            parsed = ResponseList((item._copy() for item in parsed),
+                                  parsed.total_count)
+        return entry.status, parsed
+
+    def _send(self, method, path, params=None, data=None, fields=None):
+        event = self._start_event(method, path)
+        if method in ('post', 'put') and isinstance(data, dict):
+            # Bodies that are already encoded are sent as they are
+            data = self._encode(data)
+        cache = self.settings.CACHE
+        try:
+            if cache is not None and method == 'get':
+                return self._send_cached(cache, path, params, fields, event)
+            response = self._send_request(method, path, params=params,
+                                          data=data, event=event)
+            if cache is not None and method != 'get':
+                cache.delete_prefix(self.settings.BASE_URI +
+                                    self._resource_prefix(path))
+            self._raise_for_status(method, path, response)
+            status = response.status_code
+            return status, self._parse_timed(event, method, status,
+                                             response.content, fields)
+        finally:
+            if event is not None:
+                event.finish()
+
+    def get(self, path, params=None, fields=None):
+        return self._send('get', path, params, fields=fields)
+
+    def stream(self, path, params=None, fields=None):
+        '''
+        Retrieves a collection, parsing the items as they are downloaded if
+        the format supports it. The ``total_count`` attribute of the result is
+        available once iteration has started.
+        '''
+        return self.get(path, params, fields)[1] or ResponseList()
 
-    def post(self, path, params={}, data=None):
+    def post(self, path, params=None, data=None):
         return self._send('post', path, params, data)
 
-    def put(self, path, params={}, data=None):
+    def put(self, path, params=None, data=None):
         return self._send('put', path, params, data)
 
     def delete(self, path):
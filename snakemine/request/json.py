@@ -22,14 +22,26 @@ HTTP Request handler using the JSON version of the API.
 from __future__ import absolute_import
 
 from . import base
+from .._compat import items
+from ..response.base import ResponseList
 from ..response.json import Response
 from datetime import date, datetime
 from dateutil.parser import parse
+from dateutil.tz import tzoffset, tzutc
 from decimal import Decimal
+import re
 try:
     import simplejson as json
 except ImportError:
     import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 DATE_FIELDS = [
     'due_date',
@@ -50,14 +62,125 @@ class JSONEncoder(json.JSONEncoder):
     '''
 
     def default(self, obj):
-        if isinstance(obj, date):
-            return obj.strftime(DATE_FORMAT)
-        elif isinstance(obj, datetime):
+        # datetime is a subclass of date, so it has to be checked first
+        if isinstance(obj, datetime):
             return obj.strftime(DATETIME_FORMAT)
+        elif isinstance(obj, date):
+            return obj.strftime(DATE_FORMAT)
+        elif isinstance(obj, Decimal):
+            return float(obj)
         return super(JSONEncoder, self).default(obj)
 
 
+ISO_DATETIME_RE = re.compile(r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)'
+                             r'(?:\.\d+)?(Z|[+-]\d\d:?\d\d)?$')
+UTC = tzutc()
+
+
+def parse_date(value):
+    '''
+    Parses a date in either the ``YYYY-MM-DD`` or the (Redmine 1.x)
+    ``YYYY/MM/DD`` format.
+
+    :rtype: :class:`datetime.date`
+    '''
+    if len(value) == 10:
+        try:
+            return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+        except ValueError:
+            pass
+    return parse(value).date()
+
+
+def parse_datetime(value):
+    '''
+    Parses a timestamp, using a fast path for ISO 8601 timestamps and falling
+    back to :func:`dateutil.parser.parse` for other formats (like the one used
+    by Redmine 1.x).
+
+    :rtype: :class:`datetime.datetime`
+    '''
+    match = ISO_DATETIME_RE.match(value)
+    if match is None:
+        return parse(value)
+    year, month, day, hour, minute, second, tz = match.groups()
+    if tz is None:
+        tzinfo = None
+    elif tz == 'Z':
+        tzinfo = UTC
+    else:
+        offset = int(tz[1:3]) * 3600 + int(tz[-2:]) * 60
+        tzinfo = tzoffset(None, -offset if tz[0] == '-' else offset)
+    return datetime(int(year), int(month), int(day), int(hour), int(minute),
+                    int(second), tzinfo=tzinfo)
+
+
+def parse_decimal(value):
+    return Decimal(repr(value))
+
+
+#: The fields of each kind of object that are converted after decoding
+SCHEMAS = {
+    'issue': {
+        'start_date': parse_date,
+        'due_date': parse_date,
+        'created_on': parse_datetime,
+        'updated_on': parse_datetime,
+        'closed_on': parse_datetime,
+        'estimated_hours': parse_decimal,
+        'spent_hours': parse_decimal,
+    },
+    'journal': {
+        'created_on': parse_datetime,
+    },
+    'project': {
+        'created_on': parse_datetime,
+        'updated_on': parse_datetime,
+    },
+}
+#: Lists of nested objects, and the kind of object they contain
+NESTED = {
+    'issue': {
+        'journals': 'journal',
+    },
+}
+COLLECTIONS = {
+    'issues': 'issue',
+    'projects': 'project',
+}
+
+
+def loads(content):
+    '''
+    Decodes a JSON document, using orjson or ujson if either is installed.
+    '''
+    if orjson is not None:
+        return orjson.loads(content)
+    elif ujson is not None:
+        return ujson.loads(content)
+    return json.loads(content.decode('utf-8'))
+
+
+def coerce(obj, kind):
+    '''
+    Converts the known fields of a decoded object (and its nested objects)
+    into Python types, according to the schema for its kind.
+    '''
+    for field, convert in items(SCHEMAS[kind]):
+        value = obj.get(field)
+        if value:
+            obj[field] = convert(value)
+    for field, nested_kind in items(NESTED.get(kind, {})):
+        for nested in obj.get(field) or ():
+            coerce(nested, nested_kind)
+    return obj
+
+
 def deserialize_json(dct):
+    '''
+    A :func:`json.loads` object hook that converts every date and timestamp
+    field, regardless of the kind of object. Superseded by :func:`coerce`.
+    '''
     for field in DATE_FIELDS:
         if field in dct and dct[field]:
             dct[field] = datetime.strptime(dct[field], DATE_FORMAT).date()
@@ -72,17 +195,31 @@ class Request(base.Request):
     _format = 'json'
     _content_type = 'application/json'
 
-    def _send(self, method, path, params={}, data=None):
-        response = self._send_request(method, path, params=params, data=data)
+    def _encode(self, data):
+        return json.dumps({data['object']: data['data']}, cls=JSONEncoder)
+
+    def _parse(self, method, status, content, fields=None):
         result = None
-        if response.status_code == 200:
-            result = json.loads(response.text, object_hook=deserialize_json,
-                                parse_float=Decimal)
-        if isinstance(result, list):
-            result = [Response(r) for r in result]
-        else:
-            result = [Response(result)]
-        return response.status_code, result
+        if status in (200, 201) and method not in ('put', 'delete'):
+            document = loads(content)
+            result = ResponseList(total_count=document.get('total_count'))
+            for key, kind in items(COLLECTIONS):
+                if key in document:
+                    objs = document[key]
+                    break
+            else:
+                kind = next((k for k in SCHEMAS if k in document), None)
+                objs = [document[kind]] if kind else []
+            people = self._people
+            for obj in objs:
+                if fields is not None:
+                    obj = dict((k, v) for k, v in items(obj) if k in fields)
+                result.append(Response(coerce(obj, kind), people))
+        return result
 
     def post_object(self, path, data):
+        '''
+        Sends ``data`` as the JSON body of a ``POST`` request, as is (unlike
+        :meth:`post`, which expects an ``object``/``data`` envelope).
+        '''
         return self.post(path, data=json.dumps(data, cls=JSONEncoder))
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Retrying requests that fail transiently.
+
+A request is retried if its method is in ``RETRY_METHODS`` (by default, only
+the idempotent ones) and either Redmine responds with one of the
+``RETRY_STATUSES`` or, if ``RETRY_CONNECTION_ERRORS`` is enabled, it cannot be
+reached. Each request is attempted at most ``RETRY_ATTEMPTS`` times.
+
+Between attempts, the request waits for a random ("full jitter") delay of up
+to ``RETRY_BACKOFF * 2 ** retry`` seconds, capped at ``RETRY_BACKOFF_MAX``.
+If Redmine sent a ``Retry-After`` header, that delay is used instead (also
+capped at ``RETRY_BACKOFF_MAX``).
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from .. import conf
+from email.utils import mktime_tz, parsedate_tz
+import random
+import requests
+import time
+
+#: The exceptions that are retried if ``RETRY_CONNECTION_ERRORS`` is enabled
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError,
+                     requests.exceptions.Timeout)
+
+
+def parse_retry_after(value):
+    '''
+    Parses a ``Retry-After`` header, which is either a number of seconds or
+    an HTTP date.
+
+    :rtype: float (the delay in seconds) or :data:`None` if it is invalid
+    '''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class RetryPolicy(object):
+    '''
+    Decides whether, and when, a request is retried.
+
+    :param int attempts: The maximum number of attempts per request
+    :param statuses: The HTTP statuses that are retried
+    :param bool connection_errors: Whether network errors are retried
+    :param methods: The (lowercase) HTTP methods that are retried
+    :param float backoff: The base delay, in seconds
+    :param float backoff_max: The maximum delay, in seconds
+    '''
+
+    def __init__(self, attempts=3, statuses=(429, 502, 503, 504),
+                 connection_errors=True, methods=('get', 'put', 'delete'),
+                 backoff=0.5, backoff_max=30.0):
+        self.attempts = attempts
+        self.statuses = frozenset(statuses)
+        self.connection_errors = connection_errors
+        self.methods = frozenset(methods)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    @classmethod
+    def from_settings(cls, settings=None):
+        '''Creates the policy described by the ``RETRY_*`` settings.'''
+        if settings is None:
+            settings = conf.settings
+        return cls(settings.RETRY_ATTEMPTS, settings.RETRY_STATUSES,
+                   settings.RETRY_CONNECTION_ERRORS, settings.RETRY_METHODS,
+                   settings.RETRY_BACKOFF, settings.RETRY_BACKOFF_MAX)
+
+    def should_retry(self, method, attempt, status=None, error=None):
+        '''
+        Whether to retry a request after an unsuccessful attempt.
+
+        :param str method: The HTTP method, in lowercase
+        :param int attempt: The number of attempts made so far
+        :param int status: The HTTP status of the response, if any
+        :param Exception error: The exception raised, if any
+        :rtype: bool
+        '''
+        if attempt >= self.attempts or method not in self.methods:
+            return False
+        if error is not None:
+            return self.connection_errors and \
+                isinstance(error, CONNECTION_ERRORS)
+        return status in self.statuses
+
+    def delay(self, attempt, retry_after=None):
+        '''
+        How long to wait before the next attempt, in seconds.
+
+        :param int attempt: The number of attempts made so far
+        :param str retry_after: The ``Retry-After`` header, if any
+        :rtype: float
+        '''
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = random.uniform(0, self.backoff * 2 ** (attempt - 1))
+        return min(delay, self.backoff_max)
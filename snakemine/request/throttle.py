@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Client-side rate limiting, so that parallel API calls do not overload
+Redmine.
+
+The limits are set via the following settings, and are shared by every
+request to the same Redmine instance:
+
+* ``RATE_LIMIT``: the maximum number of requests started per second, with
+  bursts of up to ``RATE_LIMIT_BURST`` requests (a token bucket)
+* ``MAX_IN_FLIGHT``: the maximum number of requests in progress at once
+* ``ADAPTIVE_CONCURRENCY``: if enabled, the in-flight limit is adjusted
+  AIMD-style: it grows by one request per round trip while Redmine responds
+  normally, and is halved when a request fails, gets a ``429`` or ``5xx``
+  response, or takes longer than ``ADAPTIVE_LATENCY_TARGET`` seconds. It
+  never exceeds ``MAX_IN_FLIGHT`` (or ``POOL_MAXSIZE``, if that is not set).
+
+A request is in flight until its response headers have been received.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from .. import conf
+import threading
+import time
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class TokenBucket(object):
+    '''
+    Limits the rate at which requests are started.
+
+    :param float rate: The number of tokens added per second
+    :param int burst: The maximum number of tokens that can be saved up
+    '''
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = max(1, burst or int(rate))
+        self._tokens = float(self.burst)
+        self._updated = timer()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        '''Waits until a token is available, and takes it.'''
+        while True:
+            with self._lock:
+                now = timer()
+                self._tokens = min(self.burst, self._tokens +
+                                   (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ConcurrencyLimit(object):
+    '''
+    Limits the number of requests in flight.
+
+    :param int limit: The maximum number of requests in flight
+    :param bool adaptive: Whether the limit is adjusted according to how
+                          Redmine responds, between 1 and ``limit``
+    :param float latency_target: In adaptive mode, the response time above
+                                 which Redmine is considered overloaded, in
+                                 seconds
+    '''
+
+    def __init__(self, limit, adaptive=False, latency_target=2.0):
+        self.max_limit = limit
+        self.adaptive = adaptive
+        self.latency_target = latency_target
+        #: The current limit. Only fractional in adaptive mode.
+        self.limit = float(limit)
+        self.in_flight = 0
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        '''Waits until fewer requests than the limit are in flight.'''
+        with self._condition:
+            while self.in_flight >= max(1, int(self.limit)):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, status, latency):
+        '''
+        Records that a request is no longer in flight.
+
+        :param status: The HTTP status code, or :data:`None` if the request
+                       failed
+        :param float latency: How long the request took, in seconds
+        '''
+        with self._condition:
+            self.in_flight -= 1
+            if self.adaptive:
+                self._adjust(status, latency)
+            self._condition.notify_all()
+
+    def _adjust(self, status, latency):
+        overloaded = status is None or status == 429 or status >= 500 or \
+            latency > self.latency_target
+        if overloaded:
+            now = timer()
+            # Only back off once per round trip, since the requests that were
+            # already in flight were sent before the previous decrease.
+            if self._last_decrease is None or \
+                    now - self._last_decrease >= latency:
+                self.limit = max(1.0, self.limit / 2)
+                self._last_decrease = now
+        else:
+            self.limit = min(float(self.max_limit), self.limit +
+                             1 / self.limit)
+
+
+class Throttle(object):
+    '''
+    Combines a :class:`TokenBucket` and a :class:`ConcurrencyLimit`, either of
+    which may be :data:`None`.
+    '''
+
+    def __init__(self, bucket=None, concurrency=None):
+        self.bucket = bucket
+        self.concurrency = concurrency
+
+    def acquire(self):
+        '''Waits until a request can be sent.'''
+        if self.concurrency is not None:
+            self.concurrency.acquire()
+        if self.bucket is not None:
+            try:
+                self.bucket.acquire()
+            except BaseException:
+                self.release(None, 0)
+                raise
+
+    def release(self, status, latency):
+        '''
+        Records the outcome of a request that was sent after
+        :meth:`acquire`.
+        '''
+        if self.concurrency is not None:
+            self.concurrency.release(status, latency)
+
+
+_throttles = {}
+_lock = threading.Lock()
+
+
+def get_throttle(settings=None):
+    '''
+    The throttle for a Redmine instance, shared by every request to it.
+
+    :param settings: The settings of the Redmine instance. Defaults to the
+                     global settings.
+    :type settings: :class:`snakemine.conf.Settings`
+    :rtype: :class:`Throttle` or :data:`None` if requests are not limited
+    '''
+    if settings is None:
+        settings = conf.settings
+    rate = settings.RATE_LIMIT
+    max_in_flight = settings.MAX_IN_FLIGHT
+    adaptive = settings.ADAPTIVE_CONCURRENCY
+    if not rate and not max_in_flight and not adaptive:
+        return None
+    if adaptive and not max_in_flight:
+        max_in_flight = settings.POOL_MAXSIZE
+    key = (settings.BASE_URI, rate, settings.RATE_LIMIT_BURST, max_in_flight,
+           adaptive, settings.ADAPTIVE_LATENCY_TARGET)
+    throttle = _throttles.get(key)
+    if throttle is None:
+        with _lock:
+            throttle = _throttles.get(key)
+            if throttle is None:
+                bucket = concurrency = None
+                if rate:
+                    bucket = TokenBucket(rate, settings.RATE_LIMIT_BURST)
+                if max_in_flight:
+                    concurrency = ConcurrencyLimit(
+                        max_in_flight, adaptive,
+                        settings.ADAPTIVE_LATENCY_TARGET)
+                throttle = _throttles[key] = Throttle(bucket, concurrency)
+    return throttle
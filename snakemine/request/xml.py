@@ -20,7 +20,10 @@ HTTP Request handler using the JSON version of the API.
 '''
 
 from . import base
+from .. import metrics
 from .._compat import items
+from ..response import record
+from ..response.base import ResponseList
 from ..response.xml import Response
 from lxml import etree, objectify
 
@@ -28,6 +31,12 @@ from lxml import etree, objectify
 # TODO pointers on element class lookup and custom element classes
 
 
+COLLECTIONS = {
+    'issues': 'issue',
+    'projects': 'project',
+}
+
+
 class Date():
     pass
 
@@ -36,34 +45,132 @@ class DateTime():
     pass
 
 
+def _select(element, fields):
+    if fields is not None:
+        for child in list(element.iterchildren()):
+            if child.tag not in fields:
+                element.remove(child)
+    return element
+
+
+class ResponseStream(object):
+    '''
+    Incrementally parses a collection from an HTTP response, yielding one
+    :class:`snakemine.response.xml.Response` (or compact record) per item.
+    Each item is copied into its own document, and the parsed elements are
+    discarded as soon as they have been copied, so memory usage does not
+    depend on the size of the collection.
+
+    :param response: A streamed :class:`requests.Response`
+    :param fields: The fields to parse
+    :type fields: :class:`snakemine.response.base.FieldSelection`
+    :param event: The metrics event that is finished once the response has
+                  been consumed
+    :type event: :class:`snakemine.metrics.RequestEvent`
+    :param bool compact: Whether the items are converted into compact
+                         records
+    :param people: The cache of the people that the items refer to
+    :type people: :class:`snakemine.people.PersonCache`
+    '''
+
+    def __init__(self, response, fields=None, event=None, compact=False,
+                 people=None):
+        self._response = response
+        self._fields = fields
+        self._event = event
+        self._compact = compact
+        self._people = people
+        #: The total number of items available, if known. This is set once
+        #: iteration has started.
+        self.total_count = None
+
+    def __iter__(self):
+        raw = self._response.raw
+        raw.decode_content = True
+        root = None
+        compact = self._compact
+        count = 0
+        start = metrics.timer()
+        try:
+            for event, element in etree.iterparse(raw,
+                                                  events=('start', 'end')):
+                if root is None:
+                    root = element
+                    total_count = root.get('total_count')
+                    if total_count is not None:
+                        self.total_count = int(total_count)
+                elif event == 'end' and element.getparent() is root and \
+                        element.tag == COLLECTIONS.get(root.tag):
+                    _select(element, self._fields)
+                    count += 1
+                    if compact:
+                        yield record.from_element(element, self._people)
+                    else:
+                        yield Response(objectify.fromstring(
+                            etree.tostring(element)), self._people)
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del root[0]
+        finally:
+            event = self._event
+            if event is not None:
+                self._event = None
+                event.bytes_received = raw.tell()
+            self._response.close()
+            if event is not None:
+                event.parse_time += metrics.timer() - start
+                event.objects = count
+                event.finish()
+
+
 class Request(base.Request):
     '''Handles requests to the Redmine API using XML.'''
     _format = 'xml'
     _content_type = 'application/xml'
 
-    def _send(self, method, path, params={}, data=None):
-        if method in ('post', 'put') and data:
-            obj = etree.Element(data['object'])
-            for k, v in items(data['data']):
-                attr = etree.SubElement(obj, k)
-                attr.text = str(v)
-            data = etree.tostring(obj, xml_declaration=True)
-        response = self._send_request(method, path, params=params, data=data)
-        status = response.status_code
+    def _encode(self, data):
+        obj = etree.Element(data['object'])
+        for k, v in items(data['data']):
+            attr = etree.SubElement(obj, k)
+            attr.text = str(v)
+        return etree.tostring(obj, xml_declaration=True)
+
+    def _parse(self, method, status, content, fields=None):
         result = None
         if status in (200, 201) and method not in ('put', 'delete'):
-            xml = objectify.fromstring(response.text.encode('utf-8'))
+            people = self._people
+            if self.settings.COMPACT_RESPONSES:
+                xml = etree.fromstring(content)
+
+                def wrap(element):
+                    return record.from_element(element, people)
+            else:
+                xml = objectify.fromstring(content)
+
+                def wrap(element):
+                    return Response(element, people)
             #print objectify.dump(xml)
-            result = []
-            if xml.tag == 'issues':
-                for issue in list(xml.issue):
-                    result.append(Response(issue))
-            elif xml.tag == 'issue':
-                result.append(Response(xml))
-            elif xml.tag == 'projects':
-                for project in list(xml.project):
-                    result.append(Response(project))
-            elif xml.tag == 'project':
-                result.append(Response(xml))
+            total_count = xml.get('total_count')
+            if total_count is not None:
+                total_count = int(total_count)
+            result = ResponseList(total_count=total_count)
+            if xml.tag in COLLECTIONS:
+                for item in xml.findall(COLLECTIONS[xml.tag]):
+                    result.append(wrap(_select(item, fields)))
+            elif xml.tag in ('issue', 'project'):
+                result.append(wrap(_select(xml, fields)))
             #print etree.tostring(xml, pretty_print=True)
-        return status, result
+        return result
+
+    def stream(self, path, params=None, fields=None):
+        event = self._start_event('get', path)
+        response = self._send_request('get', path, params=params, stream=True,
+                                      event=event)
+        if response.status_code != 200:
+            response.close()
+            if event is not None:
+                event.finish()
+            self._raise_for_status('get', path, response)
+            return ResponseList()
+        return ResponseStream(response, fields, event,
+                              self.settings.COMPACT_RESPONSES, self._people)
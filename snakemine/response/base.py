@@ -14,30 +14,92 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from ..people import Person  # noqa
+
+
+class FieldSelection(object):
+    '''
+    Which fields of a response should be parsed.
+
+    :param only: If given, only these fields (plus ``id``) are parsed
+    :param defer: These fields are not parsed
+    '''
+
+    #: Attribute names that are derived from another field
+    ALIASES = {
+        'comments': 'journals',
+        'parent_id': 'parent',
+        'project_id': 'project',
+    }
+
+    def __init__(self, only=None, defer=()):
+        if only is not None:
+            only = frozenset(self._resolve(only)) | frozenset(['id'])
+        self.only = only
+        self.defer = frozenset(self._resolve(defer)) - frozenset(['id'])
+
+    def _resolve(self, fields):
+        return [self.ALIASES.get(field, field) for field in fields]
+
+    def __contains__(self, field):
+        return (self.only is None or field in self.only) and \
+            field not in self.defer
+
+    def __str__(self):
+        only = ','.join(sorted(self.only or []))
+        return '%s-%s' % (only, ','.join(sorted(self.defer)))
+
+
+class ResponseList(list):
+    '''
+    A list of responses, plus the pagination metadata that Redmine sends with
+    collections.
+
+    :param iterable: The responses
+    :param int total_count: The total number of items available, if known
+    '''
+
+    def __init__(self, iterable=(), total_count=None):
+        super(ResponseList, self).__init__(iterable)
+        self.total_count = total_count
+
 
 class Response(object):
-    def __init__(self, data):
-        self._data = data
+    '''
+    The metadata of a resource item, as sent by Redmine.
 
-    def _get_person(self, person):
-        return self.person_cls.get(person)
+    :param data: The parsed item
+    :param people: The cache that the people the item refers to are
+                   retrieved from. Defaults to the one for the global
+                   settings.
+    :type people: :class:`snakemine.people.PersonCache`
+    '''
 
+    def __init__(self, data, people=None):
+        self._data = data
+        self._people = people
+        self._comments = None
 
-class Person(Response):
-    people = {}
+    def _copy(self):
+        '''
+        A copy whose attributes can be set without changing this response.
+        The parsed data itself is shared.
+        '''
+        response = self.__class__.__new__(self.__class__)
+        response.__dict__.update(self.__dict__)
+        return response
 
-    @classmethod
-    def get(cls, person):
-        pid = person.attrib['id']
-        if pid not in cls.people:
-            cls.people[pid] = cls(person)
-        return cls.people[pid]
+    def _has_journals(self):
+        '''Whether the journals of the item were sent by Redmine.'''
+        return self._comments is not None or hasattr(self, 'journals')
 
-    def __repr__(self):
-        return '<%s: %s, "%s">' % (self.__class__.__name__, self.id, self.name)
+    def _set_comments(self, comments):
+        '''Sets the comments of an item whose journals were not sent.'''
+        self._comments = comments
 
 
 class Comment(object):
+    __slots__ = ()
 
     def __repr__(self):
         return '<%s: %d by "%s [%s]">' % \
@@ -15,18 +15,67 @@
 # limitations under the License.
 
 from . import base
+from ..people import get_person
 
 
-class Person(base.Person):
+def _get_person(person, people):
+    return get_person(person['id'], person.get('name'), people)
+
+
+class Comment(base.Comment):
+    def __init__(self, journal, people=None):
+        self._journal = journal
+        self._people = people
+
     def __getattr__(self, key):
-        return self._data.get(key)
+        try:
+            return self._journal[key]
+        except KeyError:
+            raise AttributeError(key)
 
+    def __str__(self):
+        return str(self._journal.get('notes'))
 
-class Response(base.Response):
-    person_cls = Person
+    @property
+    def id(self):
+        return self._journal['id']
+
+    @property
+    def user(self):
+        return _get_person(self._journal['user'], self._people)
 
-    def __init__(self, data):
-        self._data = data
 
+class Response(base.Response):
     def __getattr__(self, key):
-        return self._data.get(key)
+        try:
+            return self._data[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    @property
+    def assigned_to(self):
+        return _get_person(self.__getattr__('assigned_to'), self._people)
+
+    @property
+    def author(self):
+        return _get_person(self.__getattr__('author'), self._people)
+
+    @property
+    def parent_id(self):
+        parent = self._data.get('parent')
+        if parent:
+            return parent['id']
+        return None
+
+    @property
+    def project_id(self):
+        return self.__getattr__('project')['id']
+
+    @property
+    def comments(self):
+        if self._comments is None:
+            journals = self._data.get('journals')
+            if journals is None:
+                return []
+            self._comments = [Comment(x, self._people) for x in journals]
+        return self._comments
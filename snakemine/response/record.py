@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+Compact, typed records for XML responses.
+
+When the ``COMPACT_RESPONSES`` setting is enabled, each item in an XML response
+is converted into a record as soon as it is parsed, instead of being kept as
+an lxml element. Records use ``__slots__``, store typed values (:func:`int`
+IDs, :class:`datetime.date` and :class:`datetime.datetime` objects, etc.) and
+do not keep any reference to the parsed document. Users (authors, assignees,
+etc.) are :class:`snakemine.people.Person` objects from the person cache, as
+of when the record was parsed.
+'''
+
+from . import base
+from ..people import get_person
+from datetime import datetime
+from dateutil.parser import parse
+
+
+def _int(text):
+    return int(text)
+
+
+def _float(text):
+    return float(text)
+
+
+def _date(text):
+    return datetime.strptime(text, '%Y-%m-%d').date()
+
+
+def _datetime(text):
+    return parse(text)
+
+
+def _text(text):
+    return text
+
+
+class Ref(object):
+    '''A reference to another Redmine object, e.g. a project or a user.'''
+
+    __slots__ = ('id', 'name')
+
+    def __init__(self, id, name=None):
+        self.id = id
+        self.name = name
+
+    @classmethod
+    def from_element(cls, element):
+        return cls(int(element.get('id')), element.get('name'))
+
+    def __eq__(self, other):
+        return isinstance(other, Ref) and self.id == other.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return '<%s: %s, "%s">' % (self.__class__.__name__, self.id, self.name)
+
+
+class CustomField(object):
+    '''The value of a custom field.'''
+
+    __slots__ = ('id', 'name', 'value')
+
+    def __init__(self, id, name, value):
+        self.id = id
+        self.name = name
+        self.value = value
+
+    @classmethod
+    def from_element(cls, element):
+        return cls(int(element.get('id')), element.get('name'),
+                   element.findtext('value'))
+
+    def __repr__(self):
+        return '<%s: %s, "%s">' % (self.__class__.__name__, self.id, self.name)
+
+
+class Record(object):
+    '''
+    Base class for records. Subclasses list their fields in ``_fields``, which
+    maps each field name to the function that converts its text. Fields that
+    are absent from the response are left unset, so accessing them raises
+    :class:`AttributeError`, just like accessing a missing child element.
+    Unknown elements and attributes set after parsing are kept in a
+    dictionary.
+    '''
+
+    __slots__ = ('_extra',)
+    _fields = {}
+    _refs = frozenset()
+    #: The references to users, which are looked up in the person cache
+    _people = frozenset()
+
+    def __getattr__(self, key):
+        try:
+            return object.__getattribute__(self, '_extra')[key]
+        except (AttributeError, KeyError):
+            raise AttributeError(key)
+
+    def __setattr__(self, key, value):
+        try:
+            object.__setattr__(self, key, value)
+        except AttributeError:
+            try:
+                extra = object.__getattribute__(self, '_extra')
+            except AttributeError:
+                extra = {}
+                object.__setattr__(self, '_extra', extra)
+            extra[key] = value
+
+    def _copy(self):
+        '''
+        A copy whose fields can be set without changing this record. The
+        values themselves are shared.
+        '''
+        record = self.__class__.__new__(self.__class__)
+        for cls in self.__class__.__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                try:
+                    value = object.__getattribute__(self, name)
+                except AttributeError:
+                    continue
+                if name == '_extra':
+                    value = dict(value)
+                object.__setattr__(record, name, value)
+        return record
+
+    def _set_child(self, child, people=None):
+        tag = child.tag
+        if tag in self._people:
+            value = get_person(int(child.get('id')), child.get('name'),
+                               people)
+        elif tag in self._refs:
+            value = Ref.from_element(child)
+        elif tag == 'custom_fields':
+            value = [CustomField.from_element(field) for field in child]
+        else:
+            text = child.text
+            if text is None or not text.strip():
+                value = None
+            else:
+                value = self._fields.get(tag, _text)(text)
+        setattr(self, tag, value)
+
+    @classmethod
+    def from_element(cls, element, people=None):
+        '''
+        Converts an lxml element into a record.
+
+        :param people: The cache of the people that the record refers to.
+                       Defaults to the one for the global settings.
+        :type people: :class:`snakemine.people.PersonCache`
+        '''
+        record = cls()
+        for child in element.iterchildren():
+            record._set_child(child, people)
+        return record
+
+
+class Journal(Record, base.Comment):
+    '''A compact journal entry (comment) on an issue.'''
+
+    __slots__ = ('id', 'user', 'notes', 'created_on')
+    _fields = {
+        'created_on': _datetime,
+    }
+    _people = frozenset(['user'])
+
+    def __str__(self):
+        return str(self.notes)
+
+    @classmethod
+    def from_element(cls, element, people=None):
+        record = super(Journal, cls).from_element(element, people)
+        record.id = int(element.get('id'))
+        return record
+
+
+class IssueRecord(Record):
+    '''A compact Redmine issue.'''
+
+    __slots__ = ('id', 'project', 'tracker', 'status', 'priority', 'author',
+                 'assigned_to', 'category', 'fixed_version', 'parent',
+                 'subject', 'description', 'start_date', 'due_date',
+                 'done_ratio', 'estimated_hours', 'spent_hours',
+                 'custom_fields', 'created_on', 'updated_on', 'closed_on',
+                 'journals')
+    _fields = {
+        'id': _int,
+        'done_ratio': _int,
+        'estimated_hours': _float,
+        'spent_hours': _float,
+        'start_date': _date,
+        'due_date': _date,
+        'created_on': _datetime,
+        'updated_on': _datetime,
+        'closed_on': _datetime,
+    }
+    _refs = frozenset(['project', 'tracker', 'status', 'priority',
+                       'category', 'fixed_version', 'parent'])
+    _people = frozenset(['author', 'assigned_to'])
+
+    def _set_child(self, child, people=None):
+        if child.tag == 'journals':
+            self.journals = [Journal.from_element(journal, people)
+                             for journal in child]
+        else:
+            super(IssueRecord, self)._set_child(child, people)
+
+    @property
+    def project_id(self):
+        return self.project.id
+
+    @property
+    def parent_id(self):
+        try:
+            return self.parent.id
+        except AttributeError:
+            return None
+
+    @property
+    def comments(self):
+        try:
+            return self.journals
+        except AttributeError:
+            return []
+
+    def _has_journals(self):
+        return hasattr(self, 'journals')
+
+    def _set_comments(self, comments):
+        self.journals = comments
+
+
+class ProjectRecord(Record):
+    '''A compact Redmine project.'''
+
+    __slots__ = ('id', 'name', 'identifier', 'description', 'homepage',
+                 'parent', 'status', 'custom_fields', 'created_on',
+                 'updated_on')
+    _fields = {
+        'id': _int,
+        'status': _int,
+        'created_on': _datetime,
+        'updated_on': _datetime,
+    }
+    _refs = frozenset(['parent'])
+
+
+RECORDS = {
+    'issue': IssueRecord,
+    'project': ProjectRecord,
+}
+
+
+def from_element(element, people=None):
+    '''
+    Converts an ``<issue>`` or ``<project>`` element into a record.
+
+    :param people: The cache of the people that the record refers to
+    :type people: :class:`snakemine.people.PersonCache`
+    '''
+    return RECORDS[element.tag].from_element(element, people)
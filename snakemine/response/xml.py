@@ -15,16 +15,18 @@
 # limitations under the License.
 
 from . import base
+from ..people import get_person
 
 
-class Person(base.Person):
-    def __getattr__(self, key):
-        return self._data.attrib[key]
+def _get_person(element, people):
+    return get_person(int(element.attrib['id']), element.attrib.get('name'),
+                      people)
 
 
 class Comment(base.Comment):
-    def __init__(self, journal):
+    def __init__(self, journal, people=None):
         self._journal = journal
+        self._people = people
 
     def __getattr__(self, key):
         return getattr(self._journal, key)
@@ -38,37 +40,39 @@ class Comment(base.Comment):
 
     @property
     def user(self):
-        return Person.get(self._journal.user)
+        return _get_person(self._journal.user, self._people)
 
 
 class Response(base.Response):
-    person_cls = Person
-
     def __getattr__(self, key):
         return getattr(self._data, key)
 
     @property
     def assigned_to(self):
-        return self._get_person(self._data.assigned_to)
+        return _get_person(self._data.assigned_to, self._people)
 
     @property
     def author(self):
-        return self._get_person(self._data.author)
+        return _get_person(self._data.author, self._people)
 
     @property
     def parent_id(self):
         try:
-            return self.parent.attrib['id']
+            return int(self.parent.attrib['id'])
         except Exception:
             return None
 
     @property
     def project_id(self):
-        return self.project.attrib['id']
+        return int(self.project.attrib['id'])
 
     @property
     def comments(self):
-        try:
-            return [Comment(x) for x in list(self.journals.journal)]
-        except AttributeError:
-            return []
+        if self._comments is None:
+            try:
+                journals = self.journals
+            except AttributeError:
+                return []
+            self._comments = [Comment(x, self._people)
+                              for x in journals.findall('journal')]
+        return self._comments
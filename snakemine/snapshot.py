@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''\
+An offline snapshot of projects, issues and journals, stored in SQLite.
+
+A snapshot is filled, and then kept current, by :meth:`Snapshot.sync`, which
+only retrieves the issues that have changed since the previous sync (see
+:meth:`snakemine.issue.IssueManager.changed_since`). Queries can then be
+answered locally, via :meth:`snakemine.base.Manager.using`:
+
+.. code-block:: python
+
+   from snakemine.issue import Issue
+   from snakemine.snapshot import Snapshot
+
+   snapshot = Snapshot('redmine.db')
+   snapshot.sync(project_ids=[1, 2])
+   local = Issue.objects.using(snapshot)
+   for issue in local.filter(project_id=1, assigned_to_id=5):
+       print(issue.subject, issue.comments)
+
+Issues are indexed by project, status, assignee and update time. Local
+queries support the following filters, each of which accepts a single value
+or a comma-separated list of values: ``id``, ``issue_id``, ``project_id``,
+``status_id``, ``tracker_id``, ``assigned_to_id``, ``author_id`` and
+``parent_id``. ``updated_on`` accepts Redmine's ``>=`` and ``<=`` operators.
+Unlike Redmine, issues are returned regardless of their status unless
+``status_id`` is given, since a snapshot does not know which statuses are
+closed. Issues that are deleted from Redmine remain in the snapshot.
+
+.. moduleauthor:: Mark Lee <snakemine@lazymalevolence.com>
+'''
+
+from ._compat import items
+from ._concurrency import ordered_map
+from .exceptions import NotFound
+from .issue import Issue, IssueManager
+from .people import get_cache as get_person_cache
+from .project import Project, ProjectManager
+from .query import _to_datetime
+from .request import json as json_request
+from .response.json import Response
+from datetime import date, datetime
+from decimal import Decimal
+from dateutil.tz import tzutc
+import json
+import sqlite3
+import threading
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS project (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER,
+    updated_on TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS issue (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER,
+    status_id INTEGER,
+    tracker_id INTEGER,
+    assigned_to_id INTEGER,
+    author_id INTEGER,
+    parent_id INTEGER,
+    updated_on TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS issue_project ON issue (project_id);
+CREATE INDEX IF NOT EXISTS issue_status ON issue (status_id);
+CREATE INDEX IF NOT EXISTS issue_assigned_to ON issue (assigned_to_id);
+CREATE INDEX IF NOT EXISTS issue_updated_on ON issue (updated_on);
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY,
+    issue_id INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS journal_issue ON journal (issue_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+#: The local filters supported for each table, and the column they query
+FILTERS = {
+    'issue': {
+        'id': 'id',
+        'issue_id': 'id',
+        'project_id': 'project_id',
+        'status_id': 'status_id',
+        'tracker_id': 'tracker_id',
+        'assigned_to_id': 'assigned_to_id',
+        'author_id': 'author_id',
+        'parent_id': 'parent_id',
+    },
+    'project': {
+        'id': 'id',
+        'parent_id': 'parent_id',
+    },
+}
+SORTABLE = frozenset(['id', 'updated_on'])
+
+
+def _timestamp(value):
+    return _to_datetime(value).astimezone(tzutc()).strftime(
+        '%Y-%m-%dT%H:%M:%SZ')
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return _timestamp(obj)
+    elif isinstance(obj, date):
+        return obj.isoformat()
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(repr(obj))
+
+
+def _dumps(data):
+    return json.dumps(data, default=_default, separators=(',', ':'))
+
+
+def _ref_id(data, key):
+    ref = data.get(key)
+    return ref['id'] if ref else None
+
+
+class _JSONManagerMixin(object):
+    # Snapshots always talk to Redmine in JSON, so that the stored data is
+    # the same whatever the FORMAT setting is.
+
+    @property
+    def _request(self):
+        if self._client is not None:
+            return self._client.request('json')
+        request = self._requests.get('json')
+        if request is None:
+            request = self._requests.setdefault('json',
+                                                json_request.Request())
+        return request
+
+
+class _IssueManager(_JSONManagerMixin, IssueManager):
+    pass
+
+
+class _ProjectManager(_JSONManagerMixin, ProjectManager):
+    pass
+
+
+class Snapshot(object):
+    '''
+    A local copy of (part of) a Redmine instance.
+
+    :param str filename: The path to the SQLite database. It is created if it
+                         does not exist.
+    :param client: The client to sync from. Defaults to the global settings.
+    :type client: :class:`snakemine.client.Client`
+    '''
+
+    def __init__(self, filename, client=None):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        with self._db:
+            self._db.executescript(SCHEMA)
+        self._issues = _IssueManager(client)
+        self._projects = _ProjectManager(client)
+
+    def close(self):
+        '''Closes the database.'''
+        self._db.close()
+
+    def _get_meta(self, key):
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                               (key,)).fetchone()
+        return row[0] if row else None
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def cursor(self, project_ids=None):
+        '''
+        The time of the newest update retrieved by :meth:`sync` for the given
+        projects, as an ISO 8601 timestamp.
+
+        :rtype: :func:`str` or :data:`None` if they have never been synced
+        '''
+        with self._lock:
+            return self._get_meta(self._cursor_key(project_ids))
+
+    def _cursor_key(self, project_ids):
+        if project_ids is None:
+            return 'cursor'
+        return 'cursor:%s' % ','.join(str(pid) for pid in
+                                      sorted(project_ids))
+
+    def sync(self, project_ids=None, journals=True, workers=None):
+        '''
+        Retrieves the projects, and the issues (open or closed) that have
+        changed since the previous sync.
+
+        :param project_ids: If given, only the issues of these projects (and
+                            their subprojects) are retrieved
+        :param bool journals: Whether to retrieve the journals of the changed
+                              issues. Redmine only sends journals for
+                              individual issues, so this costs one request
+                              per changed issue, made up to ``workers``
+                              (by default, ``MAX_WORKERS``) at a time.
+        :returns: The number of issues that were added or updated
+        :rtype: int
+        '''
+        if workers is None:
+            workers = self._issues._settings.MAX_WORKERS
+        self._store_projects(list(self._projects.all()))
+        key = self._cursor_key(project_ids)
+        with self._lock:
+            cursor = self._get_meta(key)
+        querysets = []
+        if project_ids is None:
+            querysets.append(self._issues.changed_since(cursor))
+        else:
+            for project_id in project_ids:
+                querysets.append(self._issues.changed_since(cursor)
+                                 .filter(project_id=project_id))
+        count = 0
+        cursors = []
+        page_size = self._issues._settings.PAGE_SIZE
+        for qs in querysets:
+            batch = []
+            for issue in qs:
+                batch.append(issue)
+                if len(batch) >= page_size:
+                    count += self._store_issues(batch, journals, workers)
+                    batch = []
+            count += self._store_issues(batch, journals, workers)
+            if qs.cursor is not None:
+                cursors.append(_timestamp(qs.cursor))
+        # Each project is retrieved up to its own cursor, so changes made to
+        # a project after it was retrieved may be older than the cursors of
+        # the projects that were retrieved later
+        newest = min(cursors) if cursors else None
+        if newest is not None:
+            with self._lock:
+                with self._db:
+                    self._db.execute('INSERT OR REPLACE INTO meta '
+                                     '(key, value) VALUES (?, ?)',
+                                     (key, newest))
+        return count
+
+    def _fetch_journals(self, issue_id):
+        path = self._issues._resource_path(issue_id)
+        try:
+            issue = self._issues._get(path, {'include': 'journals'})[0]
+        except NotFound:
+            # deleted since it was listed
+            return []
+        return issue._response._data.get('journals') or []
+
+    def _store_projects(self, projects):
+        rows = []
+        for project in projects:
+            data = project._response._data
+            rows.append((data['id'], _ref_id(data, 'parent'),
+                         _timestamp(data['updated_on'])
+                         if data.get('updated_on') else None,
+                         _dumps(data)))
+        with self._lock:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO project '
+                                     'VALUES (?, ?, ?, ?)', rows)
+
+    def _store_issues(self, issues, journals, workers):
+        if not issues:
+            return 0
+        issue_rows = []
+        for issue in issues:
+            data = dict(issue._response._data)
+            data.pop('journals', None)
+            issue_rows.append((data['id'], _ref_id(data, 'project'),
+                               _ref_id(data, 'status'),
+                               _ref_id(data, 'tracker'),
+                               _ref_id(data, 'assigned_to'),
+                               _ref_id(data, 'author'),
+                               _ref_id(data, 'parent'),
+                               _timestamp(data['updated_on']),
+                               _dumps(data)))
+        journal_rows = []
+        ids = [row[0] for row in issue_rows]
+        if journals:
+            fetched = ordered_map(self._fetch_journals, ids, workers)
+            for issue_id, issue_journals in zip(ids, fetched):
+                for journal in issue_journals:
+                    journal_rows.append((journal['id'], issue_id,
+                                         _dumps(journal)))
+        with self._lock:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO issue VALUES '
+                                     '(?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     issue_rows)
+                if journals:
+                    self._db.executemany(
+                        'DELETE FROM journal WHERE issue_id = ?',
+                        [(issue_id,) for issue_id in ids])
+                    self._db.executemany('INSERT INTO journal VALUES '
+                                         '(?, ?, ?)', journal_rows)
+        return len(issue_rows)
+
+    def manager(self, cls):
+        '''
+        A manager that answers queries from the snapshot.
+
+        :param type cls: :class:`snakemine.issue.Issue` or
+                         :class:`snakemine.project.Project`
+        :rtype: :class:`SnapshotManager`
+        '''
+        return SnapshotManager(self, cls)
+
+    def _load(self, table, rows):
+        objs = [json.loads(data) for data in rows]
+        if table == 'issue' and objs:
+            journals = dict((obj['id'], []) for obj in objs)
+            ids = list(journals)
+            # Stay below SQLite's limit on the number of parameters
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                sql = 'SELECT issue_id, data FROM journal WHERE issue_id ' \
+                      'IN (%s) ORDER BY id' % ','.join('?' * len(chunk))
+                for issue_id, data in self._execute(sql, chunk):
+                    journals[issue_id].append(json.loads(data))
+            for obj in objs:
+                obj['journals'] = journals[obj['id']]
+        people = get_person_cache(self._issues._settings)
+        return [Response(json_request.coerce(obj, table), people)
+                for obj in objs]
+
+
+class SnapshotManager(object):
+    '''
+    Answers queries about one kind of resource from a :class:`Snapshot`.
+    Created by :meth:`snakemine.base.Manager.using`.
+    '''
+
+    def __init__(self, snapshot, cls):
+        self._snapshot = snapshot
+        self._cls = cls
+        if issubclass(cls, Issue):
+            self._table = 'issue'
+        elif issubclass(cls, Project):
+            self._table = 'project'
+        else:
+            raise TypeError('Snapshots do not store %s' % cls.__name__)
+
+    def all(self):
+        '''
+        Retrieves every stored item.
+
+        :rtype: :class:`SnapshotQuerySet`
+        '''
+        return SnapshotQuerySet(self)
+
+    def filter(self, **kwargs):
+        '''
+        Retrieves the stored items that match the given filters.
+
+        :rtype: :class:`SnapshotQuerySet`
+        '''
+        return SnapshotQuerySet(self).filter(**kwargs)
+
+    def get(self, resource_id):
+        '''
+        Retrieves a stored item.
+
+        :raises snakemine.exceptions.NotFound: if the item is not in the
+                                               snapshot, like
+                                               :meth:`snakemine.base.Manager.get`
+        :rtype: :class:`snakemine.base.Resource`
+        '''
+        try:
+            return self.filter(id=resource_id)[0]
+        except IndexError:
+            raise NotFound(404, 'get', '/%ss/%s' % (self._table, resource_id))
+
+
+class SnapshotQuerySet(object):
+    '''
+    A lazy query against a :class:`Snapshot`, which supports the same
+    chaining, slicing and counting as :class:`snakemine.query.QuerySet`.
+    '''
+
+    def __init__(self, manager):
+        self._manager = manager
+        self._where = []
+        self._args = []
+        self._order = 'id'
+        self._low = 0
+        self._high = None
+        self._result_cache = None
+
+    def _clone(self):
+        qs = self.__class__(self._manager)
+        qs._where = list(self._where)
+        qs._args = list(self._args)
+        qs._order = self._order
+        qs._low = self._low
+        qs._high = self._high
+        return qs
+
+    def filter(self, **kwargs):
+        if self._low or self._high is not None:
+            raise TypeError('Cannot filter a query once a slice has been '
+                            'taken.')
+        qs = self._clone()
+        columns = FILTERS[self._manager._table]
+        for key, value in items(kwargs):
+            if key == 'sort':
+                field, _, direction = str(value).partition(':')
+                if field not in SORTABLE:
+                    raise ValueError('Cannot sort by %s' % field)
+                qs._order = '%s %s' % (field, 'DESC' if direction == 'desc'
+                                       else 'ASC')
+            elif key == 'updated_on':
+                value = str(value)
+                if value[:2] in ('>=', '<='):
+                    operator, value = value[:2], value[2:]
+                else:
+                    operator = '='
+                qs._where.append('updated_on %s ?' % operator)
+                qs._args.append(_timestamp(value))
+            elif key in columns:
+                if value == '*':
+                    continue
+                values = [int(v) for v in str(value).split(',')]
+                qs._where.append('%s IN (%s)' % (columns[key],
+                                                 ','.join('?' * len(values))))
+                qs._args.extend(values)
+            else:
+                raise ValueError('Unsupported filter: %s' % key)
+        return qs
+
+    def all(self):
+        return self._clone()
+
+    def _sql(self, columns):
+        sql = 'SELECT %s FROM %s' % (columns, self._manager._table)
+        if self._where:
+            sql += ' WHERE ' + ' AND '.join(self._where)
+        return sql
+
+    def _fetch(self):
+        sql = self._sql('data') + ' ORDER BY %s' % self._order
+        args = list(self._args)
+        if self._high is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            args.extend([max(0, self._high - self._low), self._low])
+        elif self._low:
+            sql += ' LIMIT -1 OFFSET ?'
+            args.append(self._low)
+        snapshot = self._manager._snapshot
+        rows = [row[0] for row in snapshot._execute(sql, args)]
+        cls = self._manager._cls
+        # Related resources are retrieved from the instance that was synced
+        manager = snapshot._issues._manager_for(cls)
+        return [cls(response, manager) for response in
+                snapshot._load(self._manager._table, rows)]
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._result_cache = self._fetch()
+        return self._result_cache
+
+    def __iter__(self):
+        return iter(self._fetch_all())
+
+    def __len__(self):
+        return len(self._fetch_all())
+
+    def __bool__(self):
+        return bool(self._fetch_all())
+
+    __nonzero__ = __bool__
+
+    def count(self):
+        '''
+        The number of matching items, counted by SQLite.
+
+        :rtype: int
+        '''
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        total = self._manager._snapshot._execute(self._sql('COUNT(*)'),
+                                                 self._args)[0][0]
+        if self._high is not None:
+            total = min(total, self._high)
+        return max(0, total - self._low)
+
+    def __getitem__(self, k):
+        if self._result_cache is not None:
+            return self._result_cache[k]
+        if isinstance(k, slice):
+            if (k.start is not None and k.start < 0) or \
+                    (k.stop is not None and k.stop < 0):
+                raise ValueError('Negative indexing is not supported.')
+            qs = self._clone()
+            qs._low = self._low + (k.start or 0)
+            if k.stop is not None:
+                qs._high = self._low + k.stop
+                if self._high is not None:
+                    qs._high = min(qs._high, self._high)
+            if k.step is not None:
+                return list(qs)[::k.step]
+            return qs
+        if k < 0:
+            raise ValueError('Negative indexing is not supported.')
+        results = list(self[k:k + 1])
+        if not results:
+            raise IndexError('SnapshotQuerySet index out of range')
+        return results[0]
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+import sys
+if sys.version_info < (2, 7):  # pragma: no cover
+    from unittest2 import skipIf
+else:  # pragma: no cover
+    from unittest import skipIf
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+ISSUES_XML = b'''<issues type="array" total_count="3" offset="%d" limit="2">
+%s
+</issues>'''
+ISSUE_XML = b'''<issue><id>%d</id><subject>Issue %d</subject>
+<project id="1" name="Test"/></issue>'''
+JOURNALS_XML = b'''<journals type="array"><journal id="5">
+<user id="2" name="John Smith"/><notes>Looks good</notes>
+<created_on>2014-01-02T10:00:00Z</created_on></journal></journals></issue>'''
+PROJECT_XML = b'<project><id>1</id><name>Test</name></project>'
+
+
+class FakeTransport(object):
+    '''Serves three issues, two per page.'''
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, uri, params, data, headers, auth):
+        self.requests.append((method, uri, params, data))
+        if uri.endswith('/issues.xml'):
+            offset = params['offset']
+            ids = range(offset + 1, min(offset + params['limit'], 3) + 1)
+            issues = b''.join(ISSUE_XML % (i, i) for i in ids)
+            content = ISSUES_XML % (offset, issues)
+        elif '/projects/' in uri:
+            content = PROJECT_XML
+        else:
+            content = ISSUE_XML % (1, 1)
+            if params.get('include') == 'journals':
+                content = content.replace(b'</issue>', JOURNALS_XML)
+        future = asyncio.Future()
+        future.set_result((200, content))
+        return future
+
+    def close(self):
+        future = asyncio.Future()
+        future.set_result(None)
+        return future
+
+
+@skipIf(sys.version_info < (3, 6), 'snakemine.aio requires Python 3.6+')
+class AsyncManagerTest(TestCase):
+
+    def setUp(self):
+        super(AsyncManagerTest, self).setUp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.transport = FakeTransport()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        with test_settings(BASE_URI='http://redmine.example.com',
+                           API_KEY='1234abcd', PAGE_SIZE=2):
+            return self.loop.run_until_complete(coro)
+
+    def manager(self):
+        from snakemine.aio import AsyncIssueManager
+        return AsyncIssueManager(self.transport)
+
+    def test_all(self):
+        issues = self.run_async(self.manager().all())
+        self.assertEqual([1, 2, 3], [issue.id for issue in issues])
+        self.assertEqual(2, len(self.transport.requests))
+        method, uri, params, data = self.transport.requests[0]
+        self.assertEqual('http://redmine.example.com/issues.xml', uri)
+        self.assertEqual('1234abcd', params['key'])
+
+    def test_slice_count(self):
+        issues = self.run_async(self.manager().filter(status_id='*')[1:2])
+        self.assertEqual(['Issue 2'], [issue.subject for issue in issues])
+        self.assertEqual(3, self.run_async(self.manager().all().count()))
+
+    def test_get_save(self):
+        manager = self.manager()
+        issue = self.run_async(manager.get(1))
+        self.assertEqual('Issue 1', issue.subject)
+        issue.subject = 'Changed'
+        self.run_async(manager.save(issue))
+        method, uri, params, data = self.transport.requests[-1]
+        self.assertEqual('put', method)
+        self.assertIn(b'<subject>Changed</subject>', data)
+        self.assertEqual('Changed', issue.subject)
+
+    def test_relations(self):
+        manager = self.manager()
+        issue = self.run_async(manager.get(1))
+        self.assertIs(manager, issue._manager)
+        project = self.run_async(manager.project(issue))
+        self.assertEqual('Test', project.name)
+        self.assertIsNone(self.run_async(manager.parent(issue)))
+        self.assertEqual('http://redmine.example.com/projects/1.xml',
+                         self.transport.requests[-1][1])
+        # The blocking counterparts would block the event loop
+        requests = len(self.transport.requests)
+        self.assertRaises(RuntimeError, getattr, issue, 'project')
+        self.assertRaises(RuntimeError, issue.save)
+        self.assertEqual(requests, len(self.transport.requests))
+        self.assertFalse(hasattr(manager, 'in_bulk'))
+
+    def test_comments(self):
+        manager = self.manager()
+        issue = self.run_async(manager.get(1))
+        self.assertEqual('journals', self.transport.requests[-1][2]['include'])
+        self.assertEqual(['Looks good'], [str(c) for c in issue.comments])
+        issues = self.run_async(manager.all())
+        self.assertRaises(RuntimeError, getattr, issues[0], 'comments')
+        requests = len(self.transport.requests)
+        comments = self.run_async(manager.comments(issues[0]))
+        self.assertEqual(['Looks good'], [str(c) for c in comments])
+        self.assertIs(comments, self.run_async(manager.comments(issues[0])))
+        self.assertEqual(requests + 1, len(self.transport.requests))
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from snakemine.base import Manager, Resource
+import threading
+
+
+class FakeManager(Manager):
+
+    def __init__(self):
+        super(FakeManager, self).__init__()
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def create(self, data):
+        with self._lock:
+            self.sent.append(data)
+        if data.get('fail'):
+            raise ValueError(data['subject'])
+        return data['subject']
+
+    def update(self, resource_id, data):
+        self.create(data)
+
+
+class FakeRequest(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def get(self, path, params=None, fields=None):
+        self.sent.append(params)
+        return 200, [{'id': len(self.sent)}]
+
+
+class ParamsManager(Manager):
+    _cls = Resource
+    _path = '/issues'
+    _request = None
+
+    @property
+    def _params(self):
+        return {'include': 'journals'}
+
+
+class CappedManager(Manager):
+    '''Serves seven items, at most two per page, like Redmine's cap.'''
+    _cls = Resource
+
+    def _get_page(self, path=None, params=None, fields=None):
+        offset = params['offset']
+        limit = min(params['limit'], 2)
+        ids = range(offset + 1, min(offset + limit, 7) + 1)
+        return [{'id': i} for i in ids], 7
+
+
+class ManagerTest(TestCase):
+
+    def test_params_not_shared(self):
+        manager = ParamsManager()
+        manager._request = FakeRequest()
+        params = {'project_id': 1}
+        manager._get_page(params=params)
+        manager._get('/projects/1')
+        self.assertEqual({'project_id': 1}, params)
+        self.assertEqual([{'project_id': 1, 'include': 'journals'},
+                          {'include': 'journals'}], manager._request.sent)
+        manager._get('/projects/1')
+        self.assertEqual({'include': 'journals'}, manager._request.sent[2])
+        self.assertIsNot(manager._request.sent[1],
+                         manager._request.sent[2])
+
+    def test_concurrent_capped_pages(self):
+        with test_settings(PAGE_SIZE=3):
+            qs = CappedManager().all()
+            self.assertEqual(list(range(1, 8)),
+                             [r['id'] for r in qs.iterator()])
+            self.assertEqual(list(range(1, 8)),
+                             [r['id'] for r in qs.concurrent(2).iterator()])
+
+
+class BulkTest(TestCase):
+
+    def test_bulk_create(self):
+        manager = FakeManager()
+        items = [{'subject': str(i), 'fail': i % 3 == 0} for i in range(10)]
+        results = manager.bulk_create(items, workers=3)
+        self.assertEqual([str(i) for i in range(10) if i % 3],
+                         [r.resource for r in results if r.ok])
+        self.assertEqual(items, [r.item for r in results])
+        self.assertEqual(['0', '3', '6', '9'],
+                         [str(r.error) for r in results if not r.ok])
+
+    def test_max_failures(self):
+        manager = FakeManager()
+        items = [{'subject': str(i), 'fail': True} for i in range(20)]
+        results = manager.bulk_create(items, workers=1, max_failures=2)
+        self.assertEqual(2, len(results))
+        self.assertEqual(2, len(manager.sent))
+
+    def test_max_failures_concurrent(self):
+        manager = FakeManager()
+        items = [{'subject': str(i), 'fail': True} for i in range(50)]
+        results = manager.bulk_create(items, workers=4, max_failures=2)
+        # requests that were already in flight are completed and reported
+        self.assertTrue(2 <= len(results) < 10)
+        self.assertEqual(len(manager.sent), len(results))
+
+    def test_bulk_update(self):
+        manager = FakeManager()
+        results = manager.bulk_update([(1, {'subject': 'a'}),
+                                       (2, {'subject': 'b', 'fail': True})])
+        self.assertEqual([True, False], [r.ok for r in results])
+        self.assertEqual(2, results[1].item[0])
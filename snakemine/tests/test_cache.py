@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from snakemine.cache import CacheEntry, MemoryCache, SQLiteCache
+from snakemine.issue import IssueManager
+from snakemine.request import json as json_request
+from snakemine.tests.test_request import FakeHTTPResponse, FakeSession
+import time
+
+ISSUE_JSON = b'{"issue": {"id": 1, "subject": "Cached"}}'
+
+
+class CacheTestMixin(object):
+
+    def entry(self, content=b'<issue/>', ttl=60):
+        return CacheEntry(200, content, time.time() + ttl)
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get('/issues/1.xml?'))
+        self.cache.set('/issues/1.xml?', self.entry(b'<issue><id>1</id>'))
+        entry = self.cache.get('/issues/1.xml?')
+        self.assertEqual(200, entry.status)
+        self.assertEqual(b'<issue><id>1</id>', entry.content)
+        self.assertTrue(entry.fresh)
+
+    def test_validators(self):
+        entry = self.entry()
+        entry.etag = '"abc"'
+        entry.last_modified = 'Mon, 03 Mar 2014 10:00:00 GMT'
+        self.cache.set('/issues/1.xml?', entry)
+        entry = self.cache.get('/issues/1.xml?')
+        self.assertEqual({
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Mon, 03 Mar 2014 10:00:00 GMT',
+        }, entry.validators)
+        self.assertEqual({}, self.entry().validators)
+
+    def test_stale(self):
+        self.cache.set('/issues/1.xml?', self.entry(ttl=-1))
+        self.assertFalse(self.cache.get('/issues/1.xml?').fresh)
+
+    def test_lru(self):
+        for i in range(3):
+            self.cache.set('/issues/%d.xml?' % i, self.entry())
+        # mark the oldest as recently used
+        self.cache.get('/issues/0.xml?')
+        self.cache.set('/issues/3.xml?', self.entry())
+        self.assertEqual(3, len(self.cache))
+        self.assertIsNotNone(self.cache.get('/issues/0.xml?'))
+        self.assertIsNone(self.cache.get('/issues/1.xml?'))
+
+    def test_delete_prefix(self):
+        self.cache.set('/issues/1.xml?', self.entry())
+        self.cache.set('/issues.xml?limit=100', self.entry())
+        self.cache.set('/projects/1.xml?', self.entry())
+        self.cache.delete_prefix('/issues')
+        self.assertEqual(1, len(self.cache))
+        self.assertIsNotNone(self.cache.get('/projects/1.xml?'))
+        self.cache.clear()
+        self.assertEqual(0, len(self.cache))
+
+    def test_revalidate(self):
+        request = json_request.Request()
+        request._requests_session = FakeSession(
+            FakeHTTPResponse(200, ISSUE_JSON, {'ETag': '"v1"'}),
+            FakeHTTPResponse(304, headers={'ETag': '"v1"'}),
+            FakeHTTPResponse(200, b'{"issue": {"id": 1, "subject": "New"}}',
+                             {'ETag': '"v2"'}))
+        # Every entry is stale as soon as it is stored
+        with test_settings(BASE_URI='http://redmine.example.com',
+                           CACHE=self.cache, CACHE_TTL=-1):
+            first = request.get('/issues/1')[1]
+            second = request.get('/issues/1')[1]
+            third = request.get('/issues/1')[1]
+            key = request._cache_key('/issues/1', None)
+        sent = request._session.sent
+        self.assertEqual(3, len(sent))
+        self.assertNotIn('If-None-Match', sent[0][4])
+        self.assertEqual('"v1"', sent[1][4]['If-None-Match'])
+        self.assertEqual('Cached', second[0].subject)
+        if self.keeps_parsed:
+            # The parsed data is reused, but not the responses themselves
+            self.assertIs(first[0]._data, second[0]._data)
+        first[0].subject = 'Changed'
+        self.assertEqual('Cached', second[0].subject)
+        self.assertEqual('"v1"', sent[2][4]['If-None-Match'])
+        self.assertEqual('New', third[0].subject)
+        self.assertEqual('"v2"', self.cache.get(key).etag)
+
+    def test_saved_resource_not_shared(self):
+        manager = IssueManager()
+        request = manager._requests['json'] = json_request.Request()
+        request._requests_session = FakeSession(
+            FakeHTTPResponse(200, ISSUE_JSON), FakeHTTPResponse(200))
+        with test_settings(BASE_URI='http://redmine.example.com',
+                           FORMAT='json', CACHE=self.cache):
+            first = manager.get(1)
+            second = manager.get(1)
+            first.subject = 'Changed'
+            first.save()
+        self.assertEqual(2, len(request._session.sent))
+        self.assertEqual('Changed', first.subject)
+        self.assertEqual('Cached', second.subject)
+
+
+class MemoryCacheTest(CacheTestMixin, TestCase):
+    keeps_parsed = True
+
+    def setUp(self):
+        super(MemoryCacheTest, self).setUp()
+        self.cache = MemoryCache(max_entries=3)
+
+
+class SQLiteCacheTest(CacheTestMixin, TestCase):
+    keeps_parsed = False
+
+    def setUp(self):
+        super(SQLiteCacheTest, self).setUp()
+        self.cache = SQLiteCache(':memory:', max_entries=3)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import TestCase
+from snakemine.cache import MemoryCache
+from snakemine.client import Client
+from snakemine.conf import Settings
+from snakemine.conf.global_settings import DEFAULT_SETTINGS
+from snakemine.identity import IdentityMap
+from snakemine.issue import Issue, IssueManager
+from snakemine.project import Project
+from snakemine.request import json, xml
+from snakemine.tests.test_request import FakeHTTPResponse, FakeSession
+from snakemine.tests.test_response import ISSUE_JSON
+
+USERS_XML = b'''<users type="array" total_count="1" offset="0" limit="100">
+  <user><id>9</id><login>dlopper</login></user>
+</users>'''
+
+
+class ClientTest(TestCase):
+
+    def setUp(self):
+        super(ClientTest, self).setUp()
+        self.client = Client(BASE_URI='https://redmine.example.com',
+                             API_KEY='secret', FORMAT='json')
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_settings(self):
+        self.assertEqual('https://redmine.example.com',
+                         self.client.settings.BASE_URI)
+        self.assertEqual(100, self.client.settings.PAGE_SIZE)
+        settings = Settings(DEFAULT_SETTINGS)
+        settings.configure(BASE_URI='https://other.example.com')
+        self.assertIs(settings, Client(settings).settings)
+        self.assertRaises(TypeError, Client, settings, API_KEY='x')
+
+    def test_request(self):
+        request = self.client.request()
+        self.assertIsInstance(request, json.Request)
+        self.assertIs(request, self.client.request())
+        self.assertIsInstance(self.client.request('xml'), xml.Request)
+        uri, params = request._prepare('get', '/issues', {})[:2]
+        self.assertEqual('https://redmine.example.com/issues.json', uri)
+        self.assertEqual({'key': 'secret'}, params)
+
+    def test_managers(self):
+        issues = self.client.issues
+        self.assertIsInstance(issues, IssueManager)
+        self.assertIs(issues, self.client.manager(Issue))
+        self.assertIsNot(issues, Issue.objects)
+        self.assertIs(self.client.request(), issues._request)
+        self.assertIs(self.client.projects, issues._manager_for(Project))
+        self.assertIs(Project.objects, Issue.objects._manager_for(Project))
+
+    def test_bound_resources(self):
+        request = self.client.request()
+        response = request._parse('get', 200, ISSUE_JSON)[0]
+        issue = self.client.issues._wrap(response)
+        self.assertIs(self.client.issues, issue._manager)
+        self.assertIs(Issue.objects, Issue(response)._manager)
+        self.assertIs(issue.author, self.client.people.get(2))
+        with IdentityMap() as identity_map:
+            identity_map.add(issue)
+            self.assertIs(issue, identity_map.get(Issue, 3, self.client))
+            self.assertIsNone(identity_map.get(Issue, 3))
+
+    def test_shared_cache(self):
+        cache = MemoryCache()
+        uris = ('https://a.example.com', 'https://b.example.com')
+        clients = [Client(BASE_URI=uri, FORMAT='json', CACHE=cache)
+                   for uri in uris]
+        for client in clients:
+            client.request()._requests_session = FakeSession(
+                FakeHTTPResponse(200, ISSUE_JSON),
+                FakeHTTPResponse(200, ISSUE_JSON))
+        for client in clients:
+            self.assertEqual(3, client.issues.get(3).id)
+            self.assertEqual(3, client.issues.get(3).id)
+            self.assertEqual(1, len(client.request()._session.sent))
+        self.assertEqual(2, len(cache))
+        clients[0].request()._requests_session.responses.append(
+            FakeHTTPResponse(204))
+        clients[0].issues.delete(3)
+        self.assertEqual(1, len(cache))
+
+    def test_warm_people(self):
+        sent = []
+
+        def send_request(request, method, path, params=None, **kwargs):
+            sent.append(request.settings.BASE_URI)
+            return FakeHTTPResponse(200, USERS_XML)
+
+        original = xml.Request._send_request
+        xml.Request._send_request = send_request
+        try:
+            self.assertEqual(1, self.client.people.warm())
+        finally:
+            xml.Request._send_request = original
+        self.assertEqual(['https://redmine.example.com'], sent)
+        self.assertEqual('dlopper', self.client.people.get(9).login)
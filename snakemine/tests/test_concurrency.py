@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import TestCase
+from random import random
+from snakemine._concurrency import ordered_map
+import time
+
+
+def slow_square(x):
+    time.sleep(random() / 100)
+    return x * x
+
+
+class OrderedMapTest(TestCase):
+
+    def test_order_preserved(self):
+        expected = [x * x for x in range(20)]
+        self.assertEqual(expected, list(ordered_map(slow_square, range(20),
+                                                    4)))
+
+    def test_sequential(self):
+        self.assertEqual([0, 1, 4], list(ordered_map(slow_square, range(3),
+                                                     1)))
+
+    def test_exception(self):
+        def fail(x):
+            raise ValueError(x)
+        with self.assertRaises(ValueError):
+            list(ordered_map(fail, range(3), 2))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import TestCase
+from snakemine.exceptions import (ClientError, error_for_status, NotFound,
+                                  ServerError, ValidationError)
+
+
+class ExceptionsTest(TestCase):
+
+    def test_error_for_status(self):
+        error = error_for_status(404, 'get', '/issues/1')
+        self.assertIsInstance(error, NotFound)
+        self.assertEqual('GET /issues/1: HTTP 404', str(error))
+        self.assertIsInstance(error_for_status(409, 'put', '/'), ClientError)
+        self.assertIsInstance(error_for_status(599, 'get', '/'), ServerError)
+
+    def test_validation_errors(self):
+        xml = b'<errors><error>Subject can&apos;t be blank</error></errors>'
+        json = b'{"errors": ["Subject can\'t be blank"]}'
+        for content in (xml, json):
+            error = error_for_status(422, 'post', '/issues', content)
+            self.assertIsInstance(error, ValidationError)
+            self.assertEqual(["Subject can't be blank"], error.errors)
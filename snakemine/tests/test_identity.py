@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import TestCase
+from snakemine.identity import IdentityMap
+from snakemine.issue import Issue
+from snakemine.project import Project, ProjectManager
+from snakemine.response.json import Response
+
+
+def make(cls, resource_id):
+    return cls(Response({'id': resource_id}))
+
+
+class FakeProjectManager(ProjectManager):
+
+    def __init__(self):
+        super(FakeProjectManager, self).__init__()
+        self.fetched = []
+
+    def _get(self, path=None, params=None):
+        self.fetched.append(path)
+        return [Project(Response({'id': 1, 'identifier': 'project-1'}),
+                        self)]
+
+
+class IdentityMapTest(TestCase):
+
+    def test_add(self):
+        identity_map = IdentityMap()
+        issue = make(Issue, 1)
+        self.assertIs(issue, identity_map.add(issue))
+        self.assertIs(issue, identity_map.add(make(Issue, 1)))
+        self.assertIs(issue, identity_map.get(Issue, '1'))
+        self.assertIsNone(identity_map.get(Project, 1))
+        identity_map.discard(issue)
+        self.assertNotIn(issue, identity_map)
+
+    def test_context(self):
+        self.assertIsNone(IdentityMap.current())
+        with IdentityMap() as outer:
+            outer.add(make(Issue, 1))
+            with IdentityMap() as inner:
+                self.assertIs(inner, IdentityMap.current())
+            self.assertIs(outer, IdentityMap.current())
+        self.assertIsNone(IdentityMap.current())
+        self.assertEqual(0, len(outer))
+
+    def test_identifier(self):
+        manager = FakeProjectManager()
+        with IdentityMap() as identity_map:
+            self.assertIsNone(identity_map.get(Project, 'project-1'))
+            project = manager.get('project-1')
+            self.assertEqual(['/projects/project-1'], manager.fetched)
+            self.assertIs(project, manager.get(1))
+            self.assertEqual(1, len(manager.fetched))
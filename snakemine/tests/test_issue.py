@@ -14,8 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from . import TestCase
-from snakemine.issue import Issue
+from . import test_settings, TestCase
+from snakemine import conf
+from snakemine.exceptions import NotFound
+from snakemine.identity import IdentityMap
+from snakemine.issue import Issue, IssueManager
+from snakemine.query import _to_datetime
+from snakemine.response.json import Response
 
 
 class IssueTest(TestCase):
@@ -37,6 +42,56 @@ class IssueTest(TestCase):
         self.assertIsNotNone(issues)
         self.assertNotEqual(len(Issue.objects.all()), len(issues))
 
+    def test_filter_chain(self):
+        issues = Issue.objects.all().filter(assigned_to_id=2)
+        self.assertEqual(len(Issue.objects.filter(assigned_to_id=2)),
+                         len(issues))
+
+    def test_slice(self):
+        issues = list(Issue.objects.all())
+        self.assertEqual(issues[1:3], list(Issue.objects.all()[1:3]))
+        self.assertEqual(issues[1], Issue.objects.all()[1])
+        with self.assertRaises(IndexError):
+            Issue.objects.all()[len(issues)]
+
+    def test_concurrent(self):
+        with test_settings(BASE_URI=conf.settings.BASE_URI,
+                           USERNAME=conf.settings.USERNAME,
+                           PASSWORD=conf.settings.PASSWORD, PAGE_SIZE=2):
+            issues = list(Issue.objects.all())
+            self.assertEqual(issues,
+                             list(Issue.objects.all().concurrent(3)))
+
+    def test_count(self):
+        self.assertEqual(len(Issue.objects.all()),
+                         Issue.objects.all().count())
+
+    def test_in_bulk(self):
+        issues = Issue.objects.in_bulk([1, 2, 14, 99999])
+        self.assertEqual([1, 2, 14], sorted(issues))
+        self.assertEqual(Issue.objects.get(14), issues[14])
+
+    def test_changed_since(self):
+        changes = Issue.objects.changed_since()
+        self.assertIsNone(changes.cursor)
+        issues = list(changes)
+        self.assertNotEqual(0, len(issues))
+        self.assertIsNotNone(changes.cursor)
+        for issue in Issue.objects.changed_since(changes.cursor):
+            self.assertIn(issue, issues)
+
+    def test_only(self):
+        issue = Issue.objects.filter(issue_id=1).only('subject')[0]
+        self.assertEqual(1, issue.id)
+        self.assertEqual(Issue.objects.get(1).subject, issue.subject)
+        self.assertFalse(hasattr(issue, 'author'))
+        self.assertEqual([], issue.comments)
+
+    def test_defer(self):
+        issue = Issue.objects.filter(issue_id=1).defer('comments')[0]
+        self.assertEqual('John Smith', issue.author.name)
+        self.assertEqual([], issue.comments)
+
     def test_attrs(self):
         issue = Issue.objects.get(1)
         self.assertTrue(hasattr(issue, 'author'))
@@ -84,6 +139,14 @@ class IssueTest(TestCase):
         self.assertNotEqual(id(issue1), id(issue2))
         self.assertEqual(issue1, issue2)
 
+    def test_identity_map(self):
+        with IdentityMap():
+            issue1 = Issue.objects.get(1)
+            self.assertIs(issue1, Issue.objects.get(1))
+            self.assertIs(issue1.project, issue1.project)
+            self.assertIs(issue1, Issue.objects.all().filter(issue_id=1)[0])
+        self.assertIsNot(issue1, Issue.objects.get(1))
+
     def test_create_issue(self):
         issue = Issue(None)
         self.assertIsNone(issue.id)
@@ -133,7 +196,72 @@ class IssueTest(TestCase):
         self.assertEqual(issue, issue2)
         self.assertEqual(issue.subject, issue2.subject)
         issue.delete()
+        with self.assertRaises(NotFound):
+            Issue.objects.get(issue2.id)
         with self.assertRaises(AttributeError):
             issue.subject = 'this will fail'
         with self.assertRaises(RuntimeError):
             issue.save()
+
+
+class ChangingIssueManager(IssueManager):
+    '''Serves issues from memory, editing one after the first page.'''
+
+    def __init__(self, count, edit=None):
+        super(ChangingIssueManager, self).__init__()
+        self.issues = dict((i, '2014-01-01T10:%02d:00Z' % (i // 2))
+                           for i in range(1, count + 1))
+        self.edit = edit
+        self.pages = 0
+
+    def _get_page(self, path=None, params=None, fields=None):
+        since = params.get('updated_on', '>=2000-01-01T00:00:00Z')[2:]
+        matches = sorted((updated_on, i) for i, updated_on
+                         in self.issues.items()
+                         if _to_datetime(updated_on) >= _to_datetime(since))
+        offset = params['offset']
+        page = matches[offset:offset + params['limit']]
+        self.pages += 1
+        if self.edit is not None and self.pages == 1:
+            self.issues[self.edit] = '2014-01-02T10:00:00Z'
+        resources = []
+        for updated_on, i in page:
+            data = {'id': i, 'subject': 'Issue %d' % i,
+                    'updated_on': updated_on}
+            if fields is not None:
+                data = dict((k, v) for k, v in data.items() if k in fields)
+            resources.append(self._wrap(Response(data), fields))
+        return resources, len(matches)
+
+
+class ChangedSinceTest(TestCase):
+
+    def test_edited_while_paging(self):
+        manager = ChangingIssueManager(7, edit=2)
+        with test_settings(PAGE_SIZE=3):
+            changes = manager.changed_since()
+            seen = [issue.id for issue in changes]
+        self.assertEqual([1, 2, 3, 4, 5, 6, 7], sorted(set(seen)))
+        self.assertEqual(2, seen[-1])
+        self.assertEqual(_to_datetime('2014-01-02T10:00:00Z'),
+                         changes.cursor)
+
+    def test_same_update_time(self):
+        manager = ChangingIssueManager(9)
+        for issue_id in manager.issues:
+            manager.issues[issue_id] = '2014-01-01T10:00:00Z'
+        with test_settings(PAGE_SIZE=2):
+            seen = [issue.id for issue in manager.changed_since()]
+        self.assertEqual(list(range(1, 10)), seen)
+
+    def test_field_selection(self):
+        manager = ChangingIssueManager(3)
+        changes = manager.changed_since().only('subject')
+        issues = list(changes)
+        self.assertEqual(['Issue 1', 'Issue 2', 'Issue 3'],
+                         [issue.subject for issue in issues])
+        self.assertEqual(_to_datetime('2014-01-01T10:01:00Z'),
+                         changes.cursor)
+        self.assertEqual(3, len(manager.changed_since().defer('subject')))
+        self.assertRaises(ValueError, manager.changed_since().defer,
+                          'updated_on')
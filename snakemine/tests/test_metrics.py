@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from .test_request import FakeHTTPResponse, FakeResponse, ISSUES_XML
+from datetime import timedelta
+from snakemine.metrics import Aggregator, Histogram, RequestEvent, StatsD
+from snakemine.request.xml import ResponseStream
+
+
+def make_event(method='get', path='/issues', status=200, total_time=0.02):
+    event = RequestEvent('xml', method, path, '/issues')
+    event.status = status
+    event.bytes_received = 100
+    event.ttfb = 0.01
+    event.total_time = total_time
+    event.parse_time = 0.004
+    event.objects = 2
+    return event
+
+
+class HistogramTest(TestCase):
+
+    def test_observe(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        self.assertEqual([1, 2], histogram.counts)
+        self.assertEqual(3, histogram.count)
+        self.assertEqual(0.1, histogram.quantile(0.3))
+        self.assertEqual(float('inf'), histogram.quantile(1))
+
+
+class AggregatorTest(TestCase):
+
+    def test_prometheus(self):
+        aggregator = Aggregator()
+        aggregator(make_event())
+        aggregator(make_event(status=404))
+        text = aggregator.prometheus()
+        self.assertIn('snakemine_requests_total{method="get",'
+                      'resource="/issues",status="200"} 1', text)
+        self.assertIn('snakemine_objects_total{method="get",'
+                      'resource="/issues"} 4', text)
+        self.assertIn('snakemine_total_seconds_bucket{le="0.025",'
+                      'method="get",resource="/issues"} 2', text)
+        self.assertIn('snakemine_total_seconds_count{method="get",'
+                      'resource="/issues"} 2', text)
+
+    def test_stream_event(self):
+        aggregator = Aggregator()
+        with test_settings(METRICS_HOOKS=[aggregator]):
+            event = RequestEvent('xml', 'get', '/issues', '/issues')
+            event.status = 200
+            list(ResponseStream(FakeResponse(ISSUES_XML), event=event))
+        self.assertEqual({('get', '/issues'): 2}, aggregator.objects)
+        self.assertEqual({('get', '/issues'): len(ISSUES_XML)},
+                         aggregator.bytes_received)
+
+    def test_record_response(self):
+        event = RequestEvent('xml', 'get', '/issues', '/issues')
+        response = FakeHTTPResponse(200, ISSUES_XML)
+        response.elapsed = timedelta(seconds=1, microseconds=250000)
+        event.record_response(response)
+        self.assertEqual(200, event.status)
+        self.assertEqual(1.25, event.ttfb)
+        self.assertEqual(len(ISSUES_XML), event.bytes_received)
+
+
+class FakeFile(list):
+
+    def write(self, data):
+        self.append(data)
+
+    def flush(self):
+        pass
+
+
+class StatsDTest(TestCase):
+
+    def test_file(self):
+        output = FakeFile()
+        StatsD(fileobj=output)(make_event())
+        lines = ''.join(output).splitlines()
+        self.assertIn('snakemine.get.issues.requests.200:1|c', lines)
+        self.assertIn('snakemine.get.issues.total_time:20.000|ms', lines)
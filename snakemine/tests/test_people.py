@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from lxml import etree
+from snakemine.people import get_cache, get_person, Person, PersonCache
+from snakemine.request import json, xml
+from snakemine.tests.test_request import FakeHTTPResponse
+from snakemine.tests.test_response import ISSUE_JSON, ISSUE_XML
+import time
+
+USER_XML = b'''<user>
+  <id>2</id>
+  <login>jsmith</login>
+  <firstname>John</firstname>
+  <lastname>Smith</lastname>
+  <mail>jsmith@somenet.foo</mail>
+</user>'''
+
+
+class PersonCacheTest(TestCase):
+
+    def test_lru(self):
+        cache = PersonCache(max_entries=2)
+        cache.person(1, 'One')
+        cache.person(2, 'Two')
+        cache.get(1)
+        cache.person(3, 'Three')
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual('One', cache.get(1).name)
+
+    def test_ttl(self):
+        cache = PersonCache(ttl=0.01)
+        person = cache.person(1, 'One')
+        self.assertIs(person, cache.person(1, 'One'))
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(1))
+        self.assertIsNot(person, cache.person(1, 'One'))
+
+    def test_rename(self):
+        cache = PersonCache()
+        cache.set(Person.from_element(etree.fromstring(USER_XML)))
+        person = cache.person(2)
+        self.assertEqual('John Smith', person.name)
+        self.assertEqual('jsmith', person.login)
+        person = cache.person(2, 'Smith John')
+        self.assertEqual('Smith John', person.name)
+        self.assertEqual('jsmith@somenet.foo', person.mail)
+        self.assertIs(person, cache.get(2))
+
+    def test_shared_cache(self):
+        with test_settings(PERSON_CACHE_SIZE=5):
+            cache = get_cache()
+            self.assertIs(cache, get_cache())
+            self.assertEqual(5, cache.max_entries)
+            xml_author = xml.Request()._parse('get', 200, ISSUE_XML)[0].author
+            json_author = json.Request()._parse('get', 200,
+                                                ISSUE_JSON)[0].author
+            self.assertIs(xml_author, json_author)
+            self.assertIs(xml_author, get_person(2))
+            self.assertFalse(hasattr(xml_author, '_data'))
+
+    def test_warm(self):
+        sent = []
+
+        def send_request(request, method, path, params=None, **kwargs):
+            sent.append(params['offset'])
+            # Redmine sends at most 2 users per page
+            ids = range(params['offset'] + 1, min(params['offset'] + 2, 5) + 1)
+            users = ''.join('<user><id>%d</id><login>user%d</login></user>' %
+                            (i, i) for i in ids)
+            return FakeHTTPResponse(200, ('<users total_count="5">%s</users>' %
+                                          users).encode('utf-8'))
+
+        original = xml.Request._send_request
+        xml.Request._send_request = send_request
+        cache = PersonCache()
+        try:
+            with test_settings(PAGE_SIZE=4):
+                self.assertEqual(5, cache.warm())
+        finally:
+            xml.Request._send_request = original
+        self.assertEqual([0, 2, 4], sent)
+        self.assertEqual(['user%d' % i for i in range(1, 6)],
+                         [cache.get(i).login for i in range(1, 6)])
@@ -31,3 +31,7 @@ class ProjectTest(TestCase):
     def test_get(self):
         project = Project.objects.get(1)
         self.assertIsNotNone(project)
+
+    def test_in_bulk(self):
+        projects = Project.objects.in_bulk([1, 2, 99999])
+        self.assertEqual([1, 2], sorted(projects))
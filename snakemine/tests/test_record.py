@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import TestCase
+from datetime import date
+from lxml import etree
+from snakemine.people import Person, PersonCache
+from snakemine.response.record import from_element, IssueRecord
+
+ISSUE_XML = b'''<issue>
+  <id>14</id>
+  <project name="eCookbook" id="1"/>
+  <author name="John Smith" id="2"/>
+  <parent id="1"/>
+  <subject>Child issue</subject>
+  <description></description>
+  <start_date>2014-03-01</start_date>
+  <done_ratio>30</done_ratio>
+  <created_on>2014-03-01T10:00:00Z</created_on>
+  <custom_fields>
+    <custom_field name="Searchable field" id="2">
+      <value>123</value>
+    </custom_field>
+  </custom_fields>
+  <journals type="array">
+    <journal id="3">
+      <user name="Dave Lopper" id="3"/>
+      <notes>A comment</notes>
+    </journal>
+  </journals>
+  <unknown>kept</unknown>
+</issue>'''
+
+
+class RecordTest(TestCase):
+
+    def setUp(self):
+        super(RecordTest, self).setUp()
+        self.people = PersonCache()
+        self.people.set(Person(2, login='jsmith'))
+        self.issue = from_element(etree.fromstring(ISSUE_XML), self.people)
+
+    def test_types(self):
+        issue = self.issue
+        self.assertIsInstance(issue, IssueRecord)
+        self.assertEqual(14, issue.id)
+        self.assertEqual(30, issue.done_ratio)
+        self.assertEqual(date(2014, 3, 1), issue.start_date)
+        self.assertEqual(2014, issue.created_on.year)
+        self.assertIsNone(issue.description)
+        self.assertEqual('kept', issue.unknown)
+
+    def test_refs(self):
+        issue = self.issue
+        self.assertIs(self.people.get(2), issue.author)
+        self.assertEqual('John Smith', issue.author.name)
+        self.assertEqual('jsmith', issue.author.login)
+        self.assertEqual('eCookbook', issue.project.name)
+        self.assertEqual(1, issue.project_id)
+        self.assertEqual(1, issue.parent_id)
+        self.assertEqual('123', issue.custom_fields[0].value)
+        self.assertFalse(hasattr(issue, 'assigned_to'))
+
+    def test_comments(self):
+        comment = self.issue.comments[0]
+        self.assertEqual(3, comment.id)
+        self.assertEqual('A comment', str(comment))
+        self.assertEqual('Dave Lopper', comment.user.name)
+        self.assertIs(self.people.get(3), comment.user)
+
+    def test_compact(self):
+        self.assertFalse(hasattr(self.issue, '__dict__'))
+        self.assertFalse(hasattr(self.issue.comments[0], '__dict__'))
+        for name in IssueRecord.__slots__:
+            value = getattr(self.issue, name, None)
+            self.assertFalse(isinstance(value, etree._Element), name)
+
+    def test_set(self):
+        self.issue.subject = 'Changed'
+        self.issue.status_id = 2
+        self.assertEqual('Changed', self.issue.subject)
+        self.assertEqual(2, self.issue.status_id)
+
+    def test_copy(self):
+        copy = self.issue._copy()
+        copy.subject = 'Changed'
+        copy.status_id = 2
+        self.assertEqual('Child issue', self.issue.subject)
+        self.assertFalse(hasattr(self.issue, 'status_id'))
+        self.assertIs(self.issue.author, copy.author)
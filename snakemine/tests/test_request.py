@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO
+from snakemine.request import json as json_request
+from snakemine.request.xml import Request, ResponseStream
+import threading
+
+ISSUES_XML = b'''<?xml version="1.0" encoding="UTF-8"?>
+<issues type="array" total_count="5" offset="0" limit="2">
+  <issue>
+    <id>1</id>
+    <subject>First</subject>
+    <children><issue id="2"/></children>
+  </issue>
+  <issue>
+    <id>2</id>
+    <subject>Second</subject>
+  </issue>
+</issues>'''
+
+
+ISSUES_JSON = b'''{"issues": [{"id": 1, "subject": "First",
+    "start_date": "2014-01-02", "estimated_hours": 2.5,
+    "created_on": "2014-01-02T03:04:05Z",
+    "journals": [{"id": 7, "notes": "Hi",
+                  "created_on": "2014/01/03 10:00:00 +0100"}]}],
+  "total_count": 5, "offset": 0, "limit": 1}'''
+
+
+class FakeResponse(object):
+
+    def __init__(self, content):
+        self.raw = BytesIO(content)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeHTTPResponse(object):
+
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    '''Replies to each request with the next of the given responses.'''
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def request(self, method, uri, params=None, data=None, auth=None,
+                headers=None, stream=False):
+        self.sent.append((method, uri, params, data, headers))
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+class RequestTest(TestCase):
+
+    def test_session_reused(self):
+        request = Request()
+        with test_settings(POOL_CONNECTIONS=2, POOL_MAXSIZE=5):
+            session = request._session
+            self.assertIs(session, request._session)
+            adapter = session.get_adapter('http://redmine.example.com')
+            self.assertEqual(5, adapter._pool_maxsize)
+            request.close()
+            self.assertIsNot(session, request._session)
+
+    def test_session_shared_between_threads(self):
+        request = Request()
+        sessions = []
+        threads = [threading.Thread(
+            target=lambda: sessions.append(request._session))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(set(map(id, sessions))))
+        request.close()
+
+    def test_params_not_modified(self):
+        params = {'status_id': '*'}
+        with test_settings(API_KEY='secret'):
+            prepared = Request()._prepare('get', '/issues', params)[1]
+        self.assertEqual({'status_id': '*', 'key': 'secret'}, prepared)
+        self.assertEqual({'status_id': '*'}, params)
+
+    def test_response_stream(self):
+        response = FakeResponse(ISSUES_XML)
+        stream = ResponseStream(response)
+        self.assertIsNone(stream.total_count)
+        issues = list(stream)
+        self.assertEqual(5, stream.total_count)
+        self.assertEqual([1, 2], [issue.id for issue in issues])
+        self.assertEqual('Second', issues[1].subject)
+        self.assertIsNone(issues[0]._data.getparent())
+        self.assertTrue(response.closed)
+
+
+class JSONRequestTest(TestCase):
+
+    def test_parse_date(self):
+        expected = date(2014, 1, 2)
+        self.assertEqual(expected, json_request.parse_date('2014-01-02'))
+        self.assertEqual(expected, json_request.parse_date('2014/01/02'))
+
+    def test_parse_datetime(self):
+        value = json_request.parse_datetime('2014-01-02T03:04:05Z')
+        expected = datetime(2014, 1, 2, 3, 4, 5, tzinfo=json_request.UTC)
+        self.assertEqual(expected, value)
+        legacy = json_request.parse_datetime('2014/01/02 04:04:05 +0100')
+        self.assertEqual(value, legacy)
+
+    def test_parse_list(self):
+        issues = json_request.Request()._parse('get', 200, ISSUES_JSON)
+        self.assertEqual(5, issues.total_count)
+        issue = issues[0]._data
+        self.assertEqual(date(2014, 1, 2), issue['start_date'])
+        self.assertEqual(Decimal('2.5'), issue['estimated_hours'])
+        self.assertEqual(2014, issue['journals'][0]['created_on'].year)
+
+    def test_post_object(self):
+        request = json_request.Request()
+        request._requests_session = FakeSession(
+            FakeHTTPResponse(201, b'{"issue": {"id": 3}}'))
+        with test_settings(BASE_URI='http://redmine.example.com'):
+            status, issues = request.post_object(
+                '/issues', {'issue': {'subject': 'New'}})
+        self.assertEqual(201, status)
+        self.assertEqual(3, issues[0].id)
+        self.assertEqual('{"issue": {"subject": "New"}}',
+                         request._session.sent[0][3])
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from snakemine.issue import Issue, IssueManager
+from snakemine.project import Project
+from snakemine.request import json, xml
+from snakemine.response.base import FieldSelection
+
+ISSUE_XML = b'''<?xml version="1.0" encoding="UTF-8"?>
+<issue>
+  <id>3</id>
+  <project name="eCookbook" id="1"/>
+  <author name="John Smith" id="2"/>
+  <assigned_to name="Dave Lopper" id="3"/>
+  <parent id="1"/>
+  <subject>Third</subject>
+  <journals type="array">
+    <journal id="5">
+      <user name="John Smith" id="2"/>
+      <notes>Looks good</notes>
+    </journal>
+  </journals>
+</issue>'''
+
+ISSUE_JSON = b'''{"issue": {"id": 3,
+  "project": {"id": 1, "name": "eCookbook"},
+  "author": {"id": 2, "name": "John Smith"},
+  "assigned_to": {"id": 3, "name": "Dave Lopper"},
+  "parent": {"id": 1},
+  "subject": "Third",
+  "journals": [{"id": 5, "user": {"id": 2, "name": "John Smith"},
+                "notes": "Looks good"}]}}'''
+
+
+class ResponseParityTest(TestCase):
+
+    def _assert_issue(self, response):
+        issue = Issue(response)
+        self.assertEqual('John Smith', issue.author.name)
+        self.assertEqual('Dave Lopper', issue.assigned_to.name)
+        self.assertEqual(1, issue.project_id)
+        self.assertEqual(1, issue.parent_id)
+        self.assertEqual(['Looks good'], [str(c) for c in issue.comments])
+        self.assertEqual(5, int(issue.comments[0].id))
+        self.assertEqual('John Smith', issue.comments[0].user.name)
+        self.assertFalse(hasattr(issue, 'category'))
+
+    def test_xml(self):
+        self._assert_issue(xml.Request()._parse('get', 200, ISSUE_XML)[0])
+
+    def test_json(self):
+        self._assert_issue(json.Request()._parse('get', 200, ISSUE_JSON)[0])
+
+    def test_json_encode(self):
+        data = {'object': 'issue', 'data': {'subject': 'New'}}
+        self.assertEqual({'issue': {'subject': 'New'}},
+                         json.loads(json.Request()._encode(data)))
+
+
+class FormatTest(TestCase):
+
+    def test_format_setting(self):
+        manager = IssueManager()
+        with test_settings(FORMAT='json'):
+            self.assertIsInstance(manager._request, json.Request)
+            self.assertIs(manager._request, manager._request)
+        with test_settings(FORMAT='xml'):
+            self.assertIsInstance(manager._request, xml.Request)
+
+    def test_unsupported_format(self):
+        with test_settings(FORMAT='yaml'):
+            self.assertRaises(ValueError, getattr, IssueManager(), '_request')
+
+
+class FakeIssueManager(IssueManager):
+
+    def __init__(self):
+        super(FakeIssueManager, self).__init__()
+        self.fetched = []
+
+    def _get(self, path=None, params=None):
+        self.fetched.append((path, params))
+        response = json.Request()._parse('get', 200, ISSUE_JSON)[0]
+        return [Issue(response, self)]
+
+
+class LazyJournalsTest(TestCase):
+
+    def _issues(self, manager, count):
+        return [manager._wrap(json.Response({'id': i})) for i in range(count)]
+
+    def test_lazy(self):
+        manager = FakeIssueManager()
+        issue = self._issues(manager, 1)[0]
+        comments = issue.comments
+        self.assertEqual(['Looks good'], [str(c) for c in comments])
+        self.assertIs(comments, issue.comments)
+        self.assertEqual([('/issues/0', {'include': 'journals'})],
+                         manager.fetched)
+
+    def test_get(self):
+        manager = FakeIssueManager()
+        issue = manager.get(3)
+        self.assertEqual(['Looks good'], [str(c) for c in issue.comments])
+        self.assertEqual([('/issues/3', {'include': 'journals'})],
+                         manager.fetched)
+
+    def test_prefetch(self):
+        manager = FakeIssueManager()
+        issues = self._issues(manager, 3)
+        manager._prefetch(issues, frozenset(['journals']), {})
+        self.assertEqual([], manager.fetched)
+        self.assertEqual(1, len(issues[1].comments))
+        self.assertEqual(3, len(manager.fetched))
+        self.assertEqual([1, 1, 1], [len(i.comments) for i in issues])
+        self.assertEqual(3, len(manager.fetched))
+
+    def test_deferred(self):
+        manager = FakeIssueManager()
+        issue = manager._wrap(json.Response({'id': 1}),
+                              FieldSelection(only=['subject']))
+        self.assertEqual([], issue.comments)
+        self.assertEqual([], manager.fetched)
+
+    def test_invalid_prefetch(self):
+        self.assertRaises(ValueError, IssueManager().all().prefetch,
+                          'watchers')
+
+
+class FakeManager(object):
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.bulk = []
+
+    def all(self):
+        return [r for r in self.resources if r.id < 10]
+
+    def in_bulk(self, ids):
+        self.bulk.append(sorted(ids))
+        return dict((r.id, r) for r in self.resources if r.id in ids)
+
+
+class RelatedIssueManager(IssueManager):
+
+    def __init__(self):
+        super(RelatedIssueManager, self).__init__()
+        self.projects = FakeManager([Project(json.Response({'id': i}))
+                                     for i in (1, 2, 10)])
+        self.parents = FakeManager([Issue(json.Response({'id': 50}))])
+
+    def _manager_for(self, cls):
+        return self.projects
+
+    def in_bulk(self, ids):
+        return self.parents.in_bulk(ids)
+
+
+class PrefetchRelatedTest(TestCase):
+
+    def _issue(self, manager, issue_id, project_id, parent_id=None):
+        data = {'id': issue_id, 'project': {'id': project_id}}
+        if parent_id:
+            data['parent'] = {'id': parent_id}
+        return manager._wrap(json.Response(data))
+
+    def test_prefetch_related(self):
+        manager = RelatedIssueManager()
+        issues = [self._issue(manager, 1, 1),
+                  self._issue(manager, 2, 2, 1),
+                  self._issue(manager, 3, 10, 50),
+                  self._issue(manager, 4, 1, 60)]
+        cache = {}
+        manager._prefetch(issues, frozenset(['project', 'parent']), cache)
+        self.assertEqual([1, 2, 10, 1], [i.project.id for i in issues])
+        self.assertIs(issues[0].project, issues[3].project)
+        self.assertEqual([[10]], manager.projects.bulk)
+        self.assertIs(issues[0], issues[1].parent)
+        self.assertEqual(50, issues[2].parent.id)
+        self.assertEqual([[50, 60]], manager.parents.bulk)
+        self.assertNotIn('parent', issues[3]._related)
+
+        more = [self._issue(manager, 5, 2, 50)]
+        manager._prefetch(more, frozenset(['project', 'parent']), cache)
+        self.assertEqual(1, len(manager.parents.bulk))
+        self.assertEqual(50, more[0].parent.id)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from email.utils import formatdate
+from snakemine.exceptions import NotFound, ServerError
+from snakemine.request.retry import parse_retry_after, RetryPolicy
+from snakemine.request.xml import Request
+import requests
+import time
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    '''Replays a list of responses (or exceptions to raise).'''
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.methods = []
+
+    def request(self, method, uri, **kwargs):
+        self.methods.append(method)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def fake_request(*responses):
+    request = Request()
+    request._requests_session = FakeSession(*responses)
+    return request
+
+
+class RetryPolicyTest(TestCase):
+
+    def test_parse_retry_after(self):
+        self.assertEqual(120, parse_retry_after('120'))
+        self.assertIsNone(parse_retry_after('soon'))
+        delay = parse_retry_after(formatdate(time.time() + 60,
+                                             usegmt=True))
+        self.assertTrue(55 < delay <= 60)
+
+    def test_should_retry(self):
+        policy = RetryPolicy(attempts=3)
+        self.assertTrue(policy.should_retry('get', 1, 503))
+        self.assertFalse(policy.should_retry('get', 3, 503))
+        self.assertFalse(policy.should_retry('get', 1, 404))
+        self.assertFalse(policy.should_retry('post', 1, 503))
+        error = requests.exceptions.ConnectionError()
+        self.assertTrue(policy.should_retry('get', 1, error=error))
+        self.assertFalse(policy.should_retry('get', 1, error=ValueError()))
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, backoff_max=3)
+        for attempt in range(1, 5):
+            self.assertTrue(0 <= policy.delay(attempt) <= 3)
+        self.assertEqual(2, policy.delay(1, '2'))
+        self.assertEqual(3, policy.delay(1, '3600'))
+
+
+class RequestRetryTest(TestCase):
+
+    def test_retried(self):
+        request = fake_request(FakeResponse(503),
+                               requests.exceptions.ConnectionError(),
+                               FakeResponse(404))
+        with test_settings(RETRY_BACKOFF=0):
+            self.assertRaises(NotFound, request.get, '/issues/1')
+        self.assertEqual(3, len(request._session.methods))
+
+    def test_attempts_exhausted(self):
+        request = fake_request(FakeResponse(503), FakeResponse(503))
+        with test_settings(RETRY_ATTEMPTS=2, RETRY_BACKOFF=0):
+            self.assertRaises(ServerError, request.get, '/issues')
+
+    def test_post_not_retried(self):
+        request = fake_request(FakeResponse(503), FakeResponse(201))
+        with test_settings(RETRY_BACKOFF=0):
+            self.assertRaises(ServerError, request.post, '/issues')
+        self.assertEqual(['post'], request._session.methods)
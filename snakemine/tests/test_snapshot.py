@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from datetime import date
+from snakemine.exceptions import NotFound
+from snakemine.issue import Issue, IssueManager
+from snakemine.project import Project
+from snakemine.query import _to_datetime
+from snakemine.response.json import Response
+from snakemine.snapshot import Snapshot
+
+
+def issue_data(i):
+    data = {
+        'id': i,
+        'project': {'id': i % 3 + 1, 'name': 'Project'},
+        'status': {'id': 1 if i % 2 else 5, 'name': 'Status'},
+        'tracker': {'id': 1, 'name': 'Bug'},
+        'author': {'id': 2, 'name': 'John Smith'},
+        'subject': 'Issue %d' % i,
+        'start_date': '2014-01-02',
+        'updated_on': '2014-01-%02dT10:00:00Z' % i,
+    }
+    if i > 1:
+        data['assigned_to'] = {'id': 3, 'name': 'Dave Lopper'}
+    return data
+
+
+def make_issue(i):
+    return Issue(Response(issue_data(i)))
+
+
+class FakeIssueManager(IssueManager):
+    '''Serves issues (and their journals) from memory.'''
+
+    def __init__(self, count):
+        super(FakeIssueManager, self).__init__()
+        self.issues = dict((i, issue_data(i)) for i in range(1, count + 1))
+        self.sent = []
+
+    def _get_page(self, path=None, params=None, fields=None):
+        params = dict(params or {})
+        self.sent.append((path, params))
+        if path:
+            data = dict(self.issues[int(path.rsplit('/', 1)[1])])
+            data['journals'] = [{'id': data['id'], 'notes': 'Noted',
+                                 'user': {'id': 2, 'name': 'John Smith'}}]
+            return [Issue(Response(data), self)], None
+        since = _to_datetime(params.get('updated_on', '>=2000-01-01')[2:])
+        project_id = params.get('project_id')
+        matches = sorted((data for data in self.issues.values()
+                          if _to_datetime(data['updated_on']) >= since and
+                          project_id in (None, data['project']['id'])),
+                         key=lambda data: (data['updated_on'], data['id']))
+        offset = params['offset']
+        page = matches[offset:offset + params['limit']]
+        return [Issue(Response(data), self) for data in page], len(matches)
+
+
+class FakeProjectManager(object):
+
+    def all(self):
+        return [Project(Response({'id': i, 'name': 'Project %d' % i}))
+                for i in range(1, 4)]
+
+
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        super(SnapshotTest, self).setUp()
+        self.snapshot = Snapshot(':memory:')
+        self.snapshot._store_issues([make_issue(i) for i in range(1, 11)],
+                                    False, 1)
+        self.issues = Issue.objects.using(self.snapshot)
+
+    def tearDown(self):
+        self.snapshot.close()
+
+    def test_filter(self):
+        issues = self.issues.filter(project_id=1)
+        self.assertEqual([3, 6, 9], [issue.id for issue in issues])
+        self.assertEqual(2, issues.filter(status_id=1).count())
+        self.assertEqual(6, self.issues.filter(project_id='1,2',
+                                               assigned_to_id=3).count())
+        self.assertRaises(ValueError, self.issues.filter, subject='x')
+
+    def test_updated_on(self):
+        issues = self.issues.filter(updated_on='>=2014-01-08',
+                                    sort='updated_on:desc')
+        self.assertEqual([10, 9, 8], [issue.id for issue in issues])
+
+    def test_slice(self):
+        issues = self.issues.all()[2:5]
+        self.assertEqual(3, issues.count())
+        self.assertEqual([3, 4, 5], [issue.id for issue in issues])
+        self.assertEqual(4, issues[1].id)
+
+    def test_get(self):
+        issue = self.issues.get(2)
+        self.assertEqual('Issue 2', issue.subject)
+        self.assertEqual(date(2014, 1, 2), issue.start_date)
+        self.assertEqual('Dave Lopper', issue.assigned_to.name)
+        self.assertEqual(3, issue.project_id)
+        self.assertEqual([], issue.comments)
+        self.assertRaises(NotFound, self.issues.get, 11)
+
+
+class SyncTest(TestCase):
+
+    def setUp(self):
+        super(SyncTest, self).setUp()
+        self.snapshot = Snapshot(':memory:')
+        self.snapshot._issues = FakeIssueManager(10)
+        self.snapshot._projects = FakeProjectManager()
+        self.issues = Issue.objects.using(self.snapshot)
+
+    def tearDown(self):
+        self.snapshot.close()
+
+    def sync(self):
+        with test_settings(PAGE_SIZE=4, MAX_WORKERS=2):
+            return self.snapshot.sync()
+
+    def test_sync(self):
+        self.assertIsNone(self.snapshot.cursor())
+        self.assertEqual(10, self.sync())
+        self.assertEqual('2014-01-10T10:00:00Z', self.snapshot.cursor())
+        self.assertEqual(10, self.issues.all().count())
+        self.assertEqual(3, Project.objects.using(self.snapshot).all().count())
+        self.assertEqual(['Noted'], [str(c) for c in
+                                     self.issues.get(4).comments])
+
+        remote = self.snapshot._issues
+        remote.issues[3]['subject'] = 'Changed'
+        remote.issues[3]['updated_on'] = '2014-01-20T10:00:00Z'
+        remote.issues[11] = issue_data(11)
+        del remote.sent[:]
+        # Issue 10 is retrieved again, since it was updated at the cursor
+        self.assertEqual(3, self.sync())
+        self.assertEqual('>=2014-01-10T10:00:00Z',
+                         remote.sent[0][1]['updated_on'])
+        self.assertEqual('2014-01-20T10:00:00Z', self.snapshot.cursor())
+        self.assertEqual('Changed', self.issues.get(3).subject)
+        self.assertEqual(11, self.issues.all().count())
+        # Only issue 3, which was updated at the new cursor
+        self.assertEqual(1, self.sync())
+
+    def test_sync_projects(self):
+        with test_settings(PAGE_SIZE=4, MAX_WORKERS=2):
+            # Project 1 has issues 3, 6 and 9; project 2 has 1, 4, 7 and 10
+            self.assertEqual(7, self.snapshot.sync(project_ids=[1, 2]))
+            self.assertIsNone(self.snapshot.cursor())
+            self.assertEqual('2014-01-09T10:00:00Z',
+                             self.snapshot.cursor(project_ids=[2, 1]))
+            # Changed after project 1 was retrieved, but before the newest
+            # change of project 2
+            remote = self.snapshot._issues
+            remote.issues[6]['subject'] = 'Changed'
+            remote.issues[6]['updated_on'] = '2014-01-09T12:00:00Z'
+            self.assertEqual(3, self.snapshot.sync(project_ids=[1, 2]))
+        self.assertEqual('Changed', self.issues.get(6).subject)
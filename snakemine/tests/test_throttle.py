@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2014 Mark Lee
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import test_settings, TestCase
+from snakemine._concurrency import ordered_map
+from snakemine.request.throttle import (ConcurrencyLimit, get_throttle,
+                                        TokenBucket)
+import threading
+import time
+
+
+class TokenBucketTest(TestCase):
+
+    def test_rate(self):
+        bucket = TokenBucket(100, burst=1)
+        start = time.time()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertTrue(time.time() - start >= 0.045)
+
+
+class ConcurrencyLimitTest(TestCase):
+
+    def test_limit(self):
+        limit = ConcurrencyLimit(2)
+        lock = threading.Lock()
+        peak = [0]
+
+        def request(_):
+            limit.acquire()
+            with lock:
+                peak[0] = max(peak[0], limit.in_flight)
+            time.sleep(0.01)
+            limit.release(200, 0.01)
+
+        list(ordered_map(request, range(10), 5))
+        self.assertEqual(2, peak[0])
+
+    def test_adaptive(self):
+        limit = ConcurrencyLimit(8, adaptive=True, latency_target=1.0)
+        limit.acquire()
+        limit.release(503, 0.1)
+        self.assertEqual(4, limit.limit)
+        # only one decrease per round trip
+        limit.acquire()
+        limit.release(503, 0.1)
+        self.assertEqual(4, limit.limit)
+        for _ in range(6):
+            limit.acquire()
+            limit.release(200, 0.1)
+        self.assertEqual(5, int(limit.limit))
+
+    def test_adaptive_latency(self):
+        limit = ConcurrencyLimit(8, adaptive=True, latency_target=0.5)
+        limit.acquire()
+        limit.release(200, 1.0)
+        self.assertEqual(4, limit.limit)
+
+
+class GetThrottleTest(TestCase):
+
+    def test_disabled(self):
+        with test_settings():
+            self.assertIsNone(get_throttle())
+
+    def test_shared(self):
+        with test_settings(RATE_LIMIT=5, ADAPTIVE_CONCURRENCY=True,
+                           POOL_MAXSIZE=3):
+            throttle = get_throttle()
+            self.assertIs(throttle, get_throttle())
+            self.assertEqual(5, throttle.bucket.burst)
+            self.assertEqual(3, throttle.concurrency.max_limit)